@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import json
+import math
 from pathlib import Path
 
 import click
@@ -12,6 +13,15 @@ from rich.style import Style
 from rich.table import Table
 from rich.text import Text
 
+from assignment_io import SCHEMAS, compact_rows, pool_records
+from color_distance import DELTA_E_METRICS, delta_e
+from color_pool import ColorPool, ColorSet, PoolView, circ_dist_array
+from compiled_constraints import CompiledConstraints
+from lab_convert import pack_rgb24, rgb24_hex
+from lab_index import LabIndex
+from photo_profile import PhotoProfile
+from pool_io import load_pool
+
 # ============================================================
 # Catppuccin structure (semantic, fixed)
 # ============================================================
@@ -50,48 +60,32 @@ ACCENT_ROLES = [
     "accent_bridge",
 ]
 
+# UI fills: L* errors weigh double against a*/b* (keeps the lightness ladder)
+UI_L_WEIGHT = 2.0
+
 # ============================================================
 # Helpers
 # ============================================================
 
 
-def hex_from_row(r) -> str:
-    # Always lower-case for stable uniqueness checks
-    return f"#{int(r.R):02x}{int(r.G):02x}{int(r.B):02x}".lower()
-
-
-def norm_hex(h: str) -> str:
-    return str(h).strip().lower()
-
-
-def circ_dist(a, b) -> float:
-    d = abs(a - b) % 360
-    return min(d, 360 - d)
-
-
-def deltaE76(lab1: np.ndarray, lab2: np.ndarray) -> float:
-    d = lab1 - lab2
-    return float(np.sqrt(np.dot(d, d)))
-
-
-def circ_dist_series(series, center: float) -> pd.Series:
-    d = (series - center).abs() % 360
-    return np.minimum(d, 360 - d)
+def row_key(r) -> int:
+    """Packed 0xRRGGBB of an assigned row."""
+    return int(r["rgb"])
 
 
-def pool_add_hex_and_dedupe(pool: pd.DataFrame) -> pd.DataFrame:
+def pool_add_keys_and_dedupe(pool: pd.DataFrame) -> pd.DataFrame:
     """
-    Normalize and dedupe the pool by hex so we don't accidentally select
-    the same visible color multiple times via duplicate rows.
+    Key the pool by packed RGB (the rgb column) and dedupe on it so we don't
+    accidentally select the same visible color multiple times via duplicate rows.
     """
     pool = pool.copy()
-    pool["hex"] = pool.apply(hex_from_row, axis=1).map(norm_hex)
+    pool["rgb"] = pack_rgb24(pool[["R", "G", "B"]].to_numpy())
 
-    # keep "best" row per hex (prefer higher frequency, then higher score)
+    # keep "best" row per color (prefer higher frequency, then higher score)
     sort_cols = [c for c in ["frequency", "score"] if c in pool.columns]
     if sort_cols:
         pool = pool.sort_values(sort_cols, ascending=[False] * len(sort_cols))
-    pool = pool.drop_duplicates(subset=["hex"], keep="first").reset_index(drop=True)
+    pool = pool.drop_duplicates(subset=["rgb"], keep="first").reset_index(drop=True)
     return pool
 
 
@@ -129,96 +123,47 @@ def ensure_rank_columns(pool: pd.DataFrame) -> pd.DataFrame:
 
 
 # ============================================================
-# Constraint accessors
+# Role candidate pools
 # ============================================================
 
 
-def deltaL_target(constraints, pair):
-    return constraints["deltaL"][pair]["median"]
-
-
-def deltaL_min(constraints, pair):
-    return constraints["deltaL"][pair]["q25"]
-
-
-def hue_center(constraints, role):
-    return constraints["hue"].get(role, {}).get("center")
-
-
-def hue_width(constraints, role):
-    return constraints["hue"].get(role, {}).get("width")
-
-
-def chroma_bounds(constraints, role, *, relax: bool):
-    c = constraints["chroma"].get(role)
-    if c is None:
-        return None
-    q25 = float(c["q25"])
-    q75 = float(c["q75"])
-    if relax:
-        relax_delta = float(c.get("relax_delta", (float(c["q90"]) - float(c["q10"])) / 2))
-        q25 = max(0.0, q25 - relax_delta)
-        q75 = q75 + relax_delta
-    return q25, q75
-
-
-def lightness_bounds(constraints, role, *, relax: bool):
-    l = constraints.get("lightness", {}).get(role)
-    if l is None:
-        return None
-    q25 = float(l["q25"])
-    q75 = float(l["q75"])
-    if relax:
-        relax_delta = float(l.get("relax_delta", (float(l["q90"]) - float(l["q10"])) / 2))
-        q25 = max(0.0, q25 - relax_delta)
-        q75 = min(100.0, q75 + relax_delta)
-    return q25, q75
-
-
-def hue_window(constraints, role, *, relax: bool):
-    h = constraints["hue"].get(role)
-    if h is None:
-        return None
-    center = float(h["center"])
-    width = float(h["width"])
-    mult = float(h.get("relax_mult", 1.3)) if relax else 1.0
-    return center, (width / 2.0) * mult
-
-
-def get_role_pool(pool: pd.DataFrame, role: str, constraints: dict, *, relax: bool):
-    sub = pool[pool.role == role].copy()
+def get_role_pool(
+    pool: ColorPool, role: str, constraints: CompiledConstraints, *, relax: bool
+) -> PoolView:
+    sub = pool.role_view(role)
     if not sub.empty and not relax:
         return sub
 
-    cand = pool.copy()
+    cand = pool.view()
 
     if role in ["background", "surface", "overlay", "text"]:
-        cb = chroma_bounds(constraints, role, relax=relax)
+        cb = constraints.chroma_bounds(role, relax=relax)
         if cb is not None:
             c_lo, c_hi = cb
-            cand = cand[(cand["chroma"] >= c_lo) & (cand["chroma"] <= c_hi)]
+            C = cand["chroma"]
+            cand = cand.where((C >= c_lo) & (C <= c_hi))
 
-        lb = lightness_bounds(constraints, role, relax=relax)
+        lb = constraints.lightness_bounds(role, relax=relax)
         if lb is not None:
             l_lo, l_hi = lb
-            cand = cand[(cand["L"] >= l_lo) & (cand["L"] <= l_hi)]
+            cand = cand.where((cand.L >= l_lo) & (cand.L <= l_hi))
 
         return cand if not cand.empty else sub
 
-    cb = chroma_bounds(constraints, role, relax=relax)
+    cb = constraints.chroma_bounds(role, relax=relax)
     if cb is not None:
         c_lo, _ = cb
-        cand = cand[cand["chroma"] >= c_lo]
+        cand = cand.where(cand["chroma"] >= c_lo)
 
-    hw = hue_window(constraints, role, relax=relax)
+    hw = constraints.hue_window(role, relax=relax)
     if hw is not None:
         center, half = hw
-        cand = cand[circ_dist_series(cand["hue"], center) <= half]
+        cand = cand.where(circ_dist_array(cand.hue, center) <= half)
 
-    lb = lightness_bounds(constraints, role, relax=relax)
+    lb = constraints.lightness_bounds(role, relax=relax)
     if lb is not None:
         l_lo, l_hi = lb
-        cand = cand[(cand["L"] >= l_lo) & (cand["L"] <= l_hi)]
+        cand = cand.where((cand.L >= l_lo) & (cand.L <= l_hi))
 
     return cand if not cand.empty else sub
 
@@ -228,22 +173,29 @@ def get_role_pool(pool: pd.DataFrame, role: str, constraints: dict, *, relax: bo
 # ============================================================
 
 
-def pick_structural(pool: pd.DataFrame, constraints: dict):
-    polarity = constraints.get("polarity", "dark")
+def _pair_hue_dist(h1: np.ndarray, h2: np.ndarray) -> np.ndarray:
+    """circ_dist between every pair of h1 x h2."""
+    return circ_dist_array(h1[:, None], h2[None, :])
+
+
+def pick_structural(pool: ColorPool, constraints: CompiledConstraints):
+    polarity = constraints.polarity or "dark"
     is_dark = polarity != "light"
-    pref_hue = constraints.get("photo_dark_hue")
-    pref_hue_conf = float(constraints.get("photo_dark_hue_conf") or 0.0)
-    cluster_hue = constraints.get("photo_dark_cluster_hue")
-    cluster_score = float(constraints.get("photo_dark_cluster_score") or 0.0)
-    bg_photo_hue = constraints.get("photo_bg_hue")
-    bg_photo_conf = float(constraints.get("photo_bg_hue_conf") or 0.0)
-    photo_L_q30 = constraints.get("photo_L_q30")
-    photo_L_q40 = constraints.get("photo_L_q40")
-    photo_C_median = constraints.get("photo_C_median")
-    bg_hue = constraints.get("background_hue", {})
-    bg_width = float(bg_hue.get("width", 60.0))
-    ui_hue = constraints.get("ui_hue_coherence", {})
-    ui_hue_max = float(ui_hue.get("max_dist", 90.0))
+    pref_hue = constraints.photo.get("photo_dark_hue")
+    pref_hue_conf = float(constraints.photo.get("photo_dark_hue_conf") or 0.0)
+    cluster_hue = constraints.photo.get("photo_dark_cluster_hue")
+    cluster_score = float(constraints.photo.get("photo_dark_cluster_score") or 0.0)
+    bg_photo_hue = constraints.photo.get("photo_bg_hue")
+    bg_photo_conf = float(constraints.photo.get("photo_bg_hue_conf") or 0.0)
+    photo_L_q30 = constraints.photo.get("photo_L_q30")
+    photo_L_q40 = constraints.photo.get("photo_L_q40")
+    photo_C_median = constraints.photo.get("photo_C_median")
+    _, bg_width = constraints.background_hue
+    if math.isnan(bg_width):
+        bg_width = 60.0
+    ui_hue_max = constraints.ui_hue_max_dist
+    if math.isnan(ui_hue_max):
+        ui_hue_max = 90.0
 
     desired_hue = None
     hue_weight = 0.0
@@ -272,12 +224,8 @@ def pick_structural(pool: pd.DataFrame, constraints: dict):
         over_pool = get_role_pool(pool, "overlay", constraints, relax=relax)
         text_pool = get_role_pool(pool, "text", constraints, relax=relax)
 
-        def top_k(df, k):
-            if df.empty:
-                return df
-            return df.sort_values(["score", "frequency"], ascending=[False, False]).head(
-                k
-            )
+        def top_k(view, k):
+            return view.order_by(("score", False), ("frequency", False)).head(k)
 
         k_bg = 24 if relax else 16
         k_text = 24 if relax else 16
@@ -292,16 +240,11 @@ def pick_structural(pool: pd.DataFrame, constraints: dict):
         if bg_pool.empty or text_pool.empty or surf_pool.empty or over_pool.empty:
             continue
 
-        bg_rows = list(bg_pool.itertuples())
-        text_rows = list(text_pool.itertuples())
-        surf_rows = list(surf_pool.itertuples())
-        over_rows = list(over_pool.itertuples())
-
-        bg_L = np.array([r.L for r in bg_rows], dtype=float)
-        text_L = np.array([r.L for r in text_rows], dtype=float)
+        bg_L = bg_pool.L
+        text_L = text_pool.L
 
         min_mult = 0.6 if relax else 1.0
-        min_bt = deltaL_min(constraints, "background→text") * min_mult
+        min_bt = constraints.deltaL_min("background→text") * min_mult
 
         if is_dark:
             max_text = float(text_L.max())
@@ -314,90 +257,87 @@ def pick_structural(pool: pd.DataFrame, constraints: dict):
             max_bg = float(bg_L.max())
             text_keep = text_L <= (max_bg - min_bt)
 
-        bg_rows = [r for r, keep in zip(bg_rows, bg_keep) if keep]
-        text_rows = [r for r, keep in zip(text_rows, text_keep) if keep]
+        bg_pool = bg_pool.where(bg_keep)
+        text_pool = text_pool.where(text_keep)
 
-        if not bg_rows or not text_rows:
+        if bg_pool.empty or text_pool.empty:
             continue
 
-        best = None
-        best_score = float("inf")
-
-        for bg in bg_rows:
-            for text in text_rows:
-                bt = (text.L - bg.L) if is_dark else (bg.L - text.L)
-                if bt < min_bt:
-                    continue
-
-                for surf in surf_rows:
-                    if is_dark:
-                        if not (bg.L < surf.L < text.L):
-                            continue
-                    else:
-                        if not (bg.L > surf.L > text.L):
-                            continue
-
-                    for over in over_rows:
-                        if is_dark:
-                            if not (surf.L < over.L < text.L):
-                                continue
-                        else:
-                            if not (surf.L > over.L > text.L):
-                                continue
-
-                        bs = (surf.L - bg.L) if is_dark else (bg.L - surf.L)
-                        so = (over.L - surf.L) if is_dark else (surf.L - over.L)
-                        ot = (text.L - over.L) if is_dark else (over.L - text.L)
-
-                        score = (
-                            abs(bt - deltaL_target(constraints, "background→text"))
-                            + abs(bs - deltaL_target(constraints, "background→surface"))
-                            + abs(so - deltaL_target(constraints, "surface→overlay"))
-                            + abs(ot - deltaL_target(constraints, "overlay→text"))
-                            - 2.0
-                            * (
-                                float(getattr(bg, "frequency", 0.0))
-                                + float(getattr(surf, "frequency", 0.0))
-                                + float(getattr(over, "frequency", 0.0))
-                                + float(getattr(text, "frequency", 0.0))
-                            )
-                        )
-                        if desired_hue is not None and hue_weight > 0.0:
-                            score += circ_dist(float(bg.hue), desired_hue) * hue_weight
-                        if bg_photo_hue is not None and bg_photo_conf > 0.05:
-                            coherence = (
-                                circ_dist(float(bg.hue), float(bg_photo_hue))
-                                + circ_dist(float(surf.hue), float(bg_photo_hue))
-                                + circ_dist(float(over.hue), float(bg_photo_hue))
-                            ) / 3.0
-                            score += coherence * 0.06
-                        ui_dist = max(
-                            circ_dist(float(bg.hue), float(surf.hue)),
-                            circ_dist(float(bg.hue), float(over.hue)),
-                            circ_dist(float(bg.hue), float(text.hue)),
-                            circ_dist(float(surf.hue), float(over.hue)),
-                            circ_dist(float(surf.hue), float(text.hue)),
-                            circ_dist(float(over.hue), float(text.hue)),
-                        )
-                        if ui_dist > ui_hue_max:
-                            score += (ui_dist - ui_hue_max) * 0.15
-                        if min_bg_L is not None and float(bg.L) < min_bg_L:
-                            score += (min_bg_L - float(bg.L)) * 1.2
-                        if photo_C_median is not None and float(photo_C_median) > 18.0:
-                            if float(bg.chroma) < 6.0:
-                                score += (6.0 - float(bg.chroma)) * 1.5
-
-                        if score < best_score:
-                            best_score = score
-                            best = {
-                                "base": bg,
-                                "surface1": surf,
-                                "overlay1": over,
-                                "text": text,
-                            }
-
-        if best:
-            return best
+        # Every (bg, text, surf, over) combination at once, axes in that
+        # order; invalid combinations score inf, so the first minimum in
+        # C order is the first best combination of the nested-loop search.
+        bg, text, surf, over = bg_pool, text_pool, surf_pool, over_pool
+        B = (slice(None), None, None, None)
+        T = (None, slice(None), None, None)
+        S = (None, None, slice(None), None)
+        O = (None, None, None, slice(None))
+        bgL, txL, sfL, ovL = bg.L[B], text.L[T], surf.L[S], over.L[O]
+
+        bt = (txL - bgL) if is_dark else (bgL - txL)
+        bs = (sfL - bgL) if is_dark else (bgL - sfL)
+        so = (ovL - sfL) if is_dark else (sfL - ovL)
+        ot = (txL - ovL) if is_dark else (ovL - txL)
+        if is_dark:
+            valid = (bt >= min_bt) & (bgL < sfL) & (sfL < txL) & (sfL < ovL) & (ovL < txL)
+        else:
+            valid = (bt >= min_bt) & (bgL > sfL) & (sfL > txL) & (sfL > ovL) & (ovL > txL)
+
+        score = (
+            np.abs(bt - constraints.deltaL_target("background→text"))
+            + np.abs(bs - constraints.deltaL_target("background→surface"))
+            + np.abs(so - constraints.deltaL_target("surface→overlay"))
+            + np.abs(ot - constraints.deltaL_target("overlay→text"))
+            - 2.0
+            * (
+                bg["frequency"][B]
+                + surf["frequency"][S]
+                + over["frequency"][O]
+                + text["frequency"][T]
+            )
+        )
+        if desired_hue is not None and hue_weight > 0.0:
+            score = score + (circ_dist_array(bg.hue, desired_hue) * hue_weight)[B]
+        if bg_photo_hue is not None and bg_photo_conf > 0.05:
+            coherence = (
+                circ_dist_array(bg.hue, float(bg_photo_hue))[B]
+                + circ_dist_array(surf.hue, float(bg_photo_hue))[S]
+                + circ_dist_array(over.hue, float(bg_photo_hue))[O]
+            ) / 3.0
+            score = score + coherence * 0.06
+        ui_dist = np.maximum(
+            np.maximum(
+                _pair_hue_dist(bg.hue, surf.hue)[:, None, :, None],
+                _pair_hue_dist(bg.hue, over.hue)[:, None, None, :],
+            ),
+            np.maximum(
+                _pair_hue_dist(bg.hue, text.hue)[:, :, None, None],
+                _pair_hue_dist(surf.hue, over.hue)[None, None, :, :],
+            ),
+        )
+        ui_dist = np.maximum(
+            ui_dist,
+            np.maximum(
+                _pair_hue_dist(text.hue, surf.hue)[None, :, :, None],
+                _pair_hue_dist(text.hue, over.hue)[None, :, None, :],
+            ),
+        )
+        score = score + np.where(ui_dist > ui_hue_max, (ui_dist - ui_hue_max) * 0.15, 0.0)
+        if min_bg_L is not None:
+            score = score + np.where(bg.L < min_bg_L, (min_bg_L - bg.L) * 1.2, 0.0)[B]
+        if photo_C_median is not None and float(photo_C_median) > 18.0:
+            bg_C = bg["chroma"]
+            score = score + np.where(bg_C < 6.0, (6.0 - bg_C) * 1.5, 0.0)[B]
+
+        score = np.where(valid & ~np.isnan(score), score, np.inf)
+        i = int(np.argmin(score))
+        if np.isfinite(score.flat[i]):
+            ib, it, i_s, io = np.unravel_index(i, score.shape)
+            return {
+                "base": bg.row(ib),
+                "surface1": surf.row(i_s),
+                "overlay1": over.row(io),
+                "text": text.row(it),
+            }
 
     return {}
 
@@ -407,28 +347,24 @@ def pick_structural(pool: pd.DataFrame, constraints: dict):
 # ============================================================
 
 
-def get_offset(constraints, offset_name, fallback):
-    """Get learned element offset, with fallback for missing constraints."""
-    offsets = constraints.get("element_offsets", {})
-    if offset_name in offsets:
-        return offsets[offset_name].get("value", fallback)
-    return fallback
-
-
-def fill_ui(pool, assignments, constraints):
-    used = {norm_hex(hex_from_row(v)) for v in assignments.values()}
+def fill_ui(pool: ColorPool, assignments, constraints, index: LabIndex):
+    """
+    Each remaining UI element is the unused color of its role nearest (in
+    `index`) to its anchor's Lab shifted by the learned L* offset, so fills
+    follow the anchor's hue as well as its lightness ladder.
+    """
+    used = ColorSet(row_key(v) for v in assignments.values())
 
-    def pick(role, target_L):
-        sub = pool[(pool.role == role) & (~pool.hex.isin(used))].copy()
-        if sub.empty:
-            sub = get_role_pool(pool, role, constraints, relax=True)
-            sub = sub[~sub.hex.isin(used)].copy()
+    def pick(role, anchor, offset):
+        target = (float(anchor["L"]) + offset, float(anchor["a"]), float(anchor["b"]))
+        sub = index.nearest(target, role=role, exclude=used)
         if sub.empty:
-            return None
-        sub["dist"] = (sub.L - target_L).abs()
-        r = sub.sort_values(["dist", "score"], ascending=[True, False]).iloc[0]
-        used.add(norm_hex(r.hex))
-        return r
+            sub = get_role_pool(pool, role, constraints, relax=True).without(used)
+            if sub.empty:
+                return None
+            sub = index.rank(sub, target)
+        used.add(int(sub.rgb[0]))
+        return sub.row(0)
 
     if "base" not in assignments or "surface1" not in assignments:
         return assignments
@@ -442,24 +378,29 @@ def fill_ui(pool, assignments, constraints):
     for k, r in {
         "mantle": pick(
             "background",
-            base.L + get_offset(constraints, "mantle_from_base", -3.0),
+            base,
+            constraints.element_offset("mantle_from_base", -3.0),
         ),
         "crust": pick(
             "background",
-            base.L + get_offset(constraints, "crust_from_base", -6.5),
+            base,
+            constraints.element_offset("crust_from_base", -6.5),
         ),
         "surface0": pick(
             "surface",
-            surf.L + get_offset(constraints, "surface0_from_surface1", -9.0),
+            surf,
+            constraints.element_offset("surface0_from_surface1", -9.0),
         ),
         "surface2": pick(
             "surface",
-            surf.L + get_offset(constraints, "surface2_from_surface1", 8.5),
+            surf,
+            constraints.element_offset("surface2_from_surface1", 8.5),
         ),
         "overlay0": (
             pick(
                 "overlay",
-                over.L + get_offset(constraints, "overlay0_from_overlay1", -8.0),
+                over,
+                constraints.element_offset("overlay0_from_overlay1", -8.0),
             )
             if over is not None
             else None
@@ -467,7 +408,8 @@ def fill_ui(pool, assignments, constraints):
         "overlay2": (
             pick(
                 "overlay",
-                over.L + get_offset(constraints, "overlay2_from_overlay1", 8.0),
+                over,
+                constraints.element_offset("overlay2_from_overlay1", 8.0),
             )
             if over is not None
             else None
@@ -475,7 +417,8 @@ def fill_ui(pool, assignments, constraints):
         "subtext1": (
             pick(
                 "text",
-                text.L + get_offset(constraints, "subtext1_from_text", -7.0),
+                text,
+                constraints.element_offset("subtext1_from_text", -7.0),
             )
             if text is not None
             else None
@@ -483,7 +426,8 @@ def fill_ui(pool, assignments, constraints):
         "subtext0": (
             pick(
                 "text",
-                text.L + get_offset(constraints, "subtext0_from_text", -15.0),
+                text,
+                constraints.element_offset("subtext0_from_text", -15.0),
             )
             if text is not None
             else None
@@ -500,64 +444,52 @@ def fill_ui(pool, assignments, constraints):
 # ============================================================
 
 
-def get_accent_min_deltal(constraints, role, polarity, fallback):
-    """
-    Get learned minimum L* separation for an accent role from constraints.
-
-    Uses accent_separation[polarity][role]["min"], with fallback.
-    """
-    sep = constraints.get("accent_separation", {})
-    pol_sep = sep.get(polarity, {})
-    role_sep = pol_sep.get(role, {})
-    return role_sep.get("min", fallback)
-
-
 def pick_accents(
-    pool: pd.DataFrame,
+    pool: ColorPool,
     assignments: dict,
-    constraints: dict,
+    constraints: CompiledConstraints,
     *,
     cool_rank_floor: float = 0.60,
     cool_min_deltal: float | None = None,
     accent_min_deltal: float | None = None,
+    delta_e_metric: str = "de76",
 ):
     """
     Select accent colors from pool, respecting hue and L* separation constraints.
 
     If cool_min_deltal or accent_min_deltal are None, uses learned values from
-    constraints["accent_separation"].
+    constraints.accent_min_deltal (palette accent_separation). The
+    accent-text gate measures deltaE with `delta_e_metric`.
     """
-    used = {norm_hex(hex_from_row(v)) for v in assignments.values()}
+    used = ColorSet(row_key(v) for v in assignments.values())
 
     base = assignments.get("base")
-    base_L = float(base.L) if base is not None else None
+    base_L = float(base["L"]) if base is not None else None
     is_dark = base_L is not None and base_L < 50.0
     polarity = "dark" if is_dark else "light"
-    warm_hue = constraints.get("photo_warm_hue")
-    warm_hue_conf = float(constraints.get("photo_warm_hue_conf") or 0.0)
+    warm_hue = constraints.photo.get("photo_warm_hue")
+    warm_hue_conf = float(constraints.photo.get("photo_warm_hue_conf") or 0.0)
     text = assignments.get("text")
     text_lab = (
-        np.array([float(text.L), float(text.a), float(text.b)], dtype=float)
+        np.array([float(text["L"]), float(text["a"]), float(text["b"])], dtype=float)
         if text is not None
         else None
     )
-    accent_text_sep = constraints.get("accent_text_separation", {})
 
     for role in ACCENT_ROLES:
         elems = ELEMENTS_BY_ROLE[role]
-        sub = pool[(pool.role == role) & (~pool.hex.isin(used))].copy()
+        sub = pool.role_view(role).without(used)
         if sub.empty:
-            sub = get_role_pool(pool, role, constraints, relax=True)
-            sub = sub[~sub.hex.isin(used)].copy()
+            sub = get_role_pool(pool, role, constraints, relax=True).without(used)
         if sub.empty:
             continue
 
         # Hue window (if present)
-        h0 = hue_center(constraints, role)
-        w = hue_width(constraints, role)
+        h0 = constraints.hue_center(role)
+        w = constraints.hue_width(role)
         if h0 is not None and w is not None:
-            sub["hue_dist"] = sub.hue.apply(lambda h: circ_dist(h, h0))
-            cand = sub[sub.hue_dist <= w / 2].copy()
+            sub = sub.with_column("hue_dist", circ_dist_array(sub.hue, h0))
+            cand = sub.where(sub["hue_dist"] <= w / 2)
             if cand.empty:
                 cand = sub
         else:
@@ -568,131 +500,119 @@ def pick_accents(
             min_deltal = (
                 cool_min_deltal
                 if cool_min_deltal is not None
-                else get_accent_min_deltal(constraints, role, polarity, 48.0)
+                else constraints.accent_min_deltal(role, polarity, 48.0)
             )
         else:
             min_deltal = (
                 accent_min_deltal
                 if accent_min_deltal is not None
-                else get_accent_min_deltal(constraints, role, polarity, 43.0)
+                else constraints.accent_min_deltal(role, polarity, 43.0)
             )
 
         # Require accents to be separated from base in L* (only if it doesn't wipe everything)
-        if base_L is not None and "L" in cand.columns:
+        if base_L is not None:
             if is_dark:
-                floored = cand[cand["L"] >= (base_L + abs(min_deltal))].copy()
+                floored = cand.where(cand.L >= (base_L + abs(min_deltal)))
             else:
-                floored = cand[cand["L"] <= (base_L - abs(min_deltal))].copy()
+                floored = cand.where(cand.L <= (base_L - abs(min_deltal)))
             if not floored.empty:
                 cand = floored
 
         # Accent-text separation (avoid accents too close to text)
-        if text_lab is not None and "L" in cand.columns:
-            sep = accent_text_sep.get(role, {})
-            min_de = float(sep.get("deltaE_q10", 0.0))
-            min_dl = float(sep.get("deltaL_q10", 0.0))
+        if text_lab is not None:
+            min_de, min_dl = constraints.accent_text_separation(role)
             if min_de > 0.0 or min_dl > 0.0:
-                cand["deltaE_text"] = cand.apply(
-                    lambda r: deltaE76(
-                        np.array([r.L, r.a, r.b], dtype=float), text_lab
-                    ),
-                    axis=1,
+                cand = cand.with_column(
+                    "deltaE_text", delta_e(text_lab, cand.lab(), delta_e_metric)[0]
+                )
+                cand = cand.with_column("abs_deltaL_text", np.abs(cand.L - float(text["L"])))
+                gated = cand.where(
+                    (cand["deltaE_text"] >= min_de) & (cand["abs_deltaL_text"] >= min_dl)
                 )
-                cand["abs_deltaL_text"] = (cand["L"] - float(text.L)).abs()
-                gated = cand[
-                    (cand["deltaE_text"] >= min_de)
-                    & (cand["abs_deltaL_text"] >= min_dl)
-                ]
                 if not gated.empty:
                     cand = gated
 
         # Rank-aware preference (if present)
         have_ranks = (
-            "deltaE_bg_rank" in cand.columns
-            and "abs_deltaL_bg_rank" in cand.columns
-            and cand["deltaE_bg_rank"].notna().any()
-            and cand["abs_deltaL_bg_rank"].notna().any()
+            cand.has("deltaE_bg_rank")
+            and cand.has("abs_deltaL_bg_rank")
+            and bool(pd.notna(cand["deltaE_bg_rank"]).any())
+            and bool(pd.notna(cand["abs_deltaL_bg_rank"]).any())
         )
 
         if role == "accent_cool":
             # stronger cool FG-safety (min_deltal already set above from learned constraints)
-            if base_L is not None and "L" in cand.columns:
+            if base_L is not None:
                 if is_dark:
-                    cand = cand[cand["L"] >= (base_L + abs(min_deltal))]
+                    cand = cand.where(cand.L >= (base_L + abs(min_deltal)))
                 else:
-                    cand = cand[cand["L"] <= (base_L - abs(min_deltal))]
+                    cand = cand.where(cand.L <= (base_L - abs(min_deltal)))
 
                 # Relax if empty but still prefer "not darker than base" in dark themes
                 if cand.empty:
-                    cand = sub.copy()
-                    if is_dark:
-                        cand = cand[cand["L"] >= base_L]
-                    else:
-                        cand = cand[cand["L"] <= base_L]
+                    cand = sub.where(sub.L >= base_L) if is_dark else sub.where(sub.L <= base_L)
                     if cand.empty:
-                        cand = sub.copy()
+                        cand = sub
 
             if have_ranks:
-                strict = cand[
-                    (cand["deltaE_bg_rank"] >= cool_rank_floor)
-                    & (cand["abs_deltaL_bg_rank"] >= cool_rank_floor)
-                ]
+                de_rank, dl_rank = cand["deltaE_bg_rank"], cand["abs_deltaL_bg_rank"]
+                strict = cand.where((de_rank >= cool_rank_floor) & (dl_rank >= cool_rank_floor))
                 if strict.empty:
-                    strict = cand[cand["deltaE_bg_rank"] >= cool_rank_floor]
+                    strict = cand.where(de_rank >= cool_rank_floor)
                 if strict.empty:
-                    strict = cand[cand["abs_deltaL_bg_rank"] >= cool_rank_floor]
+                    strict = cand.where(dl_rank >= cool_rank_floor)
                 if strict.empty:
                     strict = cand
 
-                cand = strict.sort_values(
-                    ["deltaE_bg_rank", "abs_deltaL_bg_rank", "score", "frequency"],
-                    ascending=[False, False, False, False],
+                cand = strict.order_by(
+                    ("deltaE_bg_rank", False),
+                    ("abs_deltaL_bg_rank", False),
+                    ("score", False),
+                    ("frequency", False),
                 )
             else:
-                cand = cand.sort_values(
-                    ["frequency", "score"], ascending=[False, False]
-                )
+                cand = cand.order_by(("frequency", False), ("score", False))
         else:
+            warm = role == "accent_warm" and warm_hue is not None and warm_hue_conf > 0.05
+            if warm:
+                cand = cand.with_column("warm_dist", circ_dist_array(cand.hue, warm_hue))
             if have_ranks:
-                if role == "accent_warm" and warm_hue is not None and warm_hue_conf > 0.05:
-                    cand["warm_dist"] = cand.hue.apply(lambda h: circ_dist(h, warm_hue))
-                    cand = cand.sort_values(
-                        ["warm_dist", "deltaE_bg_rank", "abs_deltaL_bg_rank", "score", "frequency"],
-                        ascending=[True, False, False, False, False],
+                if warm:
+                    cand = cand.order_by(
+                        ("warm_dist", True),
+                        ("deltaE_bg_rank", False),
+                        ("abs_deltaL_bg_rank", False),
+                        ("score", False),
+                        ("frequency", False),
                     )
                 else:
-                    cand = cand.sort_values(
-                        ["deltaE_bg_rank", "abs_deltaL_bg_rank", "score", "frequency"],
-                        ascending=[False, False, False, False],
+                    cand = cand.order_by(
+                        ("deltaE_bg_rank", False),
+                        ("abs_deltaL_bg_rank", False),
+                        ("score", False),
+                        ("frequency", False),
                     )
             else:
-                if role == "accent_warm" and warm_hue is not None and warm_hue_conf > 0.05:
-                    cand["warm_dist"] = cand.hue.apply(lambda h: circ_dist(h, warm_hue))
-                    cand = cand.sort_values(
-                        ["warm_dist", "score", "frequency"],
-                        ascending=[True, False, False],
-                    )
+                if warm:
+                    cand = cand.order_by(("warm_dist", True), ("score", False), ("frequency", False))
                 else:
-                    cand = cand.sort_values(
-                        ["frequency", "score"], ascending=[False, False]
-                    )
+                    cand = cand.order_by(("frequency", False), ("score", False))
 
         # Assign unique colors per element
         for elem in elems:
             if cand.empty:
                 break
 
-            row = cand.iloc[0]
-            hx = norm_hex(row.hex)
+            key = int(cand.rgb[0])
 
             # Extra guard: if we somehow collided, skip forward
-            if hx in used:
-                cand = cand[cand.hex != hx]
+            if key in used:
+                cand = cand.where(cand.rgb != key)
                 continue
 
-            assignments[elem] = row
-            used.add(hx)
-            cand = cand[cand.hex != hx]
+            assignments[elem] = cand.row(0)
+            used.add(key)
+            cand = cand.where(cand.rgb != key)
 
     return assignments
 
@@ -732,17 +652,17 @@ def _build_table(assignments, name):
                 table.add_row(elem, "[dim]—[/dim]", "", "", "", "", "", "")
                 continue
 
-            h = hex_from_row(r)
-            dE_rank = getattr(r, "deltaE_bg_rank", None)
-            dL_rank = getattr(r, "abs_deltaL_bg_rank", None)
+            h = rgb24_hex(r["rgb"])
+            dE_rank = r.get("deltaE_bg_rank")
+            dL_rank = r.get("abs_deltaL_bg_rank")
 
             table.add_row(
                 elem,
                 h,
                 Text("   ", style=Style(bgcolor=h)),
-                f"{float(r.L):.1f}",
-                f"{float(r.chroma):.1f}",
-                f"{float(r.hue):.0f}°",
+                f"{float(r['L']):.1f}",
+                f"{float(r['chroma']):.1f}",
+                f"{float(r['hue']):.0f}°",
                 fmt_rank(dE_rank),
                 fmt_rank(dL_rank),
             )
@@ -790,21 +710,15 @@ def save_table_image(assignments, name, out_path: Path):
 
 
 def row_to_dict(r):
-    if hasattr(r, "_asdict"):  # namedtuple
-        d = dict(r._asdict())
-        if "hex" in d and d["hex"]:
-            d["hex"] = norm_hex(d["hex"])
-        return d
-    if isinstance(r, pd.Series):  # pandas row
-        d = r.to_dict()
-        if "hex" in d and d["hex"]:
-            d["hex"] = norm_hex(d["hex"])
-        return d
-    raise TypeError(f"Unsupported row type: {type(r)}")
+    if not isinstance(r, dict):
+        raise TypeError(f"Unsupported row type: {type(r)}")
+    d = dict(r)
+    d["hex"] = rgb24_hex(d["rgb"])
+    return d
 
 
 @click.command()
-@click.argument("color_pool_csv", type=click.Path(exists=True, path_type=Path))
+@click.argument("color_pool", type=click.Path(exists=True, path_type=Path))
 @click.option("--constraints-json", required=True, type=click.Path(exists=True))
 @click.option("--theme-name", default="painting")
 @click.option("--out-json", default="assignments.json", show_default=True)
@@ -833,8 +747,30 @@ def row_to_dict(r):
     type=float,
     help="Override learned minimum L* separation for non-cool accents (default: use learned constraint).",
 )
+@click.option(
+    "--delta-e",
+    "delta_e_metric",
+    type=click.Choice(DELTA_E_METRICS),
+    default="de76",
+    show_default=True,
+    help="Color-difference metric for the accent-text separation gate.",
+)
+@click.option(
+    "--photo-profile",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Photo profile JSON from extract_colors.py (per-photo hue / lightness "
+    "metadata); overrides the header of a .npz pool.",
+)
+@click.option(
+    "--schema",
+    type=click.Choice(SCHEMAS),
+    default="full",
+    show_default=True,
+    help="compact: store color_id references into the pool plus changed fields only.",
+)
 def main(
-    color_pool_csv,
+    color_pool,
     constraints_json,
     theme_name,
     out_json,
@@ -842,9 +778,16 @@ def main(
     cool_rank_floor,
     cool_min_deltal,
     accent_min_deltal,
+    delta_e_metric,
+    photo_profile,
+    schema,
 ):
-    pool = pd.read_csv(color_pool_csv)
-    pool = pool_add_hex_and_dedupe(pool)
+    """Assign theme elements from COLOR_POOL (.npz from --out-pool, or CSV)."""
+    try:
+        pool, pool_profile = load_pool(color_pool)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    pool = pool_add_keys_and_dedupe(pool)
 
     # Ensure new rank columns exist (computed if missing)
     pool = ensure_rank_columns(pool)
@@ -854,73 +797,49 @@ def main(
         raise click.ClickException("color_pool.csv must include a 'palette' column")
     palette = str(pool.palette.iloc[0])
 
-    constraints = {
-        "deltaL": constraints_all["constraints"]["deltaL"][palette],
-        "chroma": constraints_all["constraints"]["chroma"][palette],
-        "hue": constraints_all["constraints"]["hue"][palette],
-        "lightness": constraints_all["constraints"].get("lightness", {}).get(
-            palette, {}
-        ),
-        "polarity": constraints_all.get("polarity", {}).get(palette, "dark"),
-        "background_hue": constraints_all["constraints"]
-        .get("background_hue", {})
-        .get(palette, {}),
-        "ui_hue_coherence": constraints_all["constraints"]
-        .get("ui_hue_coherence", {})
-        .get(palette, {}),
-        "element_offsets": constraints_all["constraints"]
-        .get("element_offsets", {})
-        .get(palette, {}),
-        "accent_separation": constraints_all["constraints"].get(
-            "accent_separation", {}
-        ),
-        "accent_text_separation": constraints_all["constraints"].get(
-            "accent_text_separation", {}
-        ).get(palette, {}),
-    }
-
-    if "photo_dark_hue" in pool.columns:
-        constraints["photo_dark_hue"] = pool["photo_dark_hue"].dropna().iloc[0]
-        constraints["photo_dark_hue_conf"] = (
-            pool.get("photo_dark_hue_conf", pd.Series([0.0])).dropna().iloc[0]
-        )
-        constraints["photo_dark_cluster_hue"] = (
-            pool.get("photo_dark_cluster_hue", pd.Series([np.nan])).dropna().iloc[0]
-        )
-        constraints["photo_dark_cluster_score"] = (
-            pool.get("photo_dark_cluster_score", pd.Series([0.0])).dropna().iloc[0]
-        )
-        constraints["photo_bg_hue"] = (
-            pool.get("photo_bg_hue", pd.Series([np.nan])).dropna().iloc[0]
-        )
-        constraints["photo_bg_hue_conf"] = (
-            pool.get("photo_bg_hue_conf", pd.Series([0.0])).dropna().iloc[0]
-        )
-        constraints["photo_L_q30"] = (
-            pool.get("photo_L_q30", pd.Series([np.nan])).dropna().iloc[0]
-        )
-        constraints["photo_L_q40"] = (
-            pool.get("photo_L_q40", pd.Series([np.nan])).dropna().iloc[0]
-        )
-        constraints["photo_C_median"] = (
-            pool.get("photo_C_median", pd.Series([np.nan])).dropna().iloc[0]
-        )
-        constraints["photo_warm_hue"] = (
-            pool.get("photo_warm_hue", pd.Series([np.nan])).dropna().iloc[0]
-        )
-        constraints["photo_warm_hue_conf"] = (
-            pool.get("photo_warm_hue_conf", pd.Series([0.0])).dropna().iloc[0]
-        )
+    # Per-photo metadata written by extract_colors.py: the profile sidecar
+    # or .npz pool header, else legacy photo_* pool columns (first non-null value)
+    photo = {}
+    if photo_profile is not None:
+        try:
+            photo = PhotoProfile.load(photo_profile).stats
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    elif pool_profile is not None:
+        photo = pool_profile.stats
+    elif "photo_dark_hue" in pool.columns:
+        photo["photo_dark_hue"] = pool["photo_dark_hue"].dropna().iloc[0]
+        for col, default in [
+            ("photo_dark_hue_conf", 0.0),
+            ("photo_dark_cluster_hue", np.nan),
+            ("photo_dark_cluster_score", 0.0),
+            ("photo_bg_hue", np.nan),
+            ("photo_bg_hue_conf", 0.0),
+            ("photo_L_q30", np.nan),
+            ("photo_L_q40", np.nan),
+            ("photo_C_median", np.nan),
+            ("photo_warm_hue", np.nan),
+            ("photo_warm_hue_conf", 0.0),
+        ]:
+            photo[col] = pool.get(col, pd.Series([default])).dropna().iloc[0]
+
+    constraints = CompiledConstraints.from_json(constraints_all, palette).with_photo(
+        photo
+    )
 
-    assignments = pick_structural(pool, constraints)
-    assignments = fill_ui(pool, assignments, constraints)
+    cpool = ColorPool(pool)
+    assignments = pick_structural(cpool, constraints)
+    assignments = fill_ui(
+        cpool, assignments, constraints, LabIndex(cpool, l_weight=UI_L_WEIGHT)
+    )
     assignments = pick_accents(
-        pool,
+        cpool,
         assignments,
         constraints,
         cool_rank_floor=cool_rank_floor,
         cool_min_deltal=cool_min_deltal,
         accent_min_deltal=accent_min_deltal,
+        delta_e_metric=delta_e_metric,
     )
 
     missing = [
@@ -931,17 +850,13 @@ def main(
     ]
 
     assigned_out = {k: row_to_dict(v) for k, v in assignments.items()}
+    doc = {"palette": palette}
+    if schema == "compact":
+        assigned_out = compact_rows(assigned_out, pool_records(pool))
+        doc["schema"] = schema
+    doc.update(assigned=assigned_out, missing=missing)
 
-    Path(out_json).write_text(
-        json.dumps(
-            {
-                "palette": palette,
-                "assigned": assigned_out,
-                "missing": missing,
-            },
-            indent=2,
-        )
-    )
+    Path(out_json).write_text(json.dumps(doc, indent=2))
 
     render(assignments, theme_name)
 
@@ -0,0 +1,84 @@
+"""
+Assignment JSON rows: full pool rows, or compact color_id references.
+
+assign_elements.py and fill_gaps.py pass `{"palette", "assigned",
+"missing"}` documents, where "assigned" maps element -> row dict. In the
+full schema every row repeats all pool columns. In the compact schema
+("schema": "compact") a row that came from the pool is stored as
+`{"color_id": id}` plus only the fields that differ from that pool row
+(e.g. Lab / hex after a nudge). Rows with no pool match stay full.
+Readers expand compact rows against the same pool file.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Any, Dict
+
+import pandas as pd
+
+SCHEMAS = ("full", "compact")
+
+# Row-dict artifacts (itertuples index) that are never written compactly
+_DROP = ("Index",)
+
+
+def _same(a: Any, b: Any) -> bool:
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False
+
+
+def pool_records(pool: pd.DataFrame) -> Dict[int, Dict[str, Any]]:
+    """color_id -> pool row dict (first row per id)."""
+    if "color_id" not in pool.columns:
+        return {}
+    pool = pool.drop_duplicates(subset=["color_id"])
+    return {int(r["color_id"]): r for r in pool.to_dict("records")}
+
+
+def _color_id(row: Dict[str, Any]) -> int | None:
+    cid = row.get("color_id")
+    if cid is None or (isinstance(cid, float) and math.isnan(cid)):
+        return None
+    return int(cid)
+
+
+def compact_rows(
+    assigned: Dict[str, Dict[str, Any]], records: Dict[int, Dict[str, Any]]
+) -> Dict[str, Dict[str, Any]]:
+    """color_id + changed fields for rows found in `records`; others unchanged."""
+    out = {}
+    for elem, row in assigned.items():
+        cid = _color_id(row)
+        ref = records.get(cid) if cid is not None else None
+        if ref is None:
+            out[elem] = {k: v for k, v in row.items() if k not in _DROP}
+            continue
+        d = {"color_id": cid}
+        for k, v in row.items():
+            if k in _DROP or k == "color_id":
+                continue
+            if k not in ref or not _same(v, ref[k]):
+                d[k] = v
+        out[elem] = d
+    return out
+
+
+def expand_rows(
+    assigned: Dict[str, Dict[str, Any]], records: Dict[int, Dict[str, Any]]
+) -> Dict[str, Dict[str, Any]]:
+    """Full row dicts: pool row of each color_id overlaid with the stored fields."""
+    out = {}
+    for elem, row in assigned.items():
+        cid = _color_id(row)
+        if cid is None:
+            out[elem] = dict(row)
+            continue
+        if cid not in records:
+            raise ValueError(f"{elem}: color_id {cid} is not in the color pool")
+        out[elem] = {**records[cid], **row}
+    return out
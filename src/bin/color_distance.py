@@ -0,0 +1,130 @@
+"""
+Vectorized Lab color-difference kernels.
+
+Every kernel takes an (N, 3) and an (M, 3) Lab array (a single (3,) color
+is promoted) and returns the (N, M) matrix of differences, so gates compare
+whole candidate sets against anchors without per-row Python.
+
+  - "de76":      Euclidean distance in Lab
+  - "cie94":     CIE94, graphic-arts weights; lab1 is the reference
+  - "ciede2000": CIEDE2000 (Sharma, Wu & Dalal 2005)
+
+CIE94 is not symmetric (its weights use the chroma of lab1), so callers
+pass the anchor a gate measures against (background, text) as lab1 and the
+candidates as lab2.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+DELTA_E_METRICS = ("de76", "cie94", "ciede2000")
+
+
+def _pair(lab1, lab2) -> tuple[np.ndarray, np.ndarray]:
+    """(N, 1, 3) and (1, M, 3) float views for broadcasting."""
+    lab1 = np.asarray(lab1, dtype=float).reshape(-1, 3)
+    lab2 = np.asarray(lab2, dtype=float).reshape(-1, 3)
+    return lab1[:, None, :], lab2[None, :, :]
+
+
+def delta_e_76(lab1, lab2) -> np.ndarray:
+    lab1, lab2 = _pair(lab1, lab2)
+    d = lab1 - lab2
+    return np.sqrt(np.sum(d * d, axis=-1))
+
+
+def delta_e_94(
+    lab1, lab2, *, kL: float = 1.0, K1: float = 0.045, K2: float = 0.015
+) -> np.ndarray:
+    lab1, lab2 = _pair(lab1, lab2)
+    L1, a1, b1 = np.moveaxis(lab1, -1, 0)
+    L2, a2, b2 = np.moveaxis(lab2, -1, 0)
+
+    C1 = np.hypot(a1, b1)
+    C2 = np.hypot(a2, b2)
+    dL = L1 - L2
+    dC = C1 - C2
+    da = a1 - a2
+    db = b1 - b2
+    # dH^2 = da^2 + db^2 - dC^2, clamped against rounding
+    dH2 = np.maximum(da * da + db * db - dC * dC, 0.0)
+
+    SC = 1.0 + K1 * C1
+    SH = 1.0 + K2 * C1
+    return np.sqrt((dL / kL) ** 2 + (dC / SC) ** 2 + dH2 / (SH * SH))
+
+
+def delta_e_2000(
+    lab1, lab2, *, kL: float = 1.0, kC: float = 1.0, kH: float = 1.0
+) -> np.ndarray:
+    lab1, lab2 = _pair(lab1, lab2)
+    L1, a1, b1 = np.moveaxis(lab1, -1, 0)
+    L2, a2, b2 = np.moveaxis(lab2, -1, 0)
+
+    # a* rescaled toward the neutral axis for low-chroma pairs
+    C_bar7 = ((np.hypot(a1, b1) + np.hypot(a2, b2)) / 2.0) ** 7
+    G = 0.5 * (1.0 - np.sqrt(C_bar7 / (C_bar7 + 25.0**7)))
+    a1p = (1.0 + G) * a1
+    a2p = (1.0 + G) * a2
+    C1p = np.hypot(a1p, b1)
+    C2p = np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360.0
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360.0
+
+    chroma_zero = (C1p * C2p) == 0.0
+    dh = h2p - h1p
+    dh = np.where(dh > 180.0, dh - 360.0, np.where(dh < -180.0, dh + 360.0, dh))
+    dh = np.where(chroma_zero, 0.0, dh)
+
+    dLp = L2 - L1
+    dCp = C2p - C1p
+    dHp = 2.0 * np.sqrt(C1p * C2p) * np.sin(np.radians(dh / 2.0))
+
+    L_barp = (L1 + L2) / 2.0
+    C_barp = (C1p + C2p) / 2.0
+    h_sum = h1p + h2p
+    h_barp = np.where(
+        np.abs(h1p - h2p) <= 180.0,
+        h_sum / 2.0,
+        np.where(h_sum < 360.0, (h_sum + 360.0) / 2.0, (h_sum - 360.0) / 2.0),
+    )
+    h_barp = np.where(chroma_zero, h_sum, h_barp)
+
+    T = (
+        1.0
+        - 0.17 * np.cos(np.radians(h_barp - 30.0))
+        + 0.24 * np.cos(np.radians(2.0 * h_barp))
+        + 0.32 * np.cos(np.radians(3.0 * h_barp + 6.0))
+        - 0.20 * np.cos(np.radians(4.0 * h_barp - 63.0))
+    )
+    d_theta = 30.0 * np.exp(-(((h_barp - 275.0) / 25.0) ** 2))
+    C_barp7 = C_barp**7
+    RC = 2.0 * np.sqrt(C_barp7 / (C_barp7 + 25.0**7))
+    SL = 1.0 + 0.015 * (L_barp - 50.0) ** 2 / np.sqrt(20.0 + (L_barp - 50.0) ** 2)
+    SC = 1.0 + 0.045 * C_barp
+    SH = 1.0 + 0.015 * C_barp * T
+    RT = -np.sin(np.radians(2.0 * d_theta)) * RC
+
+    tL = dLp / (kL * SL)
+    tC = dCp / (kC * SC)
+    tH = dHp / (kH * SH)
+    return np.sqrt(np.maximum(tL * tL + tC * tC + tH * tH + RT * tC * tH, 0.0))
+
+
+_KERNELS = {
+    "de76": delta_e_76,
+    "cie94": delta_e_94,
+    "ciede2000": delta_e_2000,
+}
+
+
+def delta_e(lab1, lab2, metric: str = "de76") -> np.ndarray:
+    """
+    (N, 3) x (M, 3) Lab -> (N, M) color differences under `metric`.
+
+    lab1 is the reference (anchor) side for asymmetric metrics (cie94).
+    """
+    if metric not in _KERNELS:
+        raise ValueError(f"Unknown deltaE metric: {metric} (use one of {DELTA_E_METRICS})")
+    return _KERNELS[metric](lab1, lab2)
@@ -0,0 +1,95 @@
+"""
+Embedded ICC profile handling.
+
+Photos from cameras and museum archives often carry Adobe RGB, ProPhoto or
+other RGB profiles; treating their pixel values as sRGB skews every Lab value
+downstream. Instead of transforming every pixel, only the quantized unique
+colors (a few thousand) are converted to sRGB and re-binned onto the grid.
+Transforms are built once per distinct profile, keyed by its SHA-1.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import warnings
+
+import numpy as np
+from PIL import Image
+
+from quantize import QuantizedHistogram
+
+try:
+    from PIL import ImageCms
+except ImportError:  # Pillow built without littlecms
+    ImageCms = None
+
+_TRANSFORMS: dict[str, object] = {}
+
+
+def profile_hash(icc: bytes) -> str:
+    return hashlib.sha1(icc).hexdigest()
+
+
+def _build_srgb_transform(icc: bytes):
+    try:
+        src = ImageCms.ImageCmsProfile(io.BytesIO(icc))
+    except (OSError, ImageCms.PyCMSError):
+        warnings.warn("Ignoring unreadable embedded ICC profile")
+        return None
+    if src.profile.xcolor_space.strip() != "RGB":
+        return None
+    if "srgb" in ImageCms.getProfileDescription(src).lower():
+        return None
+    return ImageCms.buildTransform(
+        src,
+        ImageCms.createProfile("sRGB"),
+        "RGB",
+        "RGB",
+        renderingIntent=ImageCms.Intent.PERCEPTUAL,
+    )
+
+
+def srgb_transform(icc: bytes | None):
+    """
+    Cached RGB -> sRGB transform for an embedded profile.
+
+    None when no conversion is needed (no profile, already sRGB, non-RGB
+    profile) or possible (Pillow without littlecms).
+    """
+    if not icc:
+        return None
+    if ImageCms is None:
+        warnings.warn("Pillow has no ImageCms support; embedded ICC profile ignored")
+        return None
+    key = profile_hash(icc)
+    if key not in _TRANSFORMS:
+        _TRANSFORMS[key] = _build_srgb_transform(icc)
+    return _TRANSFORMS[key]
+
+
+def image_srgb_transform(img: Image.Image):
+    return srgb_transform(img.info.get("icc_profile"))
+
+
+def apply_transform(rgb: np.ndarray, transform) -> np.ndarray:
+    """(n, 3) uint8 RGB in the source profile -> (n, 3) uint8 sRGB."""
+    row = Image.fromarray(np.ascontiguousarray(rgb, dtype=np.uint8).reshape(1, -1, 3))
+    return np.asarray(ImageCms.applyTransform(row, transform)).reshape(-1, 3)
+
+
+def colors_to_srgb(
+    uniq: np.ndarray, counts: np.ndarray, quant: int, transform
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Convert quantized (uniq, counts) to sRGB and re-bin onto the quant grid.
+
+    Each cell is converted at its center, the best single stand-in for the
+    pixels it holds; cells that land together have their counts merged.
+    """
+    if transform is None or len(uniq) == 0:
+        return uniq, counts
+    centers = np.minimum(uniq.astype(np.int64) + quant // 2, 255)
+    hist = QuantizedHistogram(quant)
+    hist.update(apply_transform(centers, transform), weights=counts)
+    return hist.colors()
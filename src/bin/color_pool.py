@@ -0,0 +1,206 @@
+"""
+Struct-of-arrays color pool for assign_elements.py and fill_gaps.py.
+
+ColorPool holds a pool table once as contiguous typed columns: L, a, b,
+chroma, hue, frequency and score as float64, the color as a packed
+0xRRGGBB uint32 (`rgb`, the color's identity) and the role as an int8 code
+into ROLES. All table columns are also kept, in their own dtype, for
+output.
+
+Selections are PoolViews: an index array into the pool plus any columns
+derived for that selection (distances computed while choosing). where /
+order_by / head / without only build new index arrays; column data is
+gathered on access and rows become dicts only at the output boundary
+(PoolView.row), with the same fields a DataFrame row would have. Used
+colors are tracked as a ColorSet bitmap of packed keys.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+import numpy as np
+import pandas as pd
+
+from compiled_constraints import ROLE_INDEX
+from lab_convert import hex_to_rgb24, pack_rgb24
+
+FLOAT_COLUMNS = ("L", "a", "b", "chroma", "hue", "frequency", "score")
+
+
+def circ_dist_array(hue: np.ndarray, center: float) -> np.ndarray:
+    d = np.abs(hue - center) % 360.0
+    return np.minimum(d, 360.0 - d)
+
+
+def _native(v: Any) -> Any:
+    return v.item() if isinstance(v, np.generic) else v
+
+
+def pool_keys(frame: pd.DataFrame) -> np.ndarray:
+    """Packed 0xRRGGBB per pool row: the rgb column, else R/G/B, else hex."""
+    if "rgb" in frame.columns:
+        return frame["rgb"].to_numpy().astype(np.uint32)
+    if all(c in frame.columns for c in ("R", "G", "B")):
+        return pack_rgb24(frame[["R", "G", "B"]].to_numpy())
+    return hex_to_rgb24(frame["hex"])
+
+
+class ColorSet:
+    """Set of packed 0xRRGGBB keys, stored as a 2**24-bit bitmap."""
+
+    def __init__(self, keys: Iterable[int] = ()):
+        self.bits = np.zeros(1 << 21, dtype=np.uint8)
+        self.n = 0
+        for k in keys:
+            self.add(k)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __contains__(self, key: int) -> bool:
+        key = int(key)
+        return bool((self.bits[key >> 3] >> (key & 7)) & 1)
+
+    def add(self, key: int) -> None:
+        key = int(key)
+        if key not in self:
+            self.bits[key >> 3] |= np.uint8(1 << (key & 7))
+            self.n += 1
+
+    def contains(self, keys: np.ndarray) -> np.ndarray:
+        """Vectorized membership of an array of keys."""
+        keys = np.asarray(keys, dtype=np.uint32)
+        return ((self.bits[keys >> 3] >> (keys & 7)) & 1).astype(bool)
+
+
+class ColorPool:
+    """One pool table as contiguous typed column arrays."""
+
+    def __init__(self, frame: pd.DataFrame):
+        n = len(frame)
+        self.columns = [str(c) for c in frame.columns]
+        # Output columns keep their dtype; the core columns are float64 copies
+        self.arrays = {str(c): frame[c].to_numpy() for c in frame.columns}
+        self.core = {
+            c: (
+                np.ascontiguousarray(pd.to_numeric(frame[c], errors="coerce"), dtype=float)
+                if c in frame.columns
+                # Missing frequency / score rank everything equal
+                else np.zeros(n)
+            )
+            for c in FLOAT_COLUMNS
+        }
+        self.rgb = pool_keys(frame)
+        self.role = np.array(
+            [ROLE_INDEX.get(r, -1) for r in frame["role"]], dtype=np.int8
+        ).reshape(n)
+
+    def __len__(self) -> int:
+        return len(self.rgb)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.core[name] if name in self.core else self.arrays[name]
+
+    def has(self, name: str) -> bool:
+        return name in self.core or name in self.arrays
+
+    def view(self) -> "PoolView":
+        return PoolView(self, np.arange(len(self)))
+
+    def role_view(self, role: str) -> "PoolView":
+        return PoolView(self, np.flatnonzero(self.role == ROLE_INDEX.get(role, -2)))
+
+
+class PoolView:
+    """Index selection of a ColorPool plus per-selection derived columns."""
+
+    __slots__ = ("pool", "idx", "extra")
+
+    def __init__(
+        self, pool: ColorPool, idx: np.ndarray, extra: dict[str, np.ndarray] | None = None
+    ):
+        self.pool = pool
+        self.idx = idx
+        self.extra = extra or {}
+
+    def __len__(self) -> int:
+        return len(self.idx)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.idx) == 0
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name in self.extra:
+            return self.extra[name]
+        return self.pool[name][self.idx]
+
+    def has(self, name: str) -> bool:
+        return name in self.extra or self.pool.has(name)
+
+    @property
+    def L(self) -> np.ndarray:
+        return self["L"]
+
+    @property
+    def hue(self) -> np.ndarray:
+        return self["hue"]
+
+    @property
+    def rgb(self) -> np.ndarray:
+        return self.pool.rgb[self.idx]
+
+    @property
+    def role(self) -> np.ndarray:
+        return self.pool.role[self.idx]
+
+    def lab(self) -> np.ndarray:
+        return np.stack([self["L"], self["a"], self["b"]], axis=1)
+
+    # --------------------------------------------------------
+    # Selection (new index arrays; column data is not copied)
+    # --------------------------------------------------------
+
+    def select(self, sel) -> "PoolView":
+        """Rows by boolean mask, index array or slice."""
+        return PoolView(self.pool, self.idx[sel], {k: v[sel] for k, v in self.extra.items()})
+
+    def where(self, mask: np.ndarray) -> "PoolView":
+        return self.select(np.asarray(mask, dtype=bool))
+
+    def head(self, k: int) -> "PoolView":
+        return self.select(slice(0, k))
+
+    def without(self, used: ColorSet) -> "PoolView":
+        """Rows whose packed rgb is not in `used`."""
+        if not len(used):
+            return self
+        return self.where(~used.contains(self.rgb))
+
+    def with_column(self, name: str, values: np.ndarray) -> "PoolView":
+        return PoolView(self.pool, self.idx, {**self.extra, name: np.asarray(values)})
+
+    def order_by(self, *keys: tuple[str, bool]) -> "PoolView":
+        """
+        Stable multi-key sort, keys as (column, ascending), most significant
+        first; NaN sorts last within each key (as DataFrame.sort_values).
+        """
+        lex = []
+        for name, ascending in reversed(keys):
+            v = self[name].astype(float)
+            nan = np.isnan(v)
+            lex.append(np.where(nan, 0.0, v if ascending else -v))
+            lex.append(nan)
+        return self.select(np.lexsort(lex))
+
+    # --------------------------------------------------------
+    # Output boundary
+    # --------------------------------------------------------
+
+    def row(self, i: int = 0) -> dict[str, Any]:
+        """Row i as a dict of native values: pool columns, then derived ones."""
+        j = self.idx[i]
+        d = {c: _native(self.pool.arrays[c][j]) for c in self.pool.columns}
+        d.update({k: _native(v[i]) for k, v in self.extra.items()})
+        return d
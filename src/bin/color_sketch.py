@@ -0,0 +1,154 @@
+"""
+Mergeable, serializable color-histogram sketches.
+
+A sketch is the sparse quantized-color histogram extract_color_pool needs
+(plus the histogram of flat-region colors used for the background hue), so
+a theme can be built from many images: sketch each image independently (in
+parallel, on different machines), merge by adding counts, and pass the
+merged sketch to extract_colors.py --sketch.
+
+Sketches are stored as .npz files holding packed grid keys
+(quantize.pack_rgb) and int64 counts. Merging requires equal `quant`.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+
+from image_sampling import STRIP_ROWS, ImageContext
+from quantize import pack_rgb, unpack_keys
+
+SKETCH_VERSION = 1
+
+
+def _merge_sparse(
+    keys: list[np.ndarray], counts: list[np.ndarray]
+) -> tuple[np.ndarray, np.ndarray]:
+    keys = np.concatenate([np.asarray(k, dtype=np.int64) for k in keys])
+    counts = np.concatenate([np.asarray(c, dtype=np.int64) for c in counts])
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    return uniq, np.bincount(inverse, weights=counts).astype(np.int64)
+
+
+class ColorSketch:
+    """Sparse (keys, counts) color + flat-region histograms over one or more images."""
+
+    def __init__(
+        self,
+        quant: int,
+        keys: np.ndarray,
+        counts: np.ndarray,
+        flat_keys: np.ndarray,
+        flat_counts: np.ndarray,
+        sources: list[str],
+    ):
+        self.quant = int(quant)
+        self.keys = np.asarray(keys, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.flat_keys = np.asarray(flat_keys, dtype=np.int64)
+        self.flat_counts = np.asarray(flat_counts, dtype=np.int64)
+        self.sources = list(sources)
+
+    @classmethod
+    def from_image(
+        cls,
+        path: Path,
+        *,
+        quant: int,
+        max_pixels: int | None,
+        sampler: str = "random",
+        seed: int | None = None,
+        rows: int = STRIP_ROWS,
+        color_manage: bool = True,
+    ) -> "ColorSketch":
+        """
+        Sketch one image with the same sampling as extract_color_pool.
+
+        With max_pixels every image contributes ~max_pixels counts (equal
+        weight in a merge); with max_pixels=0 counts scale with image size.
+        """
+        with ImageContext(
+            path,
+            max_pixels=max_pixels,
+            sampler=sampler,
+            seed=seed,
+            rows=rows,
+            color_manage=color_manage,
+        ) as ctx:
+            uniq, counts = ctx.colors(quant)
+            flat_uniq, flat_counts = ctx.flat_colors(quant)
+        return cls(
+            quant,
+            pack_rgb(uniq, quant),
+            counts,
+            pack_rgb(flat_uniq, quant),
+            flat_counts,
+            [str(path)],
+        )
+
+    @classmethod
+    def merge_all(cls, sketches: list["ColorSketch"]) -> "ColorSketch":
+        if not sketches:
+            raise ValueError("No sketches to merge")
+        quants = {s.quant for s in sketches}
+        if len(quants) != 1:
+            raise ValueError(f"Cannot merge sketches with different quant: {sorted(quants)}")
+        keys, counts = _merge_sparse(
+            [s.keys for s in sketches], [s.counts for s in sketches]
+        )
+        flat_keys, flat_counts = _merge_sparse(
+            [s.flat_keys for s in sketches], [s.flat_counts for s in sketches]
+        )
+        sources = [src for s in sketches for src in s.sources]
+        return cls(quants.pop(), keys, counts, flat_keys, flat_counts, sources)
+
+    def merge(self, other: "ColorSketch") -> "ColorSketch":
+        return ColorSketch.merge_all([self, other])
+
+    # Same accessors as ImageContext, so estimators accept either
+
+    def _check_quant(self, quant: int) -> None:
+        if int(quant) != self.quant:
+            raise ValueError(f"Sketch was built with quant={self.quant}, not {quant}")
+
+    def colors(self, quant: int) -> tuple[np.ndarray, np.ndarray]:
+        self._check_quant(quant)
+        return unpack_keys(self.keys, self.quant), self.counts
+
+    def flat_colors(self, quant: int) -> tuple[np.ndarray, np.ndarray]:
+        self._check_quant(quant)
+        return unpack_keys(self.flat_keys, self.quant), self.flat_counts
+
+    def close(self) -> None:
+        pass
+
+    def save(self, path: Path) -> None:
+        # File handle: np.savez would append ".npz" to other suffixes
+        with open(path, "wb") as fh:
+            np.savez_compressed(
+                fh,
+                version=SKETCH_VERSION,
+                quant=self.quant,
+                keys=self.keys,
+                counts=self.counts,
+                flat_keys=self.flat_keys,
+                flat_counts=self.flat_counts,
+                sources=np.array(self.sources, dtype=str),
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> "ColorSketch":
+        with np.load(path, allow_pickle=False) as z:
+            version = int(z["version"])
+            if version != SKETCH_VERSION:
+                raise ValueError(f"{path}: unsupported sketch version {version}")
+            return cls(
+                int(z["quant"]),
+                z["keys"],
+                z["counts"],
+                z["flat_keys"],
+                z["flat_counts"],
+                z["sources"].tolist(),
+            )
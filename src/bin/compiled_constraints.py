@@ -0,0 +1,260 @@
+"""
+Per-palette constraints compiled into flat NumPy arrays.
+
+palette_constraints.json is nested (constraint -> palette -> role -> stat).
+CompiledConstraints resolves one palette once: per-role chroma / lightness
+quantiles, relax deltas, hue windows and the precomputed strict / relaxed
+bounds become (len(ROLES),) or (len(ROLES), k) arrays indexed by ROLE_INDEX,
+and the scalar tables (deltaL pairs, element offsets, text contrast, accent
+separation) become flat dicts of floats. Missing values are NaN.
+
+extract_colors.py, assign_elements.py and fill_gaps.py all build one of
+these per run and look bounds up by role index instead of walking dicts.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+ROLES = (
+    "background",
+    "surface",
+    "overlay",
+    "text",
+    "accent_red",
+    "accent_warm",
+    "accent_cool",
+    "accent_bridge",
+)
+ROLE_INDEX = {r: i for i, r in enumerate(ROLES)}
+STRUCTURAL_ROLES = ROLES[:4]
+ACCENT_ROLES = ROLES[4:]
+
+# Column order of the chroma / lightness stat arrays
+STATS = ("q10", "q25", "median", "q75", "q90")
+Q10, Q25, MEDIAN, Q75, Q90 = range(len(STATS))
+
+# Column order of accent_text_sep
+TEXT_SEP_STATS = ("deltaE_q10", "deltaE_q25", "deltaL_q10", "deltaL_q25")
+
+# Key prefix of each structural role in the photo_lightness / photo_chroma bands
+PHOTO_BAND = {"background": "bg", "surface": "surface", "overlay": "overlay", "text": "text"}
+
+
+def _stat_table(by_role: dict, keys: tuple[str, ...]) -> np.ndarray:
+    out = np.full((len(ROLES), len(keys)), np.nan)
+    for role, stats in by_role.items():
+        if role in ROLE_INDEX:
+            for j, k in enumerate(keys):
+                if k in stats:
+                    out[ROLE_INDEX[role], j] = float(stats[k])
+    return out
+
+
+def _relax_bounds(
+    stats: np.ndarray, relax: np.ndarray, *, upper: float
+) -> np.ndarray:
+    """(roles, 2) relaxed [lo, hi]: q25/q75 widened by relax_delta ((q90-q10)/2 if unset)."""
+    delta = np.where(np.isnan(relax), (stats[:, Q90] - stats[:, Q10]) / 2, relax)
+    lo = np.maximum(0.0, stats[:, Q25] - delta)
+    hi = np.minimum(upper, stats[:, Q75] + delta)
+    return np.stack([lo, hi], axis=1)
+
+
+@dataclass(frozen=True, eq=False)
+class CompiledConstraints:
+    palette: str
+    polarity: Optional[str]
+    chroma: np.ndarray  # (roles, STATS)
+    chroma_relax: np.ndarray  # (roles,) relax_delta
+    lightness: np.ndarray  # (roles, STATS)
+    lightness_relax: np.ndarray  # (roles,)
+    hue_center_: np.ndarray  # (roles,)
+    hue_width_: np.ndarray  # (roles,)
+    hue_relax: np.ndarray  # (roles,) relax_mult
+    deltaL: Dict[str, Tuple[float, float, float]]  # pair -> (q25, median, q75)
+    element_offsets: Dict[str, float]
+    text_contrast: Dict[str, float]  # element -> q25
+    accent_separation: Dict[str, np.ndarray]  # polarity -> (roles,) min
+    accent_text_sep: np.ndarray  # (roles, TEXT_SEP_STATS)
+    background_hue: Tuple[float, float]  # (center, width)
+    ui_hue_max_dist: float
+    # Per-photo metadata attached by the caller (photo_* pool columns)
+    photo: Dict[str, Any] = field(default_factory=dict)
+
+    # Precomputed (roles, 2) [lo, hi] bounds: index 0 strict, 1 relaxed
+    chroma_bounds_: np.ndarray = field(init=False, repr=False)
+    lightness_bounds_: np.ndarray = field(init=False, repr=False)
+    hue_half_: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self):
+        strict_c = self.chroma[:, [Q25, Q75]]
+        strict_l = self.lightness[:, [Q25, Q75]]
+        relax_mult = np.where(np.isnan(self.hue_relax), 1.3, self.hue_relax)
+        half = self.hue_width_ / 2.0
+        # frozen dataclass: derived arrays are set once here
+        object.__setattr__(
+            self,
+            "chroma_bounds_",
+            np.stack([strict_c, _relax_bounds(self.chroma, self.chroma_relax, upper=np.inf)]),
+        )
+        object.__setattr__(
+            self,
+            "lightness_bounds_",
+            np.stack(
+                [strict_l, _relax_bounds(self.lightness, self.lightness_relax, upper=100.0)]
+            ),
+        )
+        object.__setattr__(self, "hue_half_", np.stack([half, half * relax_mult]))
+
+    @classmethod
+    def from_json(cls, constraints_all: dict, palette: str) -> "CompiledConstraints":
+        c = constraints_all["constraints"]
+        chroma = c["chroma"][palette]
+        lightness = c.get("lightness", {}).get(palette, {})
+        hue = c["hue"][palette]
+        bg_hue = c.get("background_hue", {}).get(palette, {})
+        ui_hue = c.get("ui_hue_coherence", {}).get(palette, {})
+
+        accent_sep = {}
+        for pol, by_role in c.get("accent_separation", {}).items():
+            arr = np.full(len(ROLES), np.nan)
+            for role, stats in by_role.items():
+                if role in ROLE_INDEX and "min" in stats:
+                    arr[ROLE_INDEX[role]] = float(stats["min"])
+            accent_sep[pol] = arr
+
+        return cls(
+            palette=palette,
+            polarity=constraints_all.get("polarity", {}).get(palette),
+            chroma=_stat_table(chroma, STATS),
+            chroma_relax=_stat_table(chroma, ("relax_delta",))[:, 0],
+            lightness=_stat_table(lightness, STATS),
+            lightness_relax=_stat_table(lightness, ("relax_delta",))[:, 0],
+            hue_center_=_stat_table(hue, ("center",))[:, 0],
+            hue_width_=_stat_table(hue, ("width",))[:, 0],
+            hue_relax=_stat_table(hue, ("relax_mult",))[:, 0],
+            deltaL={
+                pair: (float(s["q25"]), float(s["median"]), float(s["q75"]))
+                for pair, s in c["deltaL"][palette].items()
+            },
+            element_offsets={
+                k: float(v["value"])
+                for k, v in c.get("element_offsets", {}).get(palette, {}).items()
+                if "value" in v
+            },
+            text_contrast={
+                k: float(v["q25"])
+                for k, v in c.get("text_contrast", {}).get(palette, {}).items()
+                if "q25" in v
+            },
+            accent_separation=accent_sep,
+            accent_text_sep=_stat_table(
+                c.get("accent_text_separation", {}).get(palette, {}), TEXT_SEP_STATS
+            ),
+            background_hue=(
+                float(bg_hue.get("center", math.nan)),
+                float(bg_hue.get("width", math.nan)),
+            ),
+            ui_hue_max_dist=float(ui_hue.get("max_dist", math.nan)),
+        )
+
+    def with_photo(self, photo: Dict[str, Any]) -> "CompiledConstraints":
+        return replace(self, photo=dict(photo))
+
+    # --------------------------------------------------------
+    # Presence
+    # --------------------------------------------------------
+
+    def has_chroma(self, role: str) -> bool:
+        return not math.isnan(self.chroma[ROLE_INDEX[role], Q25])
+
+    def has_lightness(self, role: str) -> bool:
+        return not math.isnan(self.lightness[ROLE_INDEX[role], Q25])
+
+    def has_hue(self, role: str) -> bool:
+        return not math.isnan(self.hue_center_[ROLE_INDEX[role]])
+
+    # --------------------------------------------------------
+    # Bounds (None when the palette has no such constraint)
+    # --------------------------------------------------------
+
+    def chroma_bounds(self, role: str, *, relax: bool) -> Optional[Tuple[float, float]]:
+        lo, hi = self.chroma_bounds_[int(relax), ROLE_INDEX[role]]
+        return None if math.isnan(lo) else (float(lo), float(hi))
+
+    def lightness_bounds(self, role: str, *, relax: bool) -> Optional[Tuple[float, float]]:
+        lo, hi = self.lightness_bounds_[int(relax), ROLE_INDEX[role]]
+        return None if math.isnan(lo) else (float(lo), float(hi))
+
+    def hue_window(self, role: str, *, relax: bool) -> Optional[Tuple[float, float]]:
+        i = ROLE_INDEX[role]
+        if math.isnan(self.hue_center_[i]):
+            return None
+        return float(self.hue_center_[i]), float(self.hue_half_[int(relax), i])
+
+    # --------------------------------------------------------
+    # Scalar lookups
+    # --------------------------------------------------------
+
+    def deltaL_min(self, pair: str) -> float:
+        return self.deltaL[pair][0]
+
+    def deltaL_target(self, pair: str) -> float:
+        return self.deltaL[pair][1]
+
+    def chroma_q25(self, role: str) -> float:
+        return float(self.chroma[ROLE_INDEX[role], Q25])
+
+    def chroma_q75(self, role: str) -> float:
+        return float(self.chroma[ROLE_INDEX[role], Q75])
+
+    def chroma_relax_delta(self, role: str, fallback: float = 8.0) -> float:
+        x = self.chroma_relax[ROLE_INDEX[role]]
+        return fallback if math.isnan(x) else float(x)
+
+    def lightness_q25(self, role: str) -> Optional[float]:
+        x = self.lightness[ROLE_INDEX[role], Q25]
+        return None if math.isnan(x) else float(x)
+
+    def lightness_q75(self, role: str) -> Optional[float]:
+        x = self.lightness[ROLE_INDEX[role], Q75]
+        return None if math.isnan(x) else float(x)
+
+    def lightness_relax_delta(self, role: str, fallback: float = 10.0) -> float:
+        x = self.lightness_relax[ROLE_INDEX[role]]
+        return fallback if math.isnan(x) else float(x)
+
+    def hue_center(self, role: str) -> Optional[float]:
+        x = self.hue_center_[ROLE_INDEX[role]]
+        return None if math.isnan(x) else float(x)
+
+    def hue_width(self, role: str) -> Optional[float]:
+        x = self.hue_width_[ROLE_INDEX[role]]
+        return None if math.isnan(x) else float(x)
+
+    def hue_relax_mult(self, role: str, fallback: float = 1.3) -> float:
+        x = self.hue_relax[ROLE_INDEX[role]]
+        return fallback if math.isnan(x) else float(x)
+
+    def accent_min_deltal(self, role: str, polarity: str, fallback: float) -> float:
+        """Learned minimum L* separation of an accent role (signed, as stored)."""
+        arr = self.accent_separation.get(polarity)
+        if arr is None or math.isnan(arr[ROLE_INDEX[role]]):
+            return fallback
+        return float(arr[ROLE_INDEX[role]])
+
+    def accent_text_separation(self, role: str) -> Tuple[float, float]:
+        """(min deltaE, min |deltaL|) between an accent and text (0.0 if unset)."""
+        row = np.nan_to_num(self.accent_text_sep[ROLE_INDEX[role]], nan=0.0)
+        return float(row[0]), float(row[2])
+
+    def element_offset(self, name: str, fallback: float) -> float:
+        return self.element_offsets.get(name, fallback)
+
+    def text_contrast_min(self, element: str, fallback: float = 35.0) -> float:
+        return self.text_contrast.get(element, fallback)
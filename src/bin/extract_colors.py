@@ -6,27 +6,45 @@ from pathlib import Path
 import click
 import numpy as np
 import pandas as pd
-from PIL import Image
 from rich.console import Console
 from rich.style import Style
 from rich.table import Table
 from rich.text import Text
-from skimage.color import lab2rgb, rgb2lab
+
+from color_distance import DELTA_E_METRICS, delta_e
+from color_sketch import ColorSketch
+from compiled_constraints import (
+    MEDIAN,
+    PHOTO_BAND,
+    Q10,
+    Q25,
+    Q75,
+    Q90,
+    ROLE_INDEX,
+    ROLES,
+    STRUCTURAL_ROLES,
+    CompiledConstraints,
+)
+from image_cache import CachedImage
+from image_sampling import SAMPLERS, STRIP_ROWS, ImageContext
+from lab_convert import (
+    lab_to_lch_batch,
+    lab_to_rgb_batch,
+    lch_to_lab_batch,
+    pack_rgb24,
+    rgb24_to_hex,
+)
+from lab_lut import lab_lookup
+from photo_profile import PhotoProfile
+from pool_io import is_binary_pool, save_pool
+from pool_reduce import reduce_pool
+from weighted_kmeans import weighted_kmeans
 
 # ------------------------------------------------------------
 # Role ordering & display order
 # ------------------------------------------------------------
 
-ROLE_ORDER = [
-    "background",
-    "surface",
-    "overlay",
-    "text",
-    "accent_red",
-    "accent_warm",
-    "accent_cool",
-    "accent_bridge",
-]
+ROLE_ORDER = list(ROLES)
 
 
 def add_ranks(df: pd.DataFrame) -> pd.DataFrame:
@@ -76,44 +94,13 @@ def circular_distance(a, b):
     return min(d, 360 - d)
 
 
-def deltaE76(lab1: np.ndarray, lab2: np.ndarray) -> float:
-    d = lab1 - lab2
-    return float(np.sqrt(np.dot(d, d)))
-
-
 def circ_dist_series(series, center: float) -> pd.Series:
     d = (series - center).abs() % 360
     return np.minimum(d, 360 - d)
 
 
 # ------------------------------------------------------------
-# Lab/LCh helpers
-# ------------------------------------------------------------
-
-
-def lab_to_lch(L, a, b):
-    C = math.sqrt(a * a + b * b)
-    h = math.degrees(math.atan2(b, a)) % 360.0 if C > 1e-9 else 0.0
-    return float(L), float(C), float(h)
-
-
-def lch_to_lab(L, C, h):
-    hr = math.radians(h)
-    a = C * math.cos(hr)
-    b = C * math.sin(hr)
-    return float(L), float(a), float(b)
-
-
-def lab_to_rgb_tuple(L, a, b):
-    lab = np.array([[[L, a, b]]], dtype=float)
-    rgb = lab2rgb(lab)[0, 0, :]
-    rgb = np.clip(rgb, 0.0, 1.0)
-    r, g, bb = (rgb * 255.0 + 0.5).astype(int)
-    return int(r), int(g), int(bb)
-
-
-# ------------------------------------------------------------
-# Dark-hue estimation
+# Hue-band estimation
 # ------------------------------------------------------------
 
 
@@ -126,154 +113,133 @@ def circular_mean_deg_weighted(deg: np.ndarray, w: np.ndarray) -> float:
     return float(np.rad2deg(np.arctan2(s, c)) % 360.0)
 
 
-def dominant_dark_hue(df: pd.DataFrame) -> tuple[float | None, float]:
-    dark = df[(df["L"] <= df["L"].quantile(0.4)) & (df["chroma"] >= 5.0)].copy()
-    if dark.empty:
-        return None, 0.0
+HUE_BINS = 24
+
+# Flat-region histograms with fewer counts than this are not trusted
+FLAT_MIN_COUNT = 200
 
-    bins = np.linspace(0, 360, 25)
-    weights = dark["frequency"].to_numpy() * (dark["chroma"].to_numpy() + 1.0)
-    hist, edges = np.histogram(dark["hue"].to_numpy(), bins=bins, weights=weights)
-    if hist.sum() <= 0:
-        return None, 0.0
 
-    idx = int(hist.argmax())
-    center = (edges[idx] + edges[idx + 1]) / 2.0
-    confidence = float(hist[idx] / hist.sum())
-    return float(center), confidence
+def hue_bin_index(hue: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """np.histogram bin of each hue (edges[i] <= h < edges[i+1], last bin closed)."""
+    idx = np.searchsorted(edges, hue, side="right") - 1
+    return np.minimum(idx, len(edges) - 2)
 
 
-def dominant_hue_band(
+def hue_band_peaks(
     df: pd.DataFrame,
+    flat: tuple[np.ndarray, np.ndarray] | None = None,
     *,
-    mask: pd.Series,
-    bins: int = 24,
-    weight_chroma: bool = True,
-) -> tuple[float | None, float]:
-    sub = df[mask].copy()
-    if sub.empty:
-        return None, 0.0
-
-    weights = sub["frequency"].to_numpy()
-    if weight_chroma:
-        weights = weights * (sub["chroma"].to_numpy() + 1.0)
+    quant: int | None = None,
+    bins: int = HUE_BINS,
+    profile: PhotoProfile | None = None,
+) -> dict[str, tuple[float | None, float]]:
+    """
+    Dominant hue (bin center) and confidence of every hue band in one pass.
+
+    Bands of the color table `df`:
+      - "dark":    L* <= q40 and C >= 5, chroma-weighted (background variety)
+      - "midtone": q30 <= L* <= q85 and C <= C q60 (muted field color)
+      - "warm":    hue 20-110 and C >= max(20, C q75), chroma-weighted
+    plus "flat" from the flat-region (uniq, counts) table when given
+    (needs `quant`). Hues are binned once and every band histogram comes
+    out of a single weighted bincount; a band with no weight is (None, 0.0).
+    Quantiles come from `profile` (built from `df` if not given).
+    """
+    L = df["L"].to_numpy(dtype=float)
+    C = df["chroma"].to_numpy(dtype=float)
+    hue = df["hue"].to_numpy(dtype=float)
+    freq = df["frequency"].to_numpy(dtype=float)
+    chroma_weight = freq * (C + 1.0)
+
+    profile = profile or PhotoProfile.from_table(df)
+    L_q30, L_q40, L_q85 = profile.quantile("L", [0.30, 0.40, 0.85])
+    C_q60, C_q75 = profile.quantile("chroma", [0.60, 0.75])
+
+    names = ["dark", "midtone", "warm"]
+    members = [
+        (L <= L_q40) & (C >= 5.0),
+        (L >= L_q30) & (L <= L_q85) & (C <= C_q60),
+        (hue >= 20) & (hue <= 110) & (C >= max(20.0, C_q75)),
+    ]
+    weights = [chroma_weight, freq, chroma_weight]
+
+    if flat is not None:
+        uniq, counts = flat
+        flat_hue = lab_lookup(uniq, quant)[:, 4] if len(uniq) else np.empty(0)
+        n_df = len(hue)
+        hue = np.concatenate([hue, flat_hue])
+        pad = np.zeros(len(flat_hue), dtype=bool)
+        members = [np.concatenate([m, pad]) for m in members]
+        weights = [np.concatenate([w, np.zeros(len(flat_hue))]) for w in weights]
+        names.append("flat")
+        trusted = counts.sum() >= FLAT_MIN_COUNT
+        members.append(
+            np.concatenate([np.zeros(n_df, dtype=bool), np.full(len(flat_hue), trusted)])
+        )
+        weights.append(np.concatenate([np.zeros(n_df), counts.astype(float)]))
 
     edges = np.linspace(0, 360, bins + 1)
-    hist, edges = np.histogram(sub["hue"].to_numpy(), bins=edges, weights=weights)
-    if hist.sum() <= 0:
-        return None, 0.0
-
-    idx = int(hist.argmax())
-    center = (edges[idx] + edges[idx + 1]) / 2.0
-    confidence = float(hist[idx] / hist.sum())
-    return float(center), confidence
+    member = np.stack(members) & ((hue >= 0.0) & (hue <= 360.0))
+    band, row = np.nonzero(member)
+    hist = np.bincount(
+        band * bins + hue_bin_index(hue, edges)[row],
+        weights=np.stack(weights)[band, row],
+        minlength=len(names) * bins,
+    ).reshape(len(names), bins)
+
+    peaks = {}
+    for name, h in zip(names, hist):
+        total = h.sum()
+        if total <= 0:
+            peaks[name] = (None, 0.0)
+            continue
+        idx = int(h.argmax())
+        center = (edges[idx] + edges[idx + 1]) / 2.0
+        peaks[name] = (float(center), float(h[idx] / total))
+    return peaks
 
 
-def dominant_hue_from_rgb(
-    rgb_pixels: np.ndarray, *, quant: int, bins: int = 24, weight_chroma: bool = True
+def cluster_hue(
+    sub: pd.DataFrame, *, k: int = 3, seed: int | None = 0
 ) -> tuple[float | None, float]:
-    if rgb_pixels.size == 0:
-        return None, 0.0
-
-    rgb = (rgb_pixels // quant) * quant
-    rgb = rgb.astype(np.uint8)
-    uniq, counts = np.unique(rgb, axis=0, return_counts=True)
-    lab = rgb2lab(uniq[np.newaxis, :, :] / 255.0)[0]
-    chroma = np.sqrt(lab[:, 1] ** 2 + lab[:, 2] ** 2)
-    hue = np.degrees(np.arctan2(lab[:, 2], lab[:, 1])) % 360.0
-
-    weights = counts.astype(float)
-    if weight_chroma:
-        weights = weights * (chroma + 1.0)
+    """
+    Hue of the strongest k-means cluster of a color-table subset.
 
-    edges = np.linspace(0, 360, bins + 1)
-    hist, edges = np.histogram(hue, bins=edges, weights=weights)
-    if hist.sum() <= 0:
+    Colors are clustered on (L*, C*, cos h, sin h) weighted by frequency;
+    the cluster with the largest (weight share * mean chroma) wins. Returns
+    (None, 0.0) when there are fewer than k colors.
+    """
+    if len(sub) < k:
         return None, 0.0
 
-    idx = int(hist.argmax())
-    center = (edges[idx] + edges[idx + 1]) / 2.0
-    confidence = float(hist[idx] / hist.sum())
-    return float(center), confidence
+    C = sub["chroma"].to_numpy(dtype=float)
+    h = np.deg2rad(sub["hue"].to_numpy(dtype=float))
+    x = np.stack([sub["L"].to_numpy(dtype=float), C, np.cos(h), np.sin(h)], axis=1)
+    w = sub["frequency"].to_numpy(dtype=float)
+    w = w / w.sum()
 
+    fit = weighted_kmeans(x, w, k, seed=seed)
+    # weight share * weighted mean chroma, per cluster
+    score = np.bincount(fit.labels, weights=w * C, minlength=k)
 
-def dominant_bg_hue_from_image(
-    image_path: Path, *, quant: int
-) -> tuple[float | None, float]:
-    img = Image.open(image_path).convert("RGB")
-    rgb = np.asarray(img).astype(np.float32)
-    gray = rgb[:, :, 0] * 0.299 + rgb[:, :, 1] * 0.587 + rgb[:, :, 2] * 0.114
-    gy, gx = np.gradient(gray)
-    grad = np.hypot(gx, gy)
-    thresh = np.percentile(grad, 35.0)
-    mask = grad <= thresh
-    flat_rgb = rgb[mask]
-    if flat_rgb.shape[0] < 200:
+    best = int(np.argmax(score))
+    if score[best] <= 0.0:
         return None, 0.0
-    return dominant_hue_from_rgb(flat_rgb, quant=quant, weight_chroma=False)
+    cx, sy = fit.centers[best, 2], fit.centers[best, 3]
+    return float(np.rad2deg(np.arctan2(sy, cx)) % 360.0), float(score[best])
 
 
 def kmeans_dark_cluster_hue(
-    df: pd.DataFrame, *, k: int = 3, iters: int = 12
+    df: pd.DataFrame,
+    *,
+    k: int = 3,
+    seed: int | None = 0,
+    profile: PhotoProfile | None = None,
 ) -> tuple[float | None, float]:
-    dark = df[(df["L"] <= df["L"].quantile(0.4)) & (df["chroma"] >= 5.0)].copy()
-    if len(dark) < k:
-        return None, 0.0
-
-    L = dark["L"].to_numpy()
-    C = dark["chroma"].to_numpy()
-    h = np.deg2rad(dark["hue"].to_numpy())
-    x = np.stack([L, C, np.cos(h), np.sin(h)], axis=1)
-    w = dark["frequency"].to_numpy()
-    w = w / w.sum()
-
-    # Initialize centers by weighted sampling
-    idx = np.random.choice(len(x), size=k, replace=False, p=w)
-    centers = x[idx].copy()
-
-    for _ in range(iters):
-        dists = np.sum((x[:, None, :] - centers[None, :, :]) ** 2, axis=2)
-        labels = np.argmin(dists, axis=1)
-        for j in range(k):
-            mask = labels == j
-            if not np.any(mask):
-                continue
-            wj = w[mask]
-            centers[j] = np.sum(x[mask] * wj[:, None], axis=0) / wj.sum()
-
-    # Pick cluster with strongest "useful dark hue" signal
-    best_hue = None
-    best_score = 0.0
-    for j in range(k):
-        mask = labels == j
-        if not np.any(mask):
-            continue
-        wj = w[mask]
-        weight = float(wj.sum())
-        mean_c = float(np.average(C[mask], weights=wj))
-        score = weight * mean_c
-        if score > best_score:
-            best_score = score
-            cx, sy = centers[j][2], centers[j][3]
-            hue = float(np.rad2deg(np.arctan2(sy, cx)) % 360.0)
-            best_hue = hue
-
-    return best_hue, float(best_score)
-
-# ------------------------------------------------------------
-# Image sampling
-# ------------------------------------------------------------
-
-
-def load_image_colors(path: Path, max_pixels: int | None):
-    img = Image.open(path).convert("RGB")
-    rgb = np.asarray(img).reshape(-1, 3)
-
-    if max_pixels and len(rgb) > max_pixels:
-        idx = np.random.choice(len(rgb), max_pixels, replace=False)
-        rgb = rgb[idx]
-
-    return rgb
+    """cluster_hue of the dark colors (L* <= q40, C >= 5)."""
+    L_q40 = (profile or PhotoProfile.from_table(df)).quantile("L", 0.40)
+    dark = df[(df["L"] <= L_q40) & (df["chroma"] >= 5.0)]
+    return cluster_hue(dark, k=k, seed=seed)
 
 
 # ------------------------------------------------------------
@@ -308,84 +274,246 @@ def infer_palette(photo_stats, palette_profiles):
     return best
 
 
-def palette_fit_score(df: pd.DataFrame, constraints_all: dict) -> dict[str, float]:
-    # Midtone hue for palette fit (muted field color)
-    L_q30 = df["L"].quantile(0.30)
-    L_q85 = df["L"].quantile(0.85)
-    C_q60 = df["chroma"].quantile(0.60)
-    bg_mask = (df["L"] >= L_q30) & (df["L"] <= L_q85) & (df["chroma"] <= C_q60)
-    mid_hue, mid_conf = dominant_hue_band(df, mask=bg_mask, weight_chroma=False)
+def role_coverage(
+    df: pd.DataFrame, constraints: CompiledConstraints
+) -> tuple[dict[str, int], dict[str, np.ndarray]]:
+    """Per-role count and L values of the colors eligible under `constraints`."""
+    elig = eligibility_matrix(df, constraints)
+    L = df["L"].to_numpy(dtype=float)
+    role_counts = dict(zip(ROLE_ORDER, elig.sum(axis=0).tolist()))
+    role_L = {r: L[elig[:, i]] for i, r in enumerate(ROLE_ORDER)}
+    return role_counts, role_L
+
+
+# Coverage weight of each role in the palette fit score
+FIT_WEIGHTS = {
+    "background": 3.0,
+    "surface": 3.0,
+    "overlay": 3.0,
+    "text": 3.0,
+    "accent_red": 1.0,
+    "accent_warm": 1.0,
+    "accent_cool": 1.0,
+    "accent_bridge": 1.0,
+}
+
+
+def fit_score(
+    constraints: CompiledConstraints,
+    role_counts: dict[str, int],
+    L_extent: dict[str, tuple[float, float]],
+    mid_hue: float | None,
+    mid_conf: float,
+) -> float:
+    """
+    Palette fit from per-role eligible counts.
 
-    scores = {}
-    palettes = constraints_all["constraints"]["chroma"].keys()
-    for palette in palettes:
-        constraints = {
-            "chroma": constraints_all["constraints"]["chroma"][palette],
-            "hue": constraints_all["constraints"]["hue"][palette],
-            "deltaL": constraints_all["constraints"]["deltaL"][palette],
-            "lightness": constraints_all["constraints"].get("lightness", {}).get(
-                palette, {}
-            ),
-        }
+    `L_extent` holds the (min, max) L* of the eligible background and text
+    colors (read only when their count is non-zero). The score is monotone
+    in the counts and in the extents, so upper bounds in give an upper
+    bound out; a bound with no extent for a counted role skips the
+    contrast term.
+    """
+    coverage = sum(FIT_WEIGHTS[r] * math.log1p(role_counts[r]) for r in ROLE_ORDER)
+
+    missing_structural = any(role_counts[r] == 0 for r in STRUCTURAL_ROLES)
+    if missing_structural:
+        coverage -= 25.0
+        if role_counts["background"] == 0 or role_counts["text"] == 0:
+            coverage -= 50.0
+
+    is_dark = constraints.polarity != "light"
+    min_bt = constraints.deltaL_min("background→text")
+    delta_possible = None
+    if role_counts["background"] and role_counts["text"]:
+        if "background" not in L_extent or "text" not in L_extent:
+            delta_possible = math.inf
+        elif is_dark:
+            delta_possible = L_extent["text"][1] - L_extent["background"][0]
+        else:
+            delta_possible = L_extent["background"][1] - L_extent["text"][0]
 
-        role_counts = {r: 0 for r in ROLE_ORDER}
-        role_L = {r: [] for r in ROLE_ORDER}
-        for _, r in df.iterrows():
-            roles = eligible_roles(r, constraints)
-            for role in roles:
-                role_counts[role] += 1
-                role_L[role].append(float(r.L))
-
-        weights = {
-            "background": 3.0,
-            "surface": 3.0,
-            "overlay": 3.0,
-            "text": 3.0,
-            "accent_red": 1.0,
-            "accent_warm": 1.0,
-            "accent_cool": 1.0,
-            "accent_bridge": 1.0,
-        }
-        coverage = sum(
-            weights[r] * math.log1p(role_counts[r]) for r in ROLE_ORDER
-        )
+    if delta_possible is None or delta_possible < min_bt:
+        coverage -= 15.0
 
-        missing_structural = any(
-            role_counts[r] == 0 for r in ["background", "surface", "overlay", "text"]
-        )
-        if missing_structural:
-            coverage -= 25.0
-            if role_counts["background"] == 0 or role_counts["text"] == 0:
-                coverage -= 50.0
-
-        polarity = constraints_all.get("polarity", {}).get(palette, "dark")
-        is_dark = polarity != "light"
-        min_bt = constraints["deltaL"]["background→text"]["q25"]
-        delta_possible = None
-        if is_dark:
-            if role_L["background"] and role_L["text"]:
-                delta_possible = max(role_L["text"]) - min(role_L["background"])
-        else:
-            if role_L["background"] and role_L["text"]:
-                delta_possible = max(role_L["background"]) - min(role_L["text"])
+    if mid_hue is not None and mid_conf > 0.05:
+        center, width = constraints.background_hue
+        if math.isnan(center):
+            center = mid_hue
+        if math.isnan(width):
+            width = 60.0
+        dist = circular_distance(mid_hue, center)
+        coverage -= (dist / max(20.0, width)) * 5.0
 
-        if delta_possible is None or delta_possible < min_bt:
-            coverage -= 15.0
+    return float(coverage)
 
-        if mid_hue is not None and mid_conf > 0.05:
-            bg_hue = (
-                constraints_all["constraints"]
-                .get("background_hue", {})
-                .get(palette, {})
-            )
-            center = float(bg_hue.get("center", mid_hue))
-            width = float(bg_hue.get("width", 60.0))
-            dist = circular_distance(mid_hue, center)
-            coverage -= (dist / max(20.0, width)) * 5.0
 
-        scores[palette] = float(coverage)
+class CoverageGrid:
+    """
+    Summed-area tables of a color table for O(1) window counts.
+
+    A fine (chroma, L*) table serves the hue-free structural windows and a
+    coarser (chroma, L*, hue) table the accent windows. Boxes are widened to
+    whole bins, so a count is an upper bound on the colors that pass the
+    exact window tests.
+    """
+
+    BINS = (32, 50, 36)  # chroma, L*, hue
+    FINE_BINS = (256, 256)  # chroma, L*
+
+    def __init__(self, df: pd.DataFrame):
+        C = df["chroma"].to_numpy(dtype=float)
+        L = df["L"].to_numpy(dtype=float)
+        hue = df["hue"].to_numpy(dtype=float)
+        c_span = (float(C.max()) if len(C) else 0.0) + 1.0
+        self.step = tuple(s / n for s, n in zip((c_span, 100.0, 360.0), self.BINS))
+        self.fine_step = tuple(s / n for s, n in zip((c_span, 100.0), self.FINE_BINS))
+        self.cum = self._summed_area((C, L, hue), self.step, self.BINS)
+        self.fine_cum = self._summed_area((C, L), self.fine_step, self.FINE_BINS)
+        self.sorted_L = np.sort(L)
+
+    @staticmethod
+    def _bin(v, step: float, n: int):
+        i = np.floor(np.asarray(v, dtype=float) / step)
+        return np.clip(i, 0, n - 1).astype(np.int64)
+
+    @classmethod
+    def _summed_area(cls, cols, steps, bins) -> np.ndarray:
+        idx = [cls._bin(v, s, n) for v, s, n in zip(cols, steps, bins)]
+        counts = np.bincount(
+            np.ravel_multi_index(idx, bins), minlength=int(np.prod(bins))
+        ).reshape(bins)
+        for axis in range(len(bins)):
+            counts = counts.cumsum(axis)
+        cum = np.zeros(tuple(n + 1 for n in bins), dtype=np.int64)
+        cum[(slice(1, None),) * len(bins)] = counts
+        return cum
+
+    @classmethod
+    def _spans(cls, lo: np.ndarray, hi: np.ndarray, step: float, n: int):
+        # [first bin, last bin + 1) covering [lo, hi]; empty (a == b) if hi < lo
+        a = cls._bin(lo, step, n)
+        b = np.where(hi < lo, a, cls._bin(hi, step, n) + 1)
+        return a, b
+
+    @staticmethod
+    def _box(cum: np.ndarray, spans) -> np.ndarray:
+        # Inclusion-exclusion over the 2**d corners, one box per role
+        total = 0
+        for corner in np.ndindex(*(2,) * len(spans)):
+            sign = (-1) ** (len(spans) - sum(corner))
+            total = total + sign * cum[tuple(span[c] for span, c in zip(spans, corner))]
+        return total
+
+    def role_counts(self, w: dict[str, np.ndarray]) -> np.ndarray:
+        """Upper bound on the eligible-color count of every role_windows() role."""
+        # Padded by a hair so float rounding can only over-count
+        half = np.minimum(w["h_half"] + 1e-6, 180.0)
+        full = half >= 180.0
+        lo = np.where(full, 0.0, (w["h_center"] - half) % 360.0)
+        hi = np.where(full, 360.0, (w["h_center"] + half) % 360.0)
+        wraps = lo > hi
+        hue_step, n_hue = self.step[2], self.BINS[2]
+        arc1 = self._spans(lo, np.where(wraps, 360.0, hi), hue_step, n_hue)
+        arc2 = self._spans(np.zeros_like(hi), np.where(wraps, hi, -1.0), hue_step, n_hue)
+
+        C = self._spans(w["C_lo"], w["C_hi"], self.step[0], self.BINS[0])
+        L = self._spans(w["L_lo"], w["L_hi"], self.step[1], self.BINS[1])
+        coarse = self._box(self.cum, [C, L, arc1]) + self._box(self.cum, [C, L, arc2])
+
+        C = self._spans(w["C_lo"], w["C_hi"], self.fine_step[0], self.FINE_BINS[0])
+        L = self._spans(w["L_lo"], w["L_hi"], self.fine_step[1], self.FINE_BINS[1])
+        fine = self._box(self.fine_cum, [C, L])
+
+        return np.where(w["active"], np.where(full, fine, coarse), 0)
+
+    def L_extent(self, L_lo: float, L_hi: float) -> tuple[float, float] | None:
+        """(lowest, highest) L* of the table inside [L_lo, L_hi]; None if none is."""
+        L = self.sorted_L
+        lo = int(np.searchsorted(L, L_lo, side="left"))
+        hi = int(np.searchsorted(L, L_hi, side="right")) - 1
+        if lo > hi:
+            return None
+        return L[lo], L[hi]
+
+
+def fit_score_bound(
+    constraints: CompiledConstraints,
+    grid: CoverageGrid,
+    mid_hue: float | None,
+    mid_conf: float,
+) -> float:
+    """
+    Cheap upper bound on the fit score of a palette.
+
+    Role counts come from box queries on the coverage grid and the
+    background/text L* extents from the lightness windows alone, instead
+    of a full eligibility pass.
+    """
+    w = role_windows(constraints)
+    role_counts = dict(zip(ROLE_ORDER, grid.role_counts(w).tolist()))
+    L_extent = {}
+    for role in ("background", "text"):
+        i = ROLE_ORDER.index(role)
+        if role_counts[role]:
+            extent = grid.L_extent(w["L_lo"][i], w["L_hi"][i])
+            if extent is not None:
+                L_extent[role] = extent
+    return fit_score(constraints, role_counts, L_extent, mid_hue, mid_conf)
+
+
+def palette_fit_score(
+    df: pd.DataFrame,
+    constraints_all: dict,
+    *,
+    top_k: int | None = 3,
+    bands: dict[str, tuple[float | None, float]] | None = None,
+) -> dict[str, float]:
+    """
+    Fit scores of the best `top_k` palettes (all palettes if top_k is None).
+
+    Branch and bound: palettes are visited in order of their cheap upper
+    bound and scoring stops once no remaining bound can reach the current
+    top_k. Returned scores are exact and keep the constraints-file order,
+    so the selected palette and the top_k ranking match exhaustive scoring;
+    pruned palettes are left out. `bands` are hue_band_peaks(df), if
+    already computed.
+    """
+    # Midtone hue for palette fit (muted field color)
+    mid_hue, mid_conf = (bands or hue_band_peaks(df))["midtone"]
+
+    palettes = list(constraints_all["constraints"]["chroma"].keys())
+    compiled = {p: CompiledConstraints.from_json(constraints_all, p) for p in palettes}
+
+    if top_k is None or top_k >= len(palettes):
+        order = palettes
+        bounds = None
+    else:
+        grid = CoverageGrid(df)
+        bounds = {
+            p: fit_score_bound(compiled[p], grid, mid_hue, mid_conf)
+            for p in palettes
+        }
+        order = sorted(palettes, key=bounds.get, reverse=True)
+
+    scores = {}
+    for palette in order:
+        if bounds is not None and len(scores) >= top_k:
+            kth = sorted(scores.values(), reverse=True)[top_k - 1]
+            if bounds[palette] < kth:
+                break  # later bounds are no larger: nothing left can place
+        constraints = compiled[palette]
+        role_counts, role_L = role_coverage(df, constraints)
+        L_extent = {
+            r: (role_L[r].min(), role_L[r].max())
+            for r in ("background", "text")
+            if role_L[r].size
+        }
+        scores[palette] = fit_score(
+            constraints, role_counts, L_extent, mid_hue, mid_conf
+        )
 
-    return scores
+    return {p: scores[p] for p in palettes if p in scores}
 
 
 # ------------------------------------------------------------
@@ -393,103 +521,179 @@ def palette_fit_score(df: pd.DataFrame, constraints_all: dict) -> dict[str, floa
 # ------------------------------------------------------------
 
 
-def eligible_roles(row, constraints):
-    roles = []
+def role_windows(
+    constraints: CompiledConstraints,
+    photo_lightness: dict | None = None,
+    photo_chroma: dict | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    Per-role eligibility windows as (len(ROLE_ORDER),) arrays.
 
-    chroma = row.chroma
-    hue = row.hue
-    L = row.L
+    Chroma / lightness bounds (photo bands merged in), hue center and
+    half-width, and `active` for roles the palette defines. Unchecked sides
+    are +-inf, so every role is tested with the same comparisons.
+    """
+    n = len(ROLE_ORDER)
+    w = {
+        "active": np.zeros(n, dtype=bool),
+        "C_lo": np.full(n, -np.inf),
+        "C_hi": np.full(n, np.inf),
+        "L_lo": np.full(n, -np.inf),
+        "L_hi": np.full(n, np.inf),
+        "h_center": np.zeros(n),
+        "h_half": np.full(n, np.inf),
+    }
+    L_photo = photo_lightness or {}
+    C_photo = photo_chroma or {}
+    chroma, lightness = constraints.chroma, constraints.lightness
 
-    # Core UI roles (lightness-driven via chroma constraints only)
-    for role in ["background", "surface", "overlay", "text"]:
-        if role not in constraints["chroma"]:
-            continue
-        c = constraints["chroma"][role]
-        Lc = constraints.get("lightness", {}).get(role)
-        L_photo = constraints.get("photo_lightness", {})
-        C_photo = constraints.get("photo_chroma", {})
-        if Lc is None:
-            if c["q25"] <= chroma <= c["q75"]:
-                roles.append(role)
+    for i, role in enumerate(ROLE_ORDER):
+        has_L = constraints.has_lightness(role)
+
+        # Core UI roles (lightness-driven via chroma constraints only)
+        if role in STRUCTURAL_ROLES:
+            if not constraints.has_chroma(role):
+                continue
+            w["active"][i] = True
+            C_lo, C_hi = chroma[i, Q25], chroma[i, Q75]
+            if has_L:
+                band = PHOTO_BAND[role]
+                L_lo, L_hi = lightness[i, Q25], lightness[i, Q75]
+                if L_photo:
+                    L_lo = min(L_lo, L_photo.get(f"{band}_low", L_lo))
+                    L_hi = max(L_hi, L_photo.get(f"{band}_high", L_hi))
+                if C_photo:
+                    C_lo = min(C_lo, C_photo.get(f"{band}_low", C_lo))
+                    C_hi = max(C_hi, C_photo.get(f"{band}_high", C_hi))
+                w["L_lo"][i], w["L_hi"][i] = L_lo, L_hi
+            w["C_lo"][i], w["C_hi"][i] = C_lo, C_hi
+
+        # Accent roles (chroma + hue)
         else:
-            L_lo, L_hi = Lc["q25"], Lc["q75"]
-            if L_photo:
-                if role == "background":
-                    L_lo = min(L_lo, L_photo.get("bg_low", L_lo))
-                    L_hi = max(L_hi, L_photo.get("bg_high", L_hi))
-                elif role == "surface":
-                    L_lo = min(L_lo, L_photo.get("surface_low", L_lo))
-                    L_hi = max(L_hi, L_photo.get("surface_high", L_hi))
-                elif role == "overlay":
-                    L_lo = min(L_lo, L_photo.get("overlay_low", L_lo))
-                    L_hi = max(L_hi, L_photo.get("overlay_high", L_hi))
-                elif role == "text":
-                    L_lo = min(L_lo, L_photo.get("text_low", L_lo))
-                    L_hi = max(L_hi, L_photo.get("text_high", L_hi))
-
-            C_lo, C_hi = c["q25"], c["q75"]
+            if not constraints.has_hue(role):
+                continue
+            w["active"][i] = True
+
+            c_lo = chroma[i, Q25]
             if C_photo:
-                if role == "background":
-                    C_lo = min(C_lo, C_photo.get("bg_low", C_lo))
-                    C_hi = max(C_hi, C_photo.get("bg_high", C_hi))
-                elif role == "surface":
-                    C_lo = min(C_lo, C_photo.get("surface_low", C_lo))
-                    C_hi = max(C_hi, C_photo.get("surface_high", C_hi))
-                elif role == "overlay":
-                    C_lo = min(C_lo, C_photo.get("overlay_low", C_lo))
-                    C_hi = max(C_hi, C_photo.get("overlay_high", C_hi))
-                elif role == "text":
-                    C_lo = min(C_lo, C_photo.get("text_low", C_lo))
-                    C_hi = max(C_hi, C_photo.get("text_high", C_hi))
-
-            if C_lo <= chroma <= C_hi and L_lo <= L <= L_hi:
-                roles.append(role)
-
-    # Accent roles (chroma + hue)
-    for role in ["accent_red", "accent_warm", "accent_cool", "accent_bridge"]:
-        if role not in constraints["hue"]:
-            continue
+                c_lo = min(c_lo, C_photo.get("text_high", c_lo))
+            w["C_lo"][i] = c_lo
+            if has_L:
+                w["L_lo"][i], w["L_hi"][i] = lightness[i, Q10], lightness[i, Q90]
 
-        c = constraints["chroma"][role]
-        h = constraints["hue"][role]
-        Lc = constraints.get("lightness", {}).get(role)
-        C_photo = constraints.get("photo_chroma", {})
+            hw = constraints.hue_width_[i]
+            if C_photo and role in ["accent_red", "accent_warm", "accent_cool"]:
+                hw = max(hw, 90.0)
+            w["h_center"][i] = constraints.hue_center_[i]
+            w["h_half"][i] = hw / 2
 
-        c_lo = c["q25"]
-        if C_photo:
-            c_lo = min(c_lo, C_photo.get("text_high", c_lo))
+    return w
 
-        if chroma < c_lo:
-            continue
-        if Lc is not None and not (Lc["q10"] <= L <= Lc["q90"]):
-            continue
 
-        hw = h["width"]
-        if C_photo and role in ["accent_red", "accent_warm", "accent_cool"]:
-            hw = max(hw, 90.0)
+def circ_dist_matrix(hue: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """(n,) hues x (m,) centers -> (n, m) circular distances in degrees."""
+    d = np.abs(hue[:, None] - centers[None, :]) % 360
+    return np.minimum(d, 360 - d)
 
-        if circular_distance(hue, h["center"]) <= hw / 2:
-            roles.append(role)
 
-    return roles
+def eligibility_matrix(
+    df: pd.DataFrame,
+    constraints: CompiledConstraints,
+    photo_lightness: dict | None = None,
+    photo_chroma: dict | None = None,
+) -> np.ndarray:
+    """(n_colors, len(ROLE_ORDER)) bool: color i may fill role j."""
+    w = role_windows(constraints, photo_lightness, photo_chroma)
+    C = df["chroma"].to_numpy(dtype=float)[:, None]
+    L = df["L"].to_numpy(dtype=float)[:, None]
+    hue = df["hue"].to_numpy(dtype=float)
+    return (
+        w["active"][None, :]
+        & (C >= w["C_lo"])
+        & (C <= w["C_hi"])
+        & (L >= w["L_lo"])
+        & (L <= w["L_hi"])
+        & (circ_dist_matrix(hue, w["h_center"]) <= w["h_half"])
+    )
 
 
-def score_color(row, role, constraints):
-    score = row.frequency * 5.0
+def score_matrix(df: pd.DataFrame, constraints: CompiledConstraints) -> np.ndarray:
+    """
+    (n_colors, len(ROLE_ORDER)) role fit of every color.
 
-    if role in constraints["chroma"]:
-        c = constraints["chroma"][role]
-        score -= abs(row.chroma - ((c["q25"] + c["q75"]) / 2))
+    Frequency reward minus the distance to each role's chroma mid-band,
+    L* median and hue center (terms the palette does not define are
+    skipped).
+    """
+    n = len(ROLE_ORDER)
+    c_mid = (constraints.chroma[:, Q25] + constraints.chroma[:, Q75]) / 2
+    L_med = constraints.lightness[:, MEDIAN]
+    h_center = constraints.hue_center_
+    has_c = ~np.isnan(c_mid)
+    has_L = ~np.isnan(L_med)
+    has_h = ~np.isnan(h_center)
+    c_mid, L_med, h_center = (np.nan_to_num(x) for x in (c_mid, L_med, h_center))
+
+    freq = df["frequency"].to_numpy(dtype=float)[:, None]
+    C = df["chroma"].to_numpy(dtype=float)[:, None]
+    L = df["L"].to_numpy(dtype=float)[:, None]
+    hue = df["hue"].to_numpy(dtype=float)
+
+    score = np.broadcast_to(freq * 5.0, (len(df), n)).copy()
+    score -= np.where(has_c, np.abs(C - c_mid), 0.0)
+    score -= np.where(has_L, np.abs(L - L_med) * 0.5, 0.0)
+    score -= np.where(has_h, circ_dist_matrix(hue, h_center) * 0.1, 0.0)
+    return score
 
-    if role in constraints.get("lightness", {}):
-        Lc = constraints["lightness"][role]
-        score -= abs(row.L - Lc["median"]) * 0.5
 
-    if role in constraints["hue"]:
-        h = constraints["hue"][role]
-        score -= circular_distance(row.hue, h["center"]) * 0.1
+def nudge_batch(
+    src: pd.DataFrame, role: str, constraints: CompiledConstraints, *, relax: bool
+) -> pd.DataFrame:
+    """
+    Pull every color of `src` into `role`'s windows in one pass.
 
-    return score
+    L* and chroma are clamped to the (relaxed) bounds and off-window hues
+    snap to the role's hue center; the results are converted back to RGB
+    in a single lab_to_rgb_batch call and scored with score_matrix.
+    """
+    L, C, h = lab_to_lch_batch(src[["L", "a", "b"]].to_numpy(dtype=float))
+
+    bounds = constraints.lightness_bounds(role, relax=relax)
+    if bounds is not None:
+        lo, hi = bounds
+        L = np.where(L < lo, lo, np.where(L > hi, hi, L))
+
+    bounds = constraints.chroma_bounds(role, relax=relax)
+    if bounds is not None:
+        lo, hi = bounds
+        C = np.where(C < lo, lo, np.where(C > hi, hi, C))
+
+    window = constraints.hue_window(role, relax=relax)
+    if window is not None:
+        center, half = window
+        off = circ_dist_matrix(h, np.array([center]))[:, 0] > half
+        h = np.where(off, center, h)
+
+    lab = lch_to_lab_batch(L, C, h)
+    rgb, _ = lab_to_rgb_batch(lab)
+    a, b = lab[:, 1], lab[:, 2]
+    out = pd.DataFrame(
+        {
+            "R": rgb[:, 0].astype(np.int64),
+            "G": rgb[:, 1].astype(np.int64),
+            "B": rgb[:, 2].astype(np.int64),
+            "L": lab[:, 0],
+            "a": a,
+            "b": b,
+            "chroma": np.sqrt(a * a + b * b),
+            "hue": np.degrees(np.arctan2(b, a)) % 360.0,
+            "frequency": src["frequency"].to_numpy(dtype=float),
+        }
+    )
+    out["role"] = role
+    out["derived"] = True
+    out["score"] = score_matrix(out, constraints)[:, ROLE_INDEX[role]]
+    return out
 
 
 def pick_anchor(pool: pd.DataFrame, role: str) -> pd.Series | None:
@@ -607,210 +811,162 @@ def save_pool_table_image(pool: pd.DataFrame, out_path: Path, *, max_per_role: i
 
 
 # ------------------------------------------------------------
-# CLI
+# Pool construction
 # ------------------------------------------------------------
 
+# Column order (authoritative)
+POOL_COLUMNS = [
+    "color_id",
+    "palette",
+    "role",
+    "derived",
+    "rgb",
+    "hex",
+    "R",
+    "G",
+    "B",
+    "L",
+    "a",
+    "b",
+    "chroma",
+    "hue",
+    "frequency",
+    "score",
+    "L_rank",
+    "chroma_rank",
+    "deltaE_bg",
+    "deltaL_bg",
+    "abs_deltaL_bg",
+    "deltaE_bg_rank",
+    "abs_deltaL_bg_rank",
+]
 
-@click.command()
-@click.argument("image_path", type=click.Path(exists=True, path_type=Path))
-@click.option(
-    "--constraints-json",
-    type=click.Path(exists=True, path_type=Path),
-    required=True,
-)
-@click.option(
-    "--palette",
-    type=click.Choice(
-        ["auto", "latte", "frappe", "macchiato", "mocha"], case_sensitive=False
-    ),
-    default="auto",
-    show_default=True,
-)
-@click.option("--max-pixels", default=100_000, show_default=True)
-@click.option("--quant", default=8, show_default=True)
-@click.option(
-    "--out-csv",
-    default="color_pool.csv",
-    show_default=True,
-    type=click.Path(path_type=Path),
-)
-@click.option(
-    "--out-image",
-    default=None,
-    type=click.Path(dir_okay=False, path_type=Path),
-    help="Save extracted color pool table as image (.svg or .png).",
-)
-@click.option(
-    "--max-per-role",
-    default=12,
-    show_default=True,
-    type=int,
-    help="Max rows per role in output table image.",
-)
-@click.option(
-    "--cool-min-deltae",
-    default=25.0,
-    show_default=True,
-    type=float,
-    help="Minimum Lab deltaE from background for accent_cool (foreground safety).",
-)
-@click.option(
-    "--cool-min-abs-deltal",
-    default=12.0,
-    show_default=True,
-    type=float,
-    help="Minimum absolute deltaL from background for accent_cool (foreground safety).",
-)
-@click.option(
-    "--cool-soft-min-deltal",
-    default=18.0,
-    show_default=True,
-    type=float,
-    help="Soft penalty threshold: accent_cool below bg_L + this gets penalized.",
-)
-@click.option(
-    "--min-role-candidates",
-    default=10,
-    show_default=True,
-    type=int,
-    help="Minimum candidate colors per role (nudges added if needed).",
-)
-@click.option(
-    "--nudge-samples",
-    default=300,
-    show_default=True,
-    type=int,
-    help="Number of source colors to sample when nudging missing roles.",
-)
-@click.option(
-    "--debug-log",
-    default=None,
-    type=click.Path(dir_okay=False, path_type=Path),
-    help="Write role filter diagnostics to this log file.",
-)
-def extract_color_pool(
-    image_path,
-    constraints_json,
-    palette,
-    max_pixels,
-    quant,
-    out_csv,
-    out_image,
-    max_per_role,
-    cool_min_deltae,
-    cool_min_abs_deltal,
-    cool_soft_min_deltal,
-    min_role_candidates,
-    nudge_samples,
-    debug_log,
-):
-    """
-    Build a role-aware color pool from a photo using learned palette constraints.
-    """
-
-    constraints_all = json.loads(constraints_json.read_text())
-    palette_profiles = constraints_all["profiles"]
-
-    # --------------------------------------------------------
-    # Sample image
-    # --------------------------------------------------------
-
-    rgb = load_image_colors(image_path, max_pixels)
-    rgb = (rgb // quant) * quant
-    rgb = rgb.astype(np.uint8)
 
-    uniq, counts = np.unique(rgb, axis=0, return_counts=True)
+def color_table(uniq: np.ndarray, counts: np.ndarray, *, quant: int) -> pd.DataFrame:
+    """Quantized colors + counts -> R, G, B, L, a, b, count, frequency, chroma, hue."""
     freq = counts / counts.sum()
 
-    lab = rgb2lab(uniq[np.newaxis, :, :] / 255.0)[0]
+    # Lab + LCh from the memory-mapped lookup table (no per-run rgb2lab)
+    lch = lab_lookup(uniq, quant)
 
     df = pd.DataFrame(
         {
             "R": uniq[:, 0],
             "G": uniq[:, 1],
             "B": uniq[:, 2],
-            "L": lab[:, 0],
-            "a": lab[:, 1],
-            "b": lab[:, 2],
+            "L": lch[:, 0],
+            "a": lch[:, 1],
+            "b": lch[:, 2],
+            "count": counts,
             "frequency": freq,
         }
     )
 
-    df["chroma"] = np.sqrt(df.a**2 + df.b**2)
-    df["hue"] = np.degrees(np.arctan2(df.b, df.a)) % 360.0
+    df["chroma"] = lch[:, 3]
+    df["hue"] = lch[:, 4]
+    return df
 
-    # --------------------------------------------------------
-    # Photo stats → palette choice
-    # --------------------------------------------------------
 
-    photo_stats = {
-        "L_median": df.L.median(),
-        "L_range": df.L.quantile(0.9) - df.L.quantile(0.1),
-        "chroma_median": df.chroma.median(),
-        "hue_entropy": np.histogram(df.hue, bins=12, density=True)[0].var(),
-    }
+def select_palette(
+    df: pd.DataFrame,
+    constraints_all: dict,
+    palette: str,
+    bands: dict[str, tuple[float | None, float]] | None = None,
+) -> tuple[str, dict[str, float] | None]:
+    """Resolve palette="auto" to the best-fitting palette (fit scores or None)."""
+    if palette != "auto":
+        return palette, None
+    fit_scores = palette_fit_score(df, constraints_all, bands=bands)
+    return max(fit_scores, key=fit_scores.get), fit_scores
+
+
+def fit_margin(fit_scores: dict[str, float] | None) -> float:
+    """Score gap between the best and runner-up palette (inf if not auto)."""
+    if not fit_scores or len(fit_scores) < 2:
+        return float("inf")
+    top = sorted(fit_scores.values(), reverse=True)
+    return float(top[0] - top[1])
+
+
+def missing_structural_roles(
+    df: pd.DataFrame, constraints_all: dict, palette: str
+) -> list[str]:
+    """Structural roles with no eligible color (palette_fit_score's penalty case)."""
+    role_counts, _ = role_coverage(
+        df, CompiledConstraints.from_json(constraints_all, palette)
+    )
+    return [r for r in STRUCTURAL_ROLES if role_counts[r] == 0]
 
-    fit_scores = None
-    if palette == "auto":
-        fit_scores = palette_fit_score(df, constraints_all)
-        palette = max(fit_scores, key=fit_scores.get)
 
-    console = Console()
+def print_palette_choice(
+    console: Console, palette: str, fit_scores: dict[str, float] | None, *, label: str
+):
     if fit_scores is None:
-        console.print(f"\n🎨 Selected palette constraints: [bold]{palette}[/bold]\n")
+        console.print(f"\n🎨 {label} palette constraints: [bold]{palette}[/bold]\n")
     else:
         top = sorted(fit_scores.items(), key=lambda x: x[1], reverse=True)[:3]
         fit_msg = ", ".join([f"{p}:{s:.1f}" for p, s in top])
         console.print(
-            f"\n🎨 Selected palette constraints: [bold]{palette}[/bold] ({fit_msg})\n"
+            f"\n🎨 {label} palette constraints: [bold]{palette}[/bold] ({fit_msg})\n"
         )
 
-    constraints = {
-        "chroma": constraints_all["constraints"]["chroma"][palette],
-        "hue": constraints_all["constraints"]["hue"][palette],
-        "deltaL": constraints_all["constraints"]["deltaL"][palette],
-        "lightness": constraints_all["constraints"].get("lightness", {}).get(
-            palette, {}
-        ),
-    }
+
+def build_color_pool(
+    df: pd.DataFrame,
+    constraints_all: dict,
+    palette: str,
+    *,
+    bands: dict[str, tuple[float | None, float]],
+    cool_min_deltae: float,
+    cool_min_abs_deltal: float,
+    cool_soft_min_deltal: float,
+    min_role_candidates: int,
+    nudge_samples: int,
+    seed: int | None,
+    delta_e_metric: str = "de76",
+    dedupe_deltae: float = 0.0,
+    role_cap: int = 0,
+    debug_log: Path | None = None,
+    profile: PhotoProfile | None = None,
+) -> pd.DataFrame:
+    """
+    Role-aware pool (POOL_COLUMNS) for one color table.
+
+    `bands` are hue_band_peaks(df, ...); without a "flat" band (or with a
+    low-confidence one) the background hue falls back to the midtone band.
+    Quantiles come from `profile` (built from `df` if not given), and the
+    per-photo metadata assign_elements.py reads is stored in its `stats`.
+    Eligible candidates are merged within `dedupe_deltae` and capped at
+    `role_cap` per role (0 disables either) before missing roles are nudged.
+    """
+
+    profile = profile or PhotoProfile.from_table(df)
+    constraints = CompiledConstraints.from_json(constraints_all, palette)
 
     # --------------------------------------------------------
     # Dark hue estimates (for background variety)
     # --------------------------------------------------------
 
-    dark_hue, dark_hue_conf = dominant_dark_hue(df)
-    dark_cluster_hue, dark_cluster_score = kmeans_dark_cluster_hue(df)
+    dark_hue, dark_hue_conf = bands["dark"]
+    dark_cluster_hue, dark_cluster_score = kmeans_dark_cluster_hue(
+        df, seed=seed, profile=profile
+    )
 
     # Background hue from low-gradient pixels (flat areas)
-    bg_hue, bg_hue_conf = dominant_bg_hue_from_image(image_path, quant=quant)
+    bg_hue, bg_hue_conf = bands.get("flat", (None, 0.0))
 
     # Fallback: muted midtones (captures cool fields if gradient mask fails)
-    L_q30 = df["L"].quantile(0.30)
-    L_q85 = df["L"].quantile(0.85)
-    C_q60 = df["chroma"].quantile(0.60)
-    bg_mask = (df["L"] >= L_q30) & (df["L"] <= L_q85) & (df["chroma"] <= C_q60)
     if bg_hue is None or bg_hue_conf <= 0.05:
-        bg_hue, bg_hue_conf = dominant_hue_band(
-            df, mask=bg_mask, weight_chroma=False
-        )
+        bg_hue, bg_hue_conf = bands["midtone"]
 
     # Photo-driven lightness bands to keep base/surface/overlay/text usable
-    L_q15 = float(df["L"].quantile(0.15))
-    L_q25 = float(df["L"].quantile(0.25))
-    L_q35 = float(df["L"].quantile(0.35))
-    L_q50 = float(df["L"].quantile(0.50))
-    L_q65 = float(df["L"].quantile(0.65))
-    L_q75 = float(df["L"].quantile(0.75))
-    L_q85 = float(df["L"].quantile(0.85))
-
-    C_q10 = float(df["chroma"].quantile(0.10))
-    C_q20 = float(df["chroma"].quantile(0.20))
-    C_q30 = float(df["chroma"].quantile(0.30))
-    C_q40 = float(df["chroma"].quantile(0.40))
-    C_q50 = float(df["chroma"].quantile(0.50))
-    C_q60 = float(df["chroma"].quantile(0.60))
-    C_q70 = float(df["chroma"].quantile(0.70))
-    C_q80 = float(df["chroma"].quantile(0.80))
+    L_q15, L_q25, L_q30, L_q35, L_q40, L_q50, L_q65, L_q75, L_q85 = map(
+        float,
+        profile.quantile("L", [0.15, 0.25, 0.30, 0.35, 0.40, 0.50, 0.65, 0.75, 0.85]),
+    )
+    C_q10, C_q20, C_q30, C_q40, C_q50, C_q60, C_q80 = map(
+        float, profile.quantile("chroma", [0.10, 0.20, 0.30, 0.40, 0.50, 0.60, 0.80])
+    )
 
     photo_lightness = {
         "bg_low": L_q15,
@@ -832,126 +988,64 @@ def extract_color_pool(
         "text_low": C_q40,
         "text_high": C_q80,
     }
-    L_q40 = df["L"].quantile(0.40)
-    C_median = df["chroma"].median()
+    C_median = profile.median("chroma")
 
     # Warm accent hue from high-chroma warm range
-    C_q75 = df["chroma"].quantile(0.75)
-    warm_mask = (
-        (df["hue"] >= 20) & (df["hue"] <= 110) & (df["chroma"] >= max(20.0, C_q75))
-    )
-    warm_hue, warm_hue_conf = dominant_hue_band(df, mask=warm_mask, weight_chroma=True)
-
-    # --------------------------------------------------------
-    # Photo-driven lightness bands for role eligibility
-    # --------------------------------------------------------
-
-    constraints["photo_lightness"] = photo_lightness
-    constraints["photo_chroma"] = photo_chroma
+    warm_hue, warm_hue_conf = bands["warm"]
 
     # --------------------------------------------------------
     # Initial role eligibility + scoring
     # --------------------------------------------------------
 
-    rows = []
-    for _, r in df.iterrows():
-        roles = eligible_roles(r, constraints)
-        for role in roles:
-            rows.append(
-                {
-                    **r.to_dict(),
-                    "role": role,
-                    "score": score_color(r, role, constraints),
-                }
-            )
+    # Photo-driven lightness bands widen structural-role eligibility
+    elig = eligibility_matrix(df, constraints, photo_lightness, photo_chroma)
+    scores = score_matrix(df, constraints)
+    color_idx, role_idx = np.nonzero(elig)
 
-    pool = pd.DataFrame(rows)
+    # One row per (color, eligible role), colors in df order, roles in ROLE_ORDER
+    pool = df.iloc[color_idx].astype(float).reset_index(drop=True)
+    pool["role"] = np.asarray(ROLE_ORDER, dtype=object)[role_idx]
+    pool["score"] = scores[color_idx, role_idx]
     if pool.empty:
         pool = pd.DataFrame(columns=df.columns.tolist() + ["role", "score"])
     else:
         pool["derived"] = False
+    pool = reduce_pool(pool, dedupe_deltae=dedupe_deltae, max_per_role=role_cap)
 
     if debug_log is not None:
-        constraints_dbg = constraints
-
-        def count_role(mask):
-            return df[mask].shape[0]
+        w = role_windows(constraints, photo_lightness, photo_chroma)
+        C = df["chroma"].to_numpy(dtype=float)
+        L = df["L"].to_numpy(dtype=float)
+        hue = df["hue"].to_numpy(dtype=float)
+        nan = float("nan")
 
         logs = []
         logs.append(f"palette={palette}")
 
-        for role in ["background", "surface", "overlay", "text"]:
-            c = constraints_dbg["chroma"][role]
-            l = constraints_dbg.get("lightness", {}).get(role, {})
-            L_photo = constraints_dbg.get("photo_lightness", {})
-            C_photo = constraints_dbg.get("photo_chroma", {})
-            c_lo, c_hi = c["q25"], c["q75"]
-            if C_photo:
-                if role == "background":
-                    c_lo = min(c_lo, C_photo.get("bg_low", c_lo))
-                    c_hi = max(c_hi, C_photo.get("bg_high", c_hi))
-                elif role == "surface":
-                    c_lo = min(c_lo, C_photo.get("surface_low", c_lo))
-                    c_hi = max(c_hi, C_photo.get("surface_high", c_hi))
-                elif role == "overlay":
-                    c_lo = min(c_lo, C_photo.get("overlay_low", c_lo))
-                    c_hi = max(c_hi, C_photo.get("overlay_high", c_hi))
-                elif role == "text":
-                    c_lo = min(c_lo, C_photo.get("text_low", c_lo))
-                    c_hi = max(c_hi, C_photo.get("text_high", c_hi))
-            c_mask = (df["chroma"] >= c_lo) & (df["chroma"] <= c_hi)
-
-            if l:
-                l_lo, l_hi = l["q25"], l["q75"]
-                if L_photo:
-                    if role == "background":
-                        l_lo = min(l_lo, L_photo.get("bg_low", l_lo))
-                        l_hi = max(l_hi, L_photo.get("bg_high", l_hi))
-                    elif role == "surface":
-                        l_lo = min(l_lo, L_photo.get("surface_low", l_lo))
-                        l_hi = max(l_hi, L_photo.get("surface_high", l_hi))
-                    elif role == "overlay":
-                        l_lo = min(l_lo, L_photo.get("overlay_low", l_lo))
-                        l_hi = max(l_hi, L_photo.get("overlay_high", l_hi))
-                    elif role == "text":
-                        l_lo = min(l_lo, L_photo.get("text_low", l_lo))
-                        l_hi = max(l_hi, L_photo.get("text_high", l_hi))
-                l_mask = (df["L"] >= l_lo) & (df["L"] <= l_hi)
+        for i, role in enumerate(ROLE_ORDER):
+            has_L = constraints.has_lightness(role)
+            c_mask = (C >= w["C_lo"][i]) & (C <= w["C_hi"][i])
+            l_mask = (L >= w["L_lo"][i]) & (L <= w["L_hi"][i])
+            l_lo, l_hi = (w["L_lo"][i], w["L_hi"][i]) if has_L else (nan, nan)
+            if role in STRUCTURAL_ROLES:
+                logs.append(
+                    f"{role}: chroma_q25={w['C_lo'][i]:.2f} q75={w['C_hi'][i]:.2f} "
+                    f"light_q25={l_lo:.2f} light_q75={l_hi:.2f} "
+                    f"c_pass={c_mask.sum()} l_pass={l_mask.sum()} "
+                    f"both_pass={(c_mask & l_mask).sum()}"
+                )
             else:
-                l_lo, l_hi = float("nan"), float("nan")
-                l_mask = pd.Series([True] * len(df))
-            logs.append(
-                f"{role}: chroma_q25={c_lo:.2f} q75={c_hi:.2f} "
-                f"light_q25={l_lo:.2f} light_q75={l_hi:.2f} "
-                f"c_pass={count_role(c_mask)} l_pass={count_role(l_mask)} "
-                f"both_pass={count_role(c_mask & l_mask)}"
-            )
-
-        for role in ["accent_red", "accent_warm", "accent_cool", "accent_bridge"]:
-            c = constraints_dbg["chroma"][role]
-            h = constraints_dbg["hue"][role]
-            l = constraints_dbg.get("lightness", {}).get(role, {})
-            C_photo = constraints_dbg.get("photo_chroma", {})
-            c_lo = c["q25"]
-            if C_photo:
-                c_lo = min(c_lo, C_photo.get("text_high", c_lo))
-            c_mask = df["chroma"] >= c_lo
-            if l:
-                l_mask = (df["L"] >= l["q10"]) & (df["L"] <= l["q90"])
-            else:
-                l_mask = pd.Series([True] * len(df))
-            h_width = h["width"]
-            if C_photo and role in ["accent_red", "accent_warm", "accent_cool"]:
-                h_width = max(h_width, 90.0)
-            h_mask = circ_dist_series(df["hue"], h["center"]) <= (h_width / 2.0)
-            logs.append(
-                f"{role}: chroma_q25={c_lo:.2f} "
-                f"light_q10={l.get('q10', float('nan')):.2f} "
-                f"light_q90={l.get('q90', float('nan')):.2f} "
-                f"h_center={h['center']:.1f} h_width={h_width:.1f} "
-                f"c_pass={count_role(c_mask)} l_pass={count_role(l_mask)} "
-                f"h_pass={count_role(h_mask)} both_pass={count_role(c_mask & l_mask & h_mask)}"
-            )
+                h_mask = circ_dist_matrix(hue, w["h_center"][i : i + 1])[:, 0] <= (
+                    w["h_half"][i]
+                )
+                logs.append(
+                    f"{role}: chroma_q25={w['C_lo'][i]:.2f} "
+                    f"light_q10={l_lo:.2f} "
+                    f"light_q90={l_hi:.2f} "
+                    f"h_center={w['h_center'][i]:.1f} h_width={2 * w['h_half'][i]:.1f} "
+                    f"c_pass={c_mask.sum()} l_pass={l_mask.sum()} "
+                    f"h_pass={h_mask.sum()} both_pass={(c_mask & l_mask & h_mask).sum()}"
+                )
 
         debug_log.write_text("\n".join(logs) + "\n")
 
@@ -959,78 +1053,13 @@ def extract_color_pool(
     # Nudge missing roles to ensure candidate coverage
     # --------------------------------------------------------
 
-    def nudge_into_role(row, role, *, relax: bool):
-        L0, a0, b0 = float(row.L), float(row.a), float(row.b)
-        L, C, h = lab_to_lch(L0, a0, b0)
-
-        if role in constraints.get("lightness", {}):
-            l = constraints["lightness"][role]
-            q25 = float(l["q25"])
-            q75 = float(l["q75"])
-            if relax:
-                relax_delta = float(l.get("relax_delta", (l["q90"] - l["q10"]) / 2))
-                q25 = max(0.0, q25 - relax_delta)
-                q75 = min(100.0, q75 + relax_delta)
-            if L < q25:
-                L = q25
-            elif L > q75:
-                L = q75
-
-        if role in constraints["chroma"]:
-            c = constraints["chroma"][role]
-            q25 = float(c["q25"])
-            q75 = float(c["q75"])
-            if relax:
-                relax_delta = float(c.get("relax_delta", (c["q90"] - c["q10"]) / 2))
-                q25 = max(0.0, q25 - relax_delta)
-                q75 = q75 + relax_delta
-            if C < q25:
-                C = q25
-            elif C > q75:
-                C = q75
-
-        if role in constraints["hue"]:
-            hinfo = constraints["hue"][role]
-            center = float(hinfo["center"])
-            half = float(hinfo["width"]) / 2.0
-            mult = float(hinfo.get("relax_mult", 1.3)) if relax else 1.0
-            half *= mult
-            if circular_distance(h, center) > half:
-                h = center
-
-        L2, a2, b2 = lch_to_lab(L, C, h)
-        r, g, b = lab_to_rgb_tuple(L2, a2, b2)
-        return {
-            "R": r,
-            "G": g,
-            "B": b,
-            "L": L2,
-            "a": a2,
-            "b": b2,
-            "chroma": math.sqrt(a2 * a2 + b2 * b2),
-            "hue": math.degrees(math.atan2(b2, a2)) % 360.0,
-            "frequency": float(row.frequency),
-            "role": role,
-            "derived": True,
-        }
-
-    roles = [
-        "background",
-        "surface",
-        "overlay",
-        "text",
-        "accent_red",
-        "accent_warm",
-        "accent_cool",
-        "accent_bridge",
-    ]
-
     # broader sample: weighted random + high frequency head
+    rng = np.random.default_rng(seed)
     sample_n = min(nudge_samples, len(df))
     if sample_n > 0:
         prob = df["frequency"].to_numpy()
         prob = prob / prob.sum()
-        rand_idx = np.random.choice(len(df), size=sample_n, replace=False, p=prob)
+        rand_idx = rng.choice(len(df), size=sample_n, replace=False, p=prob)
         head_n = min(200, len(df))
         head_idx = df["frequency"].nlargest(head_n).index.to_numpy()
         src = pd.concat(
@@ -1039,23 +1068,18 @@ def extract_color_pool(
     else:
         src = df.copy()
 
-    nudged_rows = []
-    for role in roles:
+    nudged = []
+    for role in ROLE_ORDER:
         have = int((pool["role"] == role).sum()) if not pool.empty else 0
         need = max(0, min_role_candidates - have)
         if need == 0:
             continue
-        for _, r in src.sample(frac=1.0).iterrows():
-            cand = nudge_into_role(r, role, relax=True)
-            score_row = type("Row", (), cand)()
-            cand["score"] = score_color(score_row, role, constraints)
-            nudged_rows.append(cand)
-            need -= 1
-            if need == 0:
-                break
-
-    if nudged_rows:
-        pool = pd.concat([pool, pd.DataFrame(nudged_rows)], ignore_index=True)
+        # First `need` colors of a fresh shuffle, nudged as one batch
+        cands = src.sample(frac=1.0, random_state=rng).iloc[:need]
+        nudged.append(nudge_batch(cands, role, constraints, relax=True))
+
+    if nudged:
+        pool = pd.concat([pool, *nudged], ignore_index=True)
     if "derived" not in pool.columns:
         pool["derived"] = False
 
@@ -1070,11 +1094,10 @@ def extract_color_pool(
     bg_lab = np.array([bg.L, bg.a, bg.b], dtype=float)
     bg_L = float(bg.L)
 
-    # Compute separation from background for all rows
-    pool["deltaE_bg"] = pool.apply(
-        lambda r: deltaE76(np.array([r.L, r.a, r.b], dtype=float), bg_lab),
-        axis=1,
-    )
+    # Compute separation from background for all rows (bg is the reference)
+    pool["deltaE_bg"] = delta_e(
+        bg_lab, pool[["L", "a", "b"]].to_numpy(dtype=float), delta_e_metric
+    )[0]
     pool["deltaL_bg"] = pool["L"] - bg_L
     pool["abs_deltaL_bg"] = pool["deltaL_bg"].abs()
 
@@ -1127,42 +1150,38 @@ def extract_color_pool(
     # --------------------------------------------------------
 
     pool = pool.reset_index(drop=True)
-    pool["hex"] = pool.apply(lambda r: rgb_to_hex((r.R, r.G, r.B)), axis=1)
+    # Packed 0xRRGGBB is the color's identity; hex is for the written pool only
+    pool["rgb"] = pack_rgb24(pool[["R", "G", "B"]].to_numpy())
+    pool["hex"] = rgb24_to_hex(pool["rgb"])
     pool["palette"] = palette
-    pool["photo_dark_hue"] = dark_hue
-    pool["photo_dark_hue_conf"] = dark_hue_conf
-    pool["photo_dark_cluster_hue"] = dark_cluster_hue
-    pool["photo_dark_cluster_score"] = dark_cluster_score
-    pool["photo_bg_hue"] = bg_hue
-    pool["photo_bg_hue_conf"] = bg_hue_conf
-    pool["photo_L_q30"] = float(L_q30)
-    pool["photo_L_q40"] = float(L_q40)
-    pool["photo_C_median"] = float(C_median)
-    pool["photo_warm_hue"] = warm_hue
-    pool["photo_warm_hue_conf"] = warm_hue_conf
-    pool["photo_L_q15"] = float(L_q15)
-    pool["photo_L_q25"] = float(L_q25)
-    pool["photo_L_q35"] = float(L_q35)
-    pool["photo_L_q50"] = float(L_q50)
-    pool["photo_L_q65"] = float(L_q65)
-    pool["photo_L_q75"] = float(L_q75)
-    pool["photo_L_q85"] = float(L_q85)
-    pool["photo_lightness_bg_low"] = float(photo_lightness["bg_low"])
-    pool["photo_lightness_bg_high"] = float(photo_lightness["bg_high"])
-    pool["photo_lightness_surface_low"] = float(photo_lightness["surface_low"])
-    pool["photo_lightness_surface_high"] = float(photo_lightness["surface_high"])
-    pool["photo_lightness_overlay_low"] = float(photo_lightness["overlay_low"])
-    pool["photo_lightness_overlay_high"] = float(photo_lightness["overlay_high"])
-    pool["photo_lightness_text_low"] = float(photo_lightness["text_low"])
-    pool["photo_lightness_text_high"] = float(photo_lightness["text_high"])
-    pool["photo_chroma_bg_low"] = float(photo_chroma["bg_low"])
-    pool["photo_chroma_bg_high"] = float(photo_chroma["bg_high"])
-    pool["photo_chroma_surface_low"] = float(photo_chroma["surface_low"])
-    pool["photo_chroma_surface_high"] = float(photo_chroma["surface_high"])
-    pool["photo_chroma_overlay_low"] = float(photo_chroma["overlay_low"])
-    pool["photo_chroma_overlay_high"] = float(photo_chroma["overlay_high"])
-    pool["photo_chroma_text_low"] = float(photo_chroma["text_low"])
-    pool["photo_chroma_text_high"] = float(photo_chroma["text_high"])
+
+    # Per-photo metadata, once per profile instead of on every pool row
+    profile.stats.update(
+        {
+            "photo_dark_hue": dark_hue,
+            "photo_dark_hue_conf": dark_hue_conf,
+            "photo_dark_cluster_hue": dark_cluster_hue,
+            "photo_dark_cluster_score": dark_cluster_score,
+            "photo_bg_hue": bg_hue,
+            "photo_bg_hue_conf": bg_hue_conf,
+            "photo_L_q30": L_q30,
+            "photo_L_q40": L_q40,
+            "photo_C_median": C_median,
+            "photo_warm_hue": warm_hue,
+            "photo_warm_hue_conf": warm_hue_conf,
+            "photo_L_q15": L_q15,
+            "photo_L_q25": L_q25,
+            "photo_L_q35": L_q35,
+            "photo_L_q50": L_q50,
+            "photo_L_q65": L_q65,
+            "photo_L_q75": L_q75,
+            "photo_L_q85": L_q85,
+        }
+    )
+    for band, value in photo_lightness.items():
+        profile.stats[f"photo_lightness_{band}"] = value
+    for band, value in photo_chroma.items():
+        profile.stats[f"photo_chroma_{band}"] = value
 
     pool = add_ranks(pool)
 
@@ -1171,38 +1190,416 @@ def extract_color_pool(
         ["role", "derived", "score", "frequency"],
         ascending=[True, True, False, False],
     )
-    pool = pool.drop_duplicates(subset=["role", "hex"], keep="first").reset_index(
+    pool = pool.drop_duplicates(subset=["role", "rgb"], keep="first").reset_index(
         drop=True
     )
     pool["color_id"] = pool.index
 
-    # Column order (authoritative)
-    cols = [
-        "color_id",
-        "palette",
-        "role",
-        "derived",
-        "hex",
-        "R",
-        "G",
-        "B",
-        "L",
-        "a",
-        "b",
-        "chroma",
-        "hue",
-        "frequency",
-        "score",
-        "L_rank",
-        "chroma_rank",
-        "deltaE_bg",
-        "deltaL_bg",
-        "abs_deltaL_bg",
-        "deltaE_bg_rank",
-        "abs_deltaL_bg_rank",
-    ]
+    return pool
 
-    pool[cols].to_csv(out_csv, index=False)
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+
+
+def resolve_palette_option(palette: str, constraints_all: dict) -> str:
+    """--palette matched case-insensitively against the constraints' palettes."""
+    choices = ["auto", *constraints_all["constraints"]["chroma"]]
+    by_name = {c.lower(): c for c in choices}
+    if palette.lower() not in by_name:
+        raise click.BadParameter(
+            f"{palette!r} is not one of {', '.join(choices)}.", param_hint="'--palette'"
+        )
+    return by_name[palette.lower()]
+
+
+@click.command()
+@click.argument(
+    "image_path", required=False, type=click.Path(exists=True, path_type=Path)
+)
+@click.option(
+    "--sketch",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Merged color sketch from sketch_images.py, used instead of IMAGE_PATH.",
+)
+@click.option(
+    "--constraints-json",
+    type=click.Path(exists=True, path_type=Path),
+    required=True,
+)
+@click.option(
+    "--palette",
+    default="auto",
+    show_default=True,
+    help="Palette from --constraints-json, or auto to pick the best fit.",
+)
+@click.option(
+    "--max-pixels",
+    default=100_000,
+    show_default=True,
+    help="Pixels to sample (0 = count every pixel in a streaming histogram).",
+)
+@click.option("--quant", default=8, show_default=True)
+@click.option(
+    "--sampler",
+    type=click.Choice(SAMPLERS, case_sensitive=False),
+    default="random",
+    show_default=True,
+    help="Pixel sampling strategy used when the image exceeds --max-pixels.",
+)
+@click.option(
+    "--seed",
+    default=0,
+    show_default=True,
+    type=int,
+    help="Random seed for pixel sampling and nudge candidates (reproducible pools).",
+)
+@click.option(
+    "--strip-rows",
+    default=STRIP_ROWS,
+    show_default=True,
+    type=int,
+    help="Scanlines decoded per strip while streaming the image.",
+)
+@click.option(
+    "--color-manage/--no-color-manage",
+    default=True,
+    show_default=True,
+    help="Convert colors from an embedded (non-sRGB) ICC profile to sRGB.",
+)
+@click.option(
+    "--cache-dir",
+    default=None,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Cache sampled color histograms here, keyed by image content and "
+    "sampling options; re-runs with the same image skip decoding.",
+)
+@click.option(
+    "--out-csv",
+    default=None,
+    type=click.Path(path_type=Path),
+    help="Pool CSV export (default: color_pool.csv unless --out-pool is given).",
+)
+@click.option(
+    "--out-pool",
+    default=None,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Typed binary pool (.npz) with the photo profile as header, "
+    "read by assign_elements.py and fill_gaps.py.",
+)
+@click.option(
+    "--out-image",
+    default=None,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Save extracted color pool table as image (.svg or .png).",
+)
+@click.option(
+    "--max-per-role",
+    default=12,
+    show_default=True,
+    type=int,
+    help="Max rows per role in output table image.",
+)
+@click.option(
+    "--cool-min-deltae",
+    default=25.0,
+    show_default=True,
+    type=float,
+    help="Minimum deltaE from background for accent_cool (foreground safety).",
+)
+@click.option(
+    "--cool-min-abs-deltal",
+    default=12.0,
+    show_default=True,
+    type=float,
+    help="Minimum absolute deltaL from background for accent_cool (foreground safety).",
+)
+@click.option(
+    "--cool-soft-min-deltal",
+    default=18.0,
+    show_default=True,
+    type=float,
+    help="Soft penalty threshold: accent_cool below bg_L + this gets penalized.",
+)
+@click.option(
+    "--delta-e",
+    "delta_e_metric",
+    type=click.Choice(DELTA_E_METRICS),
+    default="de76",
+    show_default=True,
+    help="Color-difference metric for deltaE_bg and the accent_cool gate.",
+)
+@click.option(
+    "--dedupe-deltae",
+    default=0.0,
+    show_default=True,
+    type=float,
+    help="Merge same-role candidates within this Lab deltaE (summing frequency); 0 = off.",
+)
+@click.option(
+    "--role-cap",
+    default=0,
+    show_default=True,
+    type=int,
+    help="Keep at most this many diverse candidates per role "
+    "(farthest-point sampling in Lab); 0 = no cap.",
+)
+@click.option(
+    "--min-role-candidates",
+    default=10,
+    show_default=True,
+    type=int,
+    help="Minimum candidate colors per role (nudges added if needed).",
+)
+@click.option(
+    "--nudge-samples",
+    default=300,
+    show_default=True,
+    type=int,
+    help="Number of source colors to sample when nudging missing roles.",
+)
+@click.option(
+    "--debug-log",
+    default=None,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write role filter diagnostics to this log file.",
+)
+@click.option(
+    "--progressive/--no-progressive",
+    default=False,
+    show_default=True,
+    help="Build a preview pool from a thumbnail first, then refine at full sampling.",
+)
+@click.option(
+    "--preview-size",
+    default=64,
+    show_default=True,
+    type=int,
+    help="Thumbnail edge (px) used for the progressive preview pass.",
+)
+@click.option(
+    "--refine-margin",
+    default=5.0,
+    show_default=True,
+    type=float,
+    help="Re-run palette selection at full sampling when the preview's top two fit scores are closer than this.",
+)
+@click.option(
+    "--preview-only",
+    is_flag=True,
+    default=False,
+    help="With --progressive, stop after the preview unless the palette choice is ambiguous.",
+)
+@click.option(
+    "--out-preview-csv",
+    default=None,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Preview pool, .csv or .npz (default: <pool stem>_preview, same suffix).",
+)
+@click.option(
+    "--weighted-quantiles",
+    is_flag=True,
+    default=False,
+    help="Weight photo L*/chroma quantiles by pixel frequency (default: per color).",
+)
+@click.option(
+    "--out-profile",
+    default=None,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Photo profile JSON for assign_elements.py --photo-profile "
+    "(default: <out-csv stem>_profile.json; --out-pool carries it instead).",
+)
+def extract_color_pool(
+    image_path,
+    sketch,
+    constraints_json,
+    palette,
+    max_pixels,
+    quant,
+    sampler,
+    seed,
+    strip_rows,
+    color_manage,
+    cache_dir,
+    out_csv,
+    out_pool,
+    out_image,
+    max_per_role,
+    cool_min_deltae,
+    cool_min_abs_deltal,
+    cool_soft_min_deltal,
+    delta_e_metric,
+    dedupe_deltae,
+    role_cap,
+    min_role_candidates,
+    nudge_samples,
+    debug_log,
+    progressive,
+    preview_size,
+    refine_margin,
+    preview_only,
+    out_preview_csv,
+    weighted_quantiles,
+    out_profile,
+):
+    """
+    Build a role-aware color pool from a photo using learned palette constraints.
+
+    With --sketch the pool is built from a (merged) color sketch of one or
+    more images instead; image sampling options then do not apply.
+    """
+
+    if (image_path is None) == (sketch is None):
+        raise click.UsageError("Give exactly one of IMAGE_PATH or --sketch.")
+    if sketch is not None and progressive:
+        raise click.UsageError("--progressive needs IMAGE_PATH (no thumbnail in a sketch).")
+    if out_pool is not None and not is_binary_pool(out_pool):
+        raise click.UsageError("--out-pool must be a .npz file.")
+    if out_csv is None and out_pool is None:
+        out_csv = Path("color_pool.csv")
+    out_base = out_pool or out_csv
+
+    constraints_all = json.loads(constraints_json.read_text())
+    palette_profiles = constraints_all["profiles"]
+    palette = resolve_palette_option(palette, constraints_all)
+
+    pool_kwargs = dict(
+        cool_min_deltae=cool_min_deltae,
+        cool_min_abs_deltal=cool_min_abs_deltal,
+        cool_soft_min_deltal=cool_soft_min_deltal,
+        min_role_candidates=min_role_candidates,
+        nudge_samples=nudge_samples,
+        seed=seed,
+        delta_e_metric=delta_e_metric,
+        dedupe_deltae=dedupe_deltae,
+        role_cap=role_cap,
+    )
+    console = Console()
+
+    if sketch is not None:
+        ctx = ColorSketch.load(sketch)
+        quant = ctx.quant
+        console.print(
+            f"🧮 Sketch of {len(ctx.sources)} image(s), {len(ctx.keys)} colors "
+            f"(quant={quant})"
+        )
+    else:
+        sampling = dict(
+            max_pixels=max_pixels,
+            sampler=sampler.lower(),
+            seed=seed,
+            rows=strip_rows,
+            color_manage=color_manage,
+        )
+        if cache_dir is not None:
+            ctx = CachedImage(image_path, cache_dir, **sampling)
+            if ctx.entries:
+                console.print(f"🗃️ Using cached image colors from {ctx.file}")
+        else:
+            # One decode shared by sampling and the image-based hue estimators
+            ctx = ImageContext(image_path, **sampling)
+
+    # --------------------------------------------------------
+    # Progressive preview (thumbnail → palette + pool)
+    # --------------------------------------------------------
+
+    refine_palette = True
+    if progressive:
+        thumb = color_table(*ctx.thumbnail_colors(preview_size, quant), quant=quant)
+        thumb_profile = PhotoProfile.from_table(thumb, weighted=weighted_quantiles)
+        thumb_bands = hue_band_peaks(thumb, profile=thumb_profile)
+        preview_palette, preview_scores = select_palette(
+            thumb, constraints_all, palette, thumb_bands
+        )
+        print_palette_choice(
+            console, preview_palette, preview_scores, label="Preview"
+        )
+        margin = fit_margin(preview_scores)
+        refine_palette = margin < refine_margin
+
+        preview_csv = out_preview_csv or out_base.with_name(
+            f"{out_base.stem}_preview{out_base.suffix}"
+        )
+        try:
+            # Thumbnail has no usable gradient mask; use the midtone fallback
+            preview = build_color_pool(
+                thumb,
+                constraints_all,
+                preview_palette,
+                bands=thumb_bands,
+                profile=thumb_profile,
+                **pool_kwargs,
+            )
+            save_pool(preview[POOL_COLUMNS], preview_csv, profile=thumb_profile)
+            console.print(f"🔎 Preview pool written to {preview_csv}")
+            # A thumbnail often lacks the extremes some roles need; its fit
+            # scores are then dominated by coverage penalties, not by fit
+            if preview_scores is not None:
+                missing = missing_structural_roles(
+                    thumb, constraints_all, preview_palette
+                )
+                if missing:
+                    console.print(f"🔎 Preview lacks {', '.join(missing)} colors")
+                    refine_palette = True
+        except click.ClickException as e:
+            console.print(f"🔎 Preview pool skipped: {e.message}")
+            refine_palette = True
+
+        if preview_only and not refine_palette:
+            ctx.close()
+            return
+        if not refine_palette:
+            palette = preview_palette
+            if preview_scores is not None:
+                console.print(
+                    f"🔎 Preview palette is decisive (margin {margin:.1f} >= "
+                    f"{refine_margin:.1f}); refining pool only"
+                )
+
+    # --------------------------------------------------------
+    # Sample image
+    # --------------------------------------------------------
+
+    df = color_table(*ctx.colors(quant), quant=quant)
+    # L* / chroma sorted once for every quantile below
+    profile = PhotoProfile.from_table(df, weighted=weighted_quantiles)
+    # Every hue band (incl. the flat-region background) in one pass
+    bands = hue_band_peaks(df, ctx.flat_colors(quant), quant=quant, profile=profile)
+    ctx.close()
+
+    # --------------------------------------------------------
+    # Photo stats → palette choice
+    # --------------------------------------------------------
+
+    L_q10, L_q90 = profile.quantile("L", [0.10, 0.90])
+    photo_stats = {
+        "L_median": profile.median("L"),
+        "L_range": L_q90 - L_q10,
+        "chroma_median": profile.median("chroma"),
+        "hue_entropy": np.histogram(df.hue, bins=12, density=True)[0].var(),
+    }
+
+    if refine_palette:
+        palette, fit_scores = select_palette(df, constraints_all, palette, bands)
+        print_palette_choice(console, palette, fit_scores, label="Selected")
+
+    pool = build_color_pool(
+        df,
+        constraints_all,
+        palette,
+        bands=bands,
+        debug_log=debug_log,
+        profile=profile,
+        **pool_kwargs,
+    )
+    if out_pool is not None:
+        save_pool(pool[POOL_COLUMNS], out_pool, profile=profile)
+    if out_csv is not None:
+        pool[POOL_COLUMNS].to_csv(out_csv, index=False)
+    if out_profile is not None or out_pool is None:
+        profile.save(out_profile or out_csv.with_name(f"{out_csv.stem}_profile.json"))
 
     if out_image is not None:
         save_pool_table_image(pool, out_image, max_per_role=max_per_role)
@@ -3,7 +3,6 @@ from __future__ import annotations
 
 import json
 import math
-from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, Optional, Tuple
 
@@ -14,7 +13,19 @@ from rich.console import Console
 from rich.style import Style
 from rich.table import Table
 from rich.text import Text
-from skimage.color import lab2rgb
+
+from assignment_io import SCHEMAS, compact_rows, expand_rows, pool_records
+from color_pool import ColorPool, ColorSet, circ_dist_array, pool_keys
+from compiled_constraints import CompiledConstraints
+from lab_convert import (
+    hex_to_rgb24,
+    lab_to_lch_batch,
+    lab_to_rgb24_batch,
+    lch_to_lab_batch,
+    rgb24_hex,
+)
+from lab_index import LabIndex
+from pool_io import load_pool
 
 # ============================================================
 # Catppuccin structure (fixed)
@@ -60,10 +71,6 @@ def clamp(x: float, lo: float, hi: float) -> float:
     return max(lo, min(hi, x))
 
 
-def norm_hex(h: str) -> str:
-    return str(h).strip().lower()
-
-
 def circ_dist_deg(a: float, b: float) -> float:
     d = abs(a - b) % 360.0
     return min(d, 360.0 - d)
@@ -82,12 +89,21 @@ def lch_to_lab(L: float, C: float, h: float) -> Tuple[float, float, float]:
     return (float(L), float(a), float(b))
 
 
-def lab_to_rgb_hex(L: float, a: float, b: float) -> str:
-    lab = np.array([[[L, a, b]]], dtype=float)
-    rgb = lab2rgb(lab)[0, 0, :]
-    rgb = np.clip(rgb, 0.0, 1.0)
-    r, g, bb = (rgb * 255.0 + 0.5).astype(int)
-    return f"#{r:02x}{g:02x}{bb:02x}".lower()
+def lab_to_rgb24(L: float, a: float, b: float) -> int:
+    keys, _ = lab_to_rgb24_batch([[L, a, b]])
+    return int(keys[0])
+
+
+def refresh_rows(rows: list[Dict[str, Any]]) -> None:
+    """Recompute rgb / chroma / hue of row dicts after their Lab changed (one batch)."""
+    if not rows:
+        return
+    lab = np.array([[float(r["L"]), float(r["a"]), float(r["b"])] for r in rows])
+    keys, _ = lab_to_rgb24_batch(lab)
+    _, C, h = lab_to_lch_batch(lab)
+    for r, key, c, hh in zip(rows, keys, C, h):
+        r["rgb"] = int(key)
+        r["chroma"], r["hue"] = float(c), float(hh)
 
 
 def delta_e_lab(r1: Dict[str, float], r2: Dict[str, float]) -> float:
@@ -96,89 +112,6 @@ def delta_e_lab(r1: Dict[str, float], r2: Dict[str, float]) -> float:
     return float(np.linalg.norm(v1 - v2))
 
 
-# ============================================================
-# Constraints access (palette scoped)
-# ============================================================
-
-
-@dataclass(frozen=True)
-class PaletteConstraints:
-    deltaL: Dict[str, Dict[str, float]]
-    lightness: Dict[str, Dict[str, float]]
-    chroma: Dict[str, Dict[str, float]]
-    hue: Dict[str, Dict[str, float]]
-    polarity: Optional[str] = None
-    element_offsets: Dict[str, Dict[str, float]] = None
-    text_contrast: Dict[str, Dict[str, float]] = None
-    accent_separation: Dict[str, Dict[str, Dict[str, float]]] = (
-        None  # polarity -> role -> stats
-    )
-
-    def deltaL_min(self, pair: str) -> float:
-        return float(self.deltaL[pair]["q25"])
-
-    def deltaL_target(self, pair: str) -> float:
-        return float(self.deltaL[pair]["median"])
-
-    def chroma_q25(self, role: str) -> float:
-        return float(self.chroma[role]["q25"])
-
-    def chroma_q75(self, role: str) -> float:
-        return float(self.chroma[role]["q75"])
-
-    def chroma_relax_delta(self, role: str, fallback: float = 8.0) -> float:
-        """Get learned chroma relaxation delta for a role."""
-        x = self.chroma.get(role)
-        if x and "relax_delta" in x:
-            return float(x["relax_delta"])
-        return fallback
-
-    def lightness_q25(self, role: str) -> Optional[float]:
-        x = self.lightness.get(role)
-        return float(x["q25"]) if x and "q25" in x else None
-
-    def lightness_q75(self, role: str) -> Optional[float]:
-        x = self.lightness.get(role)
-        return float(x["q75"]) if x and "q75" in x else None
-
-    def lightness_relax_delta(self, role: str, fallback: float = 10.0) -> float:
-        x = self.lightness.get(role)
-        if x and "relax_delta" in x:
-            return float(x["relax_delta"])
-        return fallback
-
-    def hue_center(self, role: str) -> Optional[float]:
-        x = self.hue.get(role)
-        return float(x["center"]) if x and "center" in x else None
-
-    def hue_width(self, role: str) -> Optional[float]:
-        x = self.hue.get(role)
-        return float(x["width"]) if x and "width" in x else None
-
-    def hue_relax_mult(self, role: str, fallback: float = 1.3) -> float:
-        """Get learned hue window relaxation multiplier for a role."""
-        x = self.hue.get(role)
-        if x and "relax_mult" in x:
-            return float(x["relax_mult"])
-        return fallback
-
-    def accent_min_deltal(
-        self, role: str, polarity: str, fallback: float = 43.0
-    ) -> float:
-        """Get learned minimum L* separation for an accent role."""
-        if self.accent_separation is None:
-            return fallback
-        pol_sep = self.accent_separation.get(polarity, {})
-        role_sep = pol_sep.get(role, {})
-        return abs(role_sep.get("min", fallback))
-
-    def text_contrast_min(self, element: str, fallback: float = 35.0) -> float:
-        if self.text_contrast is None:
-            return fallback
-        x = self.text_contrast.get(element, {})
-        return float(x.get("q25", fallback))
-
-
 # ============================================================
 # IO normalization
 # ============================================================
@@ -204,20 +137,21 @@ def normalize_assignment_row(d: Dict[str, Any]) -> Dict[str, Any]:
     for k in ["L", "a", "b", "chroma", "hue", "frequency", "score"]:
         if k in out and out[k] is not None:
             out[k] = float(out[k])
-    for k in ["R", "G", "B"]:
+    for k in ["R", "G", "B", "rgb"]:
         if k in out and out[k] is not None:
             out[k] = int(out[k])
-    if "hex" in out and out["hex"] is not None:
-        out["hex"] = norm_hex(out["hex"])
     return out
 
 
-def element_hex(row: Dict[str, Any]) -> str:
+def element_key(row: Dict[str, Any]) -> int:
+    """Packed 0xRRGGBB of a row: rgb, else hex, else R/G/B, else from Lab."""
+    if row.get("rgb") is not None:
+        return int(row["rgb"])
     if "hex" in row and isinstance(row["hex"], str) and row["hex"].startswith("#"):
-        return norm_hex(row["hex"])
+        return int(hex_to_rgb24([row["hex"]])[0])
     if all(k in row for k in ["R", "G", "B"]):
-        return f"#{int(row['R']):02x}{int(row['G']):02x}{int(row['B']):02x}".lower()
-    return lab_to_rgb_hex(float(row["L"]), float(row["a"]), float(row["b"]))
+        return (int(row["R"]) << 16) | (int(row["G"]) << 8) | int(row["B"])
+    return lab_to_rgb24(float(row["L"]), float(row["a"]), float(row["b"]))
 
 
 # ============================================================
@@ -228,12 +162,12 @@ def element_hex(row: Dict[str, Any]) -> str:
 def nudge_into_role(
     row: Dict[str, Any],
     role: str,
-    pc: PaletteConstraints,
+    pc: CompiledConstraints,
     *,
     relax: bool,
 ) -> Dict[str, Any]:
     """
-    Return a *new* row dict with Lab/hex nudged toward palette constraints for role.
+    Return a *new* row dict with Lab/rgb nudged toward palette constraints for role.
     Operates in LCh for hue/chroma changes.
     """
     L0, a0, b0 = float(row["L"]), float(row["a"]), float(row["b"])
@@ -253,7 +187,7 @@ def nudge_into_role(
             L = q75
 
     # chroma target band (use learned relax_delta)
-    if role in pc.chroma:
+    if pc.has_chroma(role):
         q25 = pc.chroma_q25(role)
         q75 = pc.chroma_q75(role)
         if relax:
@@ -286,7 +220,7 @@ def nudge_into_role(
     out["L"], out["a"], out["b"] = float(L2), float(a2), float(b2)
     _, C2, h2 = lab_to_lch(out["L"], out["a"], out["b"])
     out["chroma"], out["hue"] = float(C2), float(h2)
-    out["hex"] = lab_to_rgb_hex(out["L"], out["a"], out["b"])
+    out["rgb"] = lab_to_rgb24(out["L"], out["a"], out["b"])
     out["derived"] = True
     return out
 
@@ -304,7 +238,7 @@ def _base_is_dark(assignments: Dict[str, Dict[str, Any]]) -> Optional[bool]:
 
 def enforce_accent_foreground_deltaL(
     assignments: Dict[str, Dict[str, Any]],
-    pc: PaletteConstraints,
+    pc: CompiledConstraints,
     *,
     roles: Tuple[str, ...] = ("accent_cool", "accent_bridge"),
     min_deltal_override: Optional[float] = None,
@@ -314,7 +248,7 @@ def enforce_accent_foreground_deltaL(
     accent roles that are commonly used as foreground to be directionally separated
     from base in L*.
 
-    Uses learned accent_separation constraints from PaletteConstraints, or
+    Uses learned accent_separation constraints from CompiledConstraints, or
     min_deltal_override if provided.
 
     Dark theme:  accent L >= base_L + min_deltal
@@ -328,12 +262,13 @@ def enforce_accent_foreground_deltaL(
     is_dark = base_L < 50.0
     polarity = "dark" if is_dark else "light"
 
+    changed = []
     for role in roles:
         # Get role-specific min separation (learned or override)
         if min_deltal_override is not None:
             min_deltal = min_deltal_override
         else:
-            min_deltal = pc.accent_min_deltal(role, polarity)
+            min_deltal = abs(pc.accent_min_deltal(role, polarity, 43.0))
 
         for elem in ELEMENTS_BY_ROLE[role]:
             if elem not in assignments:
@@ -348,10 +283,9 @@ def enforce_accent_foreground_deltaL(
                 target = base_L - min_deltal
                 if L > target:
                     r["L"] = clamp(target, 0.0, 100.0)
+            changed.append(r)
 
-            r["hex"] = lab_to_rgb_hex(float(r["L"]), float(r["a"]), float(r["b"]))
-            _, C, h = lab_to_lch(float(r["L"]), float(r["a"]), float(r["b"]))
-            r["chroma"], r["hue"] = float(C), float(h)
+    refresh_rows(changed)
 
 
 # ============================================================
@@ -359,13 +293,33 @@ def enforce_accent_foreground_deltaL(
 # ============================================================
 
 
+def role_target_lab(
+    role: str, pc: CompiledConstraints, anchor: Optional[Dict[str, Any]]
+) -> Tuple[float, float, float]:
+    """
+    Lab point nudge_into_role pulls a seed toward: the middle of the role's
+    L* and C* bands and its hue center (else the anchor's L* / hue).
+    """
+    q25, q75 = pc.lightness_q25(role), pc.lightness_q75(role)
+    if q25 is not None and q75 is not None:
+        L = (q25 + q75) / 2.0
+    else:
+        L = float(anchor["L"]) if anchor is not None else 50.0
+    C = (pc.chroma_q25(role) + pc.chroma_q75(role)) / 2.0 if pc.has_chroma(role) else 0.0
+    h = pc.hue_center(role)
+    if h is None:
+        h = float(anchor["hue"]) if anchor is not None else 0.0
+    return lch_to_lab(L, C, h)
+
+
 def pick_best_candidate(
-    pool: pd.DataFrame,
+    index: LabIndex,
     *,
     role: str,
     elem: str,
-    used_hex: set[str],
-    pc: PaletteConstraints,
+    target: Tuple[float, float, float],
+    used: ColorSet,
+    pc: CompiledConstraints,
     relax: bool,
     base_L: Optional[float],
     is_dark: Optional[bool],
@@ -373,67 +327,55 @@ def pick_best_candidate(
     fg_min_deltal: Optional[float],
 ) -> Optional[Dict[str, Any]]:
     """
-    Choose a seed extracted color (row) to use for the given role/element.
+    Choose a seed extracted color (row) to use for the given role/element:
+    the unused pool color nearest to `target` (the role's target Lab point),
+    so the seed needs the least nudging.
 
-    New:
-      - honors used_hex strictly (no duplicates)
+      - honors used strictly (no duplicates)
+      - prefers the same role, then any role
+      - within that, prefers the role's hue window
       - for "foreground-ish" accent roles, prevents picking colors that are too close to
         (or darker than) the background in the wrong direction.
     """
-    sub = pool[~pool["hex"].isin(used_hex)].copy()
-    if sub.empty:
-        return None
 
-    # prefer same role, but allow fallback
-    sub_role = sub[sub["role"] == role].copy()
-    if not sub_role.empty:
-        sub = sub_role
+    def anything(v):
+        return np.ones(len(v), dtype=bool)
 
     # Hue window preference for accents
+    hue_ok = anything
     hc = pc.hue_center(role)
     hw = pc.hue_width(role)
     if hc is not None and hw is not None:
         half = (hw / 2.0) * (1.3 if relax else 1.0)
-        sub["hue_dist"] = sub["hue"].apply(lambda x: circ_dist_deg(float(x), float(hc)))
-        inwin = sub[sub["hue_dist"] <= half].copy()
-        if not inwin.empty:
-            sub = inwin
+
+        def hue_ok(v):
+            return circ_dist_array(v.hue, float(hc)) <= half
 
     # Foreground-safety gate for accent_cool / accent_bridge (and any roles you pass)
-    if (
-        base_L is not None
-        and is_dark is not None
-        and role in fg_roles
-        and "L" in sub.columns
-    ):
+    fg = [anything]
+    if base_L is not None and is_dark is not None and role in fg_roles:
         # Use learned value if fg_min_deltal not provided
         polarity = "dark" if is_dark else "light"
         min_deltal = (
             fg_min_deltal
             if fg_min_deltal is not None
-            else pc.accent_min_deltal(role, polarity)
+            else abs(pc.accent_min_deltal(role, polarity, 43.0))
         )
+        sign = 1.0 if is_dark else -1.0
+        strict = [lambda v: sign * (v.L - base_L) >= min_deltal]
+        if relax:
+            # relaxed: at least not darker than base
+            strict.append(lambda v: sign * (v.L - base_L) >= 0.0)
+        fg = strict + fg
 
-        if is_dark:
-            strict = sub[sub["L"] >= (base_L + min_deltal)].copy()
-            if strict.empty and relax:
-                # relaxed: at least not darker than base
-                strict = sub[sub["L"] >= base_L].copy()
-            if not strict.empty:
-                sub = strict
-        else:
-            strict = sub[sub["L"] <= (base_L - min_deltal)].copy()
-            if strict.empty and relax:
-                strict = sub[sub["L"] <= base_L].copy()
-            if not strict.empty:
-                sub = strict
-
-    # score: high frequency + high extractor score
-    sort_cols = [c for c in ["frequency", "score"] if c in sub.columns]
-    if sort_cols:
-        sub = sub.sort_values(sort_cols, ascending=[False] * len(sort_cols))
-
-    return sub.iloc[0].to_dict()
+    # In preference order: in-window & fg-safe, in-window, fg-safe, anything
+    accepts = [(lambda v, f=f: hue_ok(v) & f(v)) for f in fg] + fg
+    for scope in (role, None):
+        for accept in accepts:
+            hit = index.first(target, accept, role=scope, exclude=used)
+            if not hit.empty:
+                return hit.row(0)
+    return None
 
 
 # ============================================================
@@ -442,7 +384,7 @@ def pick_best_candidate(
 
 
 def enforce_structural_L(
-    assign: Dict[str, Dict[str, Any]], pc: PaletteConstraints
+    assign: Dict[str, Dict[str, Any]], pc: CompiledConstraints
 ) -> None:
     needed = ["base", "surface1", "overlay1", "text"]
     if not all(k in assign for k in needed):
@@ -502,34 +444,30 @@ def enforce_structural_L(
     Lb, Ls, Lo, Lt = map(lambda x: clamp(x, 0.0, 100.0), [Lb, Ls, Lo, Lt])
 
     for key, newL in [("base", Lb), ("surface1", Ls), ("overlay1", Lo), ("text", Lt)]:
-        r = assign[key]
-        r["L"] = float(newL)
-        r["hex"] = lab_to_rgb_hex(float(r["L"]), float(r["a"]), float(r["b"]))
-        _, C, h = lab_to_lch(float(r["L"]), float(r["a"]), float(r["b"]))
-        r["chroma"], r["hue"] = float(C), float(h)
+        assign[key]["L"] = float(newL)
+    refresh_rows([assign[k] for k in needed])
 
 
-def enforce_text_offsets(assign: Dict[str, Dict[str, Any]], pc: PaletteConstraints) -> None:
+def enforce_text_offsets(assign: Dict[str, Dict[str, Any]], pc: CompiledConstraints) -> None:
     if "text" not in assign:
         return
 
-    offsets = pc.element_offsets or {}
     text = assign["text"]
 
+    changed = []
     for elem, fallback in [("subtext1", -7.0), ("subtext0", -15.0)]:
         if elem not in assign:
             continue
-        offset = offsets.get(f"{elem}_from_text", {}).get("value", fallback)
+        offset = pc.element_offset(f"{elem}_from_text", fallback)
         target = float(text["L"]) + float(offset)
         target = clamp(target, 0.0, 100.0)
         r = assign[elem]
         r["L"] = float(target)
-        r["hex"] = lab_to_rgb_hex(float(r["L"]), float(r["a"]), float(r["b"]))
-        _, C, h = lab_to_lch(float(r["L"]), float(r["a"]), float(r["b"]))
-        r["chroma"], r["hue"] = float(C), float(h)
+        changed.append(r)
+    refresh_rows(changed)
 
 
-def enforce_text_contrast(assign: Dict[str, Dict[str, Any]], pc: PaletteConstraints) -> None:
+def enforce_text_contrast(assign: Dict[str, Dict[str, Any]], pc: CompiledConstraints) -> None:
     if "base" not in assign:
         return
     base_L = float(assign["base"]["L"])
@@ -537,6 +475,7 @@ def enforce_text_contrast(assign: Dict[str, Dict[str, Any]], pc: PaletteConstrai
     if pc.polarity is not None:
         is_dark = pc.polarity != "light"
 
+    changed = []
     for elem in ["text", "subtext1", "subtext0"]:
         if elem not in assign:
             continue
@@ -551,10 +490,8 @@ def enforce_text_contrast(assign: Dict[str, Dict[str, Any]], pc: PaletteConstrai
             target = base_L - min_dl
             if L > target:
                 r["L"] = clamp(target, 0.0, 100.0)
-
-        r["hex"] = lab_to_rgb_hex(float(r["L"]), float(r["a"]), float(r["b"]))
-        _, C, h = lab_to_lch(float(r["L"]), float(r["a"]), float(r["b"]))
-        r["chroma"], r["hue"] = float(C), float(h)
+        changed.append(r)
+    refresh_rows(changed)
 
 
 # ============================================================
@@ -580,7 +517,7 @@ def _build_table(assignments: Dict[str, Dict[str, Any]], theme_name: str) -> Tab
             if r is None:
                 table.add_row(elem, "[dim]—[/dim]", "", "", "", "", "")
                 continue
-            h = r.get("hex") or element_hex(r)
+            h = rgb24_hex(element_key(r))
             sw = Text("   ", style=Style(bgcolor=h))
             table.add_row(
                 elem,
@@ -653,7 +590,7 @@ def write_lua(
             r = assignments.get(elem)
             if r is None:
                 continue
-            h = r.get("hex") or element_hex(r)
+            h = rgb24_hex(element_key(r))
             lines.append(f"  {elem} = '{h}',")
     lines.append("}")
     out_lua.write_text("\n".join(lines))
@@ -667,7 +604,7 @@ def write_lua(
 def polish(
     assignments_in: Dict[str, Any],
     pool: pd.DataFrame,
-    pc: PaletteConstraints,
+    pc: CompiledConstraints,
     *,
     fg_min_deltal: Optional[float],
     fg_roles: Tuple[str, ...],
@@ -680,31 +617,29 @@ def polish(
         k: normalize_assignment_row(v) for k, v in assigned_raw.items()
     }
     for v in assignments.values():
-        v["hex"] = v.get("hex") or element_hex(v)
-        v["hex"] = norm_hex(v["hex"])
+        v["rgb"] = element_key(v)
         v.setdefault("derived", bool(v.get("derived", False)))
 
     pool = pool.copy()
-    if "hex" not in pool.columns:
-        raise click.ClickException("color_pool.csv must contain a 'hex' column")
+    if not {"rgb", "hex"} & set(pool.columns):
+        raise click.ClickException("color_pool.csv must contain an 'rgb' or 'hex' column")
     if "role" not in pool.columns:
         raise click.ClickException("color_pool.csv must contain a 'role' column")
-    pool["hex"] = pool["hex"].map(norm_hex)
+    pool["rgb"] = pool_keys(pool)
 
     for c in ["L", "a", "b", "chroma", "hue", "frequency", "score"]:
         if c in pool.columns:
             pool[c] = pd.to_numeric(pool[c], errors="coerce")
 
-    # Optional: dedupe pool by hex to avoid duplicate visible colors
+    # Optional: dedupe pool by rgb to avoid duplicate visible colors
     sort_cols = [c for c in ["frequency", "score"] if c in pool.columns]
     if sort_cols:
         pool = pool.sort_values(sort_cols, ascending=[False] * len(sort_cols))
-    pool = pool.drop_duplicates(subset=["hex"], keep="first").reset_index(drop=True)
+    pool = pool.drop_duplicates(subset=["rgb"], keep="first").reset_index(drop=True)
+    index = LabIndex(ColorPool(pool))
 
     all_elems = [e for r in ROLE_ORDER for e in ELEMENTS_BY_ROLE[r]]
-    used_hex = {
-        norm_hex(assignments[e]["hex"]) for e in assignments if "hex" in assignments[e]
-    }
+    used = ColorSet(v["rgb"] for v in assignments.values())
 
     base_L = float(assignments["base"]["L"]) if "base" in assignments else None
     is_dark = (base_L < 50.0) if base_L is not None else None
@@ -717,10 +652,11 @@ def polish(
             role = ROLE_BY_ELEMENT[elem]
 
             seed = pick_best_candidate(
-                pool,
+                index,
                 role=role,
                 elem=elem,
-                used_hex=used_hex,
+                target=role_target_lab(role, pc, assignments.get("base")),
+                used=used,
                 pc=pc,
                 relax=relax,
                 base_L=base_L,
@@ -769,7 +705,7 @@ def polish(
                     else 0.0
                 ),
                 "role": role,
-                "seed_hex": str(seed.get("hex")),
+                "seed_hex": rgb24_hex(seed["rgb"]),
             }
             nudged = nudge_into_role(seed_row, role, pc, relax=relax)
 
@@ -779,7 +715,7 @@ def polish(
                 min_deltal = (
                     fg_min_deltal
                     if fg_min_deltal is not None
-                    else pc.accent_min_deltal(role, polarity)
+                    else abs(pc.accent_min_deltal(role, polarity, 43.0))
                 )
 
                 Lm = float(nudged["L"])
@@ -792,38 +728,31 @@ def polish(
                     if Lm > target:
                         nudged["L"] = clamp(target, 0.0, 100.0)
 
-                nudged["hex"] = lab_to_rgb_hex(
-                    float(nudged["L"]), float(nudged["a"]), float(nudged["b"])
-                )
-                _, C2, h2 = lab_to_lch(
-                    float(nudged["L"]), float(nudged["a"]), float(nudged["b"])
-                )
-                nudged["chroma"], nudged["hue"] = float(C2), float(h2)
+                refresh_rows([nudged])
 
             # uniqueness: if collision, perturb hue slightly in relaxed pass
-            if norm_hex(nudged["hex"]) in used_hex and relax:
+            # (all hue shifts converted in one batch, first unused one wins)
+            if nudged["rgb"] in used and relax:
                 L, C, h = lab_to_lch(nudged["L"], nudged["a"], nudged["b"])
-                for dh in [8, -8, 16, -16, 24, -24, 32, -32]:
-                    L2, a2, b2 = lch_to_lab(L, C, (h + dh) % 360.0)
-                    hx = lab_to_rgb_hex(L2, a2, b2)
-                    if norm_hex(hx) not in used_hex:
+                shifts = np.array([8, -8, 16, -16, 24, -24, 32, -32], dtype=float)
+                cand_lab = lch_to_lab_batch(L, C, (h + shifts) % 360.0)
+                cand_keys, _ = lab_to_rgb24_batch(cand_lab)
+                for (L2, a2, b2), key in zip(cand_lab, cand_keys):
+                    if key not in used:
                         nudged["L"], nudged["a"], nudged["b"] = (
                             float(L2),
                             float(a2),
                             float(b2),
                         )
-                        nudged["hex"] = norm_hex(hx)
-                        _, C2, h2 = lab_to_lch(float(L2), float(a2), float(b2))
-                        nudged["chroma"], nudged["hue"] = float(C2), float(h2)
+                        refresh_rows([nudged])
                         break
 
-            if norm_hex(nudged["hex"]) in used_hex:
+            if nudged["rgb"] in used:
                 continue
 
             nudged["element"] = elem
-            nudged["hex"] = norm_hex(nudged["hex"])
             assignments[elem] = nudged
-            used_hex.add(norm_hex(nudged["hex"]))
+            used.add(nudged["rgb"])
 
         if all(e in assignments for e in all_elems):
             break
@@ -840,6 +769,10 @@ def polish(
             min_deltal_override=fg_min_deltal,
         )
 
+    # Hex strings only for the written document
+    for v in assignments.values():
+        v["hex"] = rgb24_hex(v["rgb"])
+
     out = {
         "palette": palette,
         "assigned": {k: v for k, v in assignments.items()},
@@ -860,9 +793,12 @@ def polish(
     required=True,
 )
 @click.option(
+    "--color-pool",
     "--color-pool-csv",
+    "color_pool_csv",
     type=click.Path(exists=True, dir_okay=False, path_type=Path),
     required=True,
+    help="Color pool from extract_colors.py (.npz or CSV).",
 )
 @click.option(
     "--constraints-json",
@@ -906,6 +842,13 @@ def polish(
     show_default=True,
     help="Apply fg readability enforcement after gap filling (in addition to during selection).",
 )
+@click.option(
+    "--schema",
+    type=click.Choice(SCHEMAS),
+    default=None,
+    help="Output schema (default: same as --assignments-json); compact stores "
+    "color_id references plus fields changed by polishing.",
+)
 def main(
     assignments_json: Path,
     color_pool_csv: Path,
@@ -918,9 +861,25 @@ def main(
     fg_min_deltal: Optional[float],
     fg_roles: str,
     enforce_after_fill: bool,
+    schema: Optional[str],
 ):
     assignments_in = json.loads(assignments_json.read_text())
-    pool = pd.read_csv(color_pool_csv)
+    try:
+        pool, _ = load_pool(color_pool_csv)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    # Compact rows reference the pool as written, before any filtering
+    records = pool_records(pool)
+    schema_in = assignments_in.get("schema", "full")
+    schema = schema or schema_in
+    if schema_in == "compact":
+        try:
+            assignments_in["assigned"] = expand_rows(
+                assignments_in.get("assigned", {}), records
+            )
+        except ValueError as e:
+            raise click.ClickException(str(e))
 
     constraints_all = json.loads(constraints_json.read_text())
     palette = assignments_in.get("palette")
@@ -932,20 +891,7 @@ def main(
             "Could not determine palette from assignments.json or color_pool.csv"
         )
 
-    pc = PaletteConstraints(
-        deltaL=constraints_all["constraints"]["deltaL"][palette],
-        lightness=constraints_all["constraints"].get("lightness", {}).get(palette, {}),
-        chroma=constraints_all["constraints"]["chroma"][palette],
-        hue=constraints_all["constraints"]["hue"][palette],
-        polarity=constraints_all.get("polarity", {}).get(palette),
-        element_offsets=constraints_all["constraints"]
-        .get("element_offsets", {})
-        .get(palette, {}),
-        text_contrast=constraints_all["constraints"]
-        .get("text_contrast", {})
-        .get(palette, {}),
-        accent_separation=constraints_all["constraints"].get("accent_separation", {}),
-    )
+    pc = CompiledConstraints.from_json(constraints_all, palette)
 
     if "palette" in pool.columns:
         pool = pool[pool["palette"] == palette].copy()
@@ -959,7 +905,16 @@ def main(
         fg_roles=roles_tuple,
         enforce_after_fill=enforce_after_fill,
     )
-    out_json.write_text(json.dumps(out, indent=2))
+    if schema == "compact":
+        doc = {
+            "palette": out["palette"],
+            "schema": schema,
+            "assigned": compact_rows(out["assigned"], records),
+            "missing": out["missing"],
+        }
+    else:
+        doc = out
+    out_json.write_text(json.dumps(doc, indent=2))
 
     if not no_render:
         render_table(out["assigned"], theme_name)
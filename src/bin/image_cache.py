@@ -0,0 +1,131 @@
+"""
+On-disk cache of the image work done by extract_colors.py.
+
+Decoding, sampling, quantizing and flat-region detection depend only on
+the image bytes and the sampling options, not on palette or role
+thresholds. CachedImage stands in for ImageContext: colors(),
+flat_colors() and thumbnail_colors() are answered from a .npz sidecar
+when present and computed (and stored) otherwise. The image is only
+opened on a miss, so re-runs that change downstream thresholds skip
+image work entirely.
+
+Files are named by a SHA-256 of the image content plus the sampling
+options (max_pixels, sampler, seed, strip rows, color management);
+entries inside are keyed by quant (and thumbnail size), stored as packed
+grid keys + counts like color sketches.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from image_sampling import STRIP_ROWS, ImageContext
+from quantize import pack_rgb, unpack_keys
+
+CACHE_VERSION = 1
+
+
+def image_digest(path: Path, chunk: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_key(path: Path, **params) -> str:
+    """Content hash of the image combined with the sampling options."""
+    h = hashlib.sha256(image_digest(path).encode())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    return h.hexdigest()[:32]
+
+
+class CachedImage:
+    """ImageContext accessors backed by a per-image .npz cache."""
+
+    def __init__(
+        self,
+        path: Path,
+        cache_dir: Path,
+        *,
+        max_pixels: int | None,
+        sampler: str = "random",
+        seed: int | None = None,
+        rows: int = STRIP_ROWS,
+        color_manage: bool = True,
+    ):
+        self.path = Path(path)
+        self.options = dict(
+            max_pixels=max_pixels,
+            sampler=sampler,
+            seed=seed,
+            rows=rows,
+            color_manage=color_manage,
+        )
+        self.file = Path(cache_dir) / f"{cache_key(self.path, **self.options)}.npz"
+        self.entries: dict[str, np.ndarray] = {}
+        self.hits = self.misses = 0
+        self._ctx: ImageContext | None = None
+        self._dirty = False
+        if self.file.exists():
+            with np.load(self.file, allow_pickle=False) as z:
+                if int(z["version"]) == CACHE_VERSION:
+                    self.entries = {k: z[k] for k in z.files if k != "version"}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def ctx(self) -> ImageContext:
+        """The decoded image, opened on the first cache miss."""
+        if self._ctx is None:
+            self._ctx = ImageContext(self.path, **self.options)
+        return self._ctx
+
+    def _get(self, name: str, quant: int, compute) -> tuple[np.ndarray, np.ndarray]:
+        keys, counts = f"{name}_keys", f"{name}_counts"
+        if keys in self.entries:
+            self.hits += 1
+            return unpack_keys(self.entries[keys], quant), self.entries[counts]
+        self.misses += 1
+        uniq, n = compute()
+        self.entries[keys] = pack_rgb(uniq, quant)
+        self.entries[counts] = np.asarray(n, dtype=np.int64)
+        self._dirty = True
+        return uniq, n
+
+    def colors(self, quant: int) -> tuple[np.ndarray, np.ndarray]:
+        return self._get(f"colors_q{quant}", quant, lambda: self.ctx.colors(quant))
+
+    def flat_colors(self, quant: int) -> tuple[np.ndarray, np.ndarray]:
+        return self._get(f"flat_q{quant}", quant, lambda: self.ctx.flat_colors(quant))
+
+    def thumbnail_colors(self, size: int, quant: int) -> tuple[np.ndarray, np.ndarray]:
+        return self._get(
+            f"thumb{size}_q{quant}", quant, lambda: self.ctx.thumbnail_colors(size, quant)
+        )
+
+    def close(self) -> None:
+        if self._ctx is not None:
+            self._ctx.close()
+            self._ctx = None
+        if self._dirty:
+            # Unique temp name + rename, so concurrent runs on the same image
+            # never read or clobber a partial file
+            self.file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.file.parent, suffix=".npz.tmp")
+            # File handle: np.savez would append ".npz" to other suffixes
+            with os.fdopen(fd, "wb") as fh:
+                np.savez_compressed(fh, version=CACHE_VERSION, **self.entries)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, self.file)
+            self._dirty = False
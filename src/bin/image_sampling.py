@@ -0,0 +1,552 @@
+"""
+Bounded-memory pixel sampling for extract_colors.py.
+
+Images are walked in horizontal strips: each strip is converted to RGB,
+fed to a reservoir sampler and/or a running quantized histogram
+(quantize.QuantizedHistogram), and then dropped. No full-frame RGB copy,
+index permutation or float cast is ever built.
+
+Uncompressed row-ordered files (PPM, BMP, uncompressed TIFF strips) are
+read strip by strip straight from the file, so peak memory is one strip
+plus the sample / histogram. Compressed single-tile formats (JPEG, PNG)
+cannot be decoded partially by PIL: they are decoded once in their native
+mode (1 byte/px for L / P images) and only converted to RGB per strip.
+
+Samplers (all seeded, so repeated runs give identical pools):
+  - random:     uniform reservoir sample
+  - strided:    every s-th pixel on a regular grid
+  - box:        box-filtered downsample (JPEG draft + Image.reduce)
+  - stratified: one random pixel per grid cell
+"""
+
+from __future__ import annotations
+
+import math
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+from PIL import Image
+
+from color_management import colors_to_srgb, image_srgb_transform
+from quantize import QuantizedHistogram
+
+STRIP_ROWS = 256
+
+SAMPLERS = ("random", "strided", "box", "stratified")
+
+
+# ------------------------------------------------------------
+# Strip reader
+# ------------------------------------------------------------
+
+
+# rawmode -> (bytes per pixel, image mode, channel order of R, G, B)
+RAW_LAYOUTS = {
+    "RGB": (3, "RGB", [0, 1, 2]),
+    "BGR": (3, "RGB", [2, 1, 0]),
+    "RGBA": (4, "RGBA", [0, 1, 2]),
+    "L": (1, "L", [0, 0, 0]),
+}
+
+
+def raw_strips(img: Image.Image) -> list[tuple] | None:
+    """
+    (y0, y1, offset, stride, ystep, rawmode) per tile when every tile of a
+    not-yet-decoded image is uncompressed full-width rows of a RAW_LAYOUTS
+    mode (readable straight from the file); None otherwise.
+    """
+    if not getattr(img, "tile", None) or not getattr(img, "filename", None):
+        return None
+    w = img.width
+    strips = []
+    for tile in img.tile:
+        codec, (x0, y0, x1, y1), offset, args = tile[:4]
+        args = (args,) if isinstance(args, str) else tuple(args)
+        rawmode, stride, ystep = (args + (0, 1)[len(args) - 1 :])[:3]
+        layout = RAW_LAYOUTS.get(rawmode)
+        if codec != "raw" or (x0, x1) != (0, w) or layout is None or layout[1] != img.mode:
+            return None
+        if ystep not in (1, -1):
+            return None
+        strips.append((y0, y1, offset, stride or w * layout[0], ystep, rawmode))
+    return strips
+
+
+def _iter_raw_bands(
+    img: Image.Image, strips: list[tuple], rows: int
+) -> Iterator[tuple[int, np.ndarray]]:
+    w, h = img.size
+    maps = [
+        np.memmap(img.filename, dtype=np.uint8, mode="r", offset=off, shape=(y1 - y0, stride))
+        for y0, y1, off, stride, _, _ in strips
+    ]
+    for b0 in range(0, h, rows):
+        b1 = min(h, b0 + rows)
+        band = np.empty((b1 - b0, w, 3), dtype=np.uint8)
+        for (y0, y1, _, _, ystep, rawmode), mm in zip(strips, maps):
+            lo, hi = max(b0, y0), min(b1, y1)
+            if lo >= hi:
+                continue
+            bpp, _, order = RAW_LAYOUTS[rawmode]
+            ys = np.arange(lo, hi)
+            # ystep -1: the file stores the tile's rows bottom-up
+            file_rows = ys - y0 if ystep == 1 else (y1 - 1) - ys
+            px = np.asarray(mm[file_rows, : w * bpp]).reshape(hi - lo, w, bpp)
+            band[lo - b0 : hi - b0] = px[:, :, order]
+        yield b0, band
+
+
+def iter_rgb_bands(
+    img: Image.Image, *, rows: int = STRIP_ROWS
+) -> Iterator[tuple[int, np.ndarray]]:
+    """
+    Yield (y0, band) with band an (h, w, 3) uint8 RGB array of `rows` scanlines.
+
+    Uncompressed row-ordered files are read band by band from disk
+    (raw_strips); anything else is decoded once by PIL in its native mode
+    and only the current band is converted to RGB / NumPy.
+    """
+    strips = raw_strips(img)
+    if strips is not None:
+        yield from _iter_raw_bands(img, strips, rows)
+        return
+    w, h = img.size
+    for y0 in range(0, h, rows):
+        band = img.crop((0, y0, w, min(h, y0 + rows))).convert("RGB")
+        yield y0, np.asarray(band)
+
+
+def iter_rgb_strips(
+    img: Image.Image, *, rows: int = STRIP_ROWS
+) -> Iterator[np.ndarray]:
+    """Yield the image as (n, 3) uint8 RGB pixel blocks, `rows` scanlines at a time."""
+    for _, band in iter_rgb_bands(img, rows=rows):
+        yield band.reshape(-1, 3)
+
+
+# ------------------------------------------------------------
+# Streaming accumulators
+# ------------------------------------------------------------
+
+
+class ReservoirSampler:
+    """
+    Uniform sample (without replacement) of up to `k` pixels from a stream.
+
+    Bottom-k sampling: every pixel gets a uniform random key and the k
+    smallest keys seen so far are kept. Once the reservoir is full only
+    pixels beating the current k-th key are considered.
+    """
+
+    def __init__(self, k: int, *, seed: int | None = None):
+        self.k = int(k)
+        self.rng = np.random.default_rng(seed)
+        self._keys = np.empty(0, dtype=np.float64)
+        self._pixels = np.empty((0, 3), dtype=np.uint8)
+
+    def update(self, pixels: np.ndarray) -> None:
+        keys = self.rng.random(len(pixels))
+        if len(self._keys) >= self.k:
+            enter = keys < self._keys.max()
+            if not np.any(enter):
+                return
+            keys, pixels = keys[enter], pixels[enter]
+
+        keys = np.concatenate([self._keys, keys])
+        pixels = np.concatenate([self._pixels, pixels])
+        if len(keys) > self.k:
+            keep = np.argpartition(keys, self.k - 1)[: self.k]
+            keys, pixels = keys[keep], pixels[keep]
+        self._keys, self._pixels = keys, pixels
+
+    def sample(self) -> np.ndarray:
+        return self._pixels
+
+
+# ------------------------------------------------------------
+# Grid samplers (cost O(max_pixels) beyond decoding)
+# ------------------------------------------------------------
+
+
+def grid_step(width: int, height: int, max_pixels: int) -> int:
+    """Square cell size so that a one-pixel-per-cell grid holds ~max_pixels."""
+    return max(1, math.ceil(math.sqrt(width * height / max_pixels)))
+
+
+def grid_steps(width: int, height: int, max_pixels: int) -> tuple[int, int]:
+    """
+    (step_y, step_x) of a one-pixel-per-cell grid with at most max_pixels cells.
+
+    Cells are grid_step squares unless the partial cells along a short side
+    push the count over max_pixels (a 3×500 image at max_pixels=10 would
+    get 39 square cells); the long axis is then stretched to fit.
+    """
+    step = grid_step(width, height, max_pixels)
+    ny, nx = math.ceil(height / step), math.ceil(width / step)
+    if ny * nx <= max_pixels:
+        return step, step
+    if ny <= nx:
+        return step, math.ceil(width / max(1, max_pixels // ny))
+    return math.ceil(height / max(1, max_pixels // nx)), step
+
+
+def gather_pixels(
+    img: Image.Image, ys: np.ndarray, xs: np.ndarray, *, rows: int = STRIP_ROWS
+) -> np.ndarray:
+    """Read pixels at (ys, xs), with ys sorted ascending, band by band."""
+    out = np.empty((len(ys), 3), dtype=np.uint8)
+    for y0, band in iter_rgb_bands(img, rows=rows):
+        lo, hi = np.searchsorted(ys, [y0, y0 + band.shape[0]])
+        if lo < hi:
+            out[lo:hi] = band[ys[lo:hi] - y0, xs[lo:hi]]
+    return out
+
+
+def strided_coords(
+    width: int, height: int, step: int | tuple[int, int]
+) -> tuple[np.ndarray, np.ndarray]:
+    """Top-left pixel of every cell; `step` is square or (step_y, step_x)."""
+    sy, sx = (step, step) if isinstance(step, int) else step
+    ys, xs = np.meshgrid(np.arange(0, height, sy), np.arange(0, width, sx), indexing="ij")
+    return ys.ravel(), xs.ravel()
+
+
+def stratified_coords(
+    width: int, height: int, step: int | tuple[int, int], *, seed: int | None
+) -> tuple[np.ndarray, np.ndarray]:
+    """One uniformly placed pixel inside every cell (edge cells clipped)."""
+    sy, sx = (step, step) if isinstance(step, int) else step
+    rng = np.random.default_rng(seed)
+    ys, xs = strided_coords(width, height, (sy, sx))
+    cell_h = np.minimum(sy, height - ys)
+    cell_w = np.minimum(sx, width - xs)
+    ys = ys + (rng.random(len(ys)) * cell_h).astype(np.int64)
+    xs = xs + (rng.random(len(xs)) * cell_w).astype(np.int64)
+    order = np.argsort(ys, kind="stable")
+    return ys[order], xs[order]
+
+
+def box_downsample(
+    img: Image.Image, max_pixels: int, *, draft: bool = False
+) -> np.ndarray:
+    """
+    Box-filtered downsample to about `max_pixels` pixels.
+
+    The square reduce factor is rounded, so the output holds about
+    0.5–2.25x max_pixels; a side thinner than one block is reduced to a
+    single row / column and the long side alone sets the size.
+
+    With `draft`, a not-yet-decoded JPEG is decoded at reduced DCT scale so
+    the full resolution frame is never materialized (this resizes `img` in
+    place, so only use it on an image nothing else reads). Image.reduce()
+    then box-averages the remaining factor.
+    """
+    if draft:
+        factor = grid_step(img.width, img.height, max_pixels)
+        img.draft("RGB", (math.ceil(img.width / factor), math.ceil(img.height / factor)))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    factor = max(1, round(math.sqrt(img.width * img.height / max_pixels)))
+    fx = fy = factor
+    if factor >= img.height:
+        fy, fx = img.height, max(1, round(img.width / max_pixels))
+    elif factor >= img.width:
+        fx, fy = img.width, max(1, round(img.height / max_pixels))
+    if fx > 1 or fy > 1:
+        img = img.reduce((fx, fy))
+    return np.asarray(img).reshape(-1, 3)
+
+
+# ------------------------------------------------------------
+# Entry points
+# ------------------------------------------------------------
+
+
+def sample_pixels(
+    img: Image.Image,
+    max_pixels: int | None,
+    *,
+    sampler: str = "random",
+    rows: int = STRIP_ROWS,
+    seed: int | None = None,
+    draft: bool = False,
+) -> np.ndarray:
+    """
+    Sample ~`max_pixels` RGB pixels with the given sampler (all if None/0).
+
+    random, strided and stratified return at most max_pixels; box is within
+    its rounding (see box_downsample).
+    """
+    if sampler not in SAMPLERS:
+        raise ValueError(f"Unknown sampler: {sampler} (use one of {SAMPLERS})")
+
+    w, h = img.size
+    if not max_pixels or w * h <= max_pixels:
+        return np.concatenate(list(iter_rgb_strips(img, rows=rows)))
+
+    if sampler == "box":
+        return box_downsample(img, max_pixels, draft=draft)
+
+    if sampler in ("strided", "stratified"):
+        step = grid_steps(w, h, max_pixels)
+        if sampler == "strided":
+            ys, xs = strided_coords(w, h, step)
+        else:
+            ys, xs = stratified_coords(w, h, step, seed=seed)
+        return gather_pixels(img, ys, xs, rows=rows)
+
+    reservoir = ReservoirSampler(max_pixels, seed=seed)
+    for block in iter_rgb_strips(img, rows=rows):
+        reservoir.update(block)
+    return reservoir.sample()
+
+
+def sample_image_pixels(
+    path: Path,
+    max_pixels: int | None,
+    *,
+    sampler: str = "random",
+    rows: int = STRIP_ROWS,
+    seed: int | None = None,
+) -> np.ndarray:
+    """Path wrapper around sample_pixels for one-off sampling."""
+    with Image.open(path) as img:
+        return sample_pixels(
+            img, max_pixels, sampler=sampler, rows=rows, seed=seed, draft=True
+        )
+
+
+# ------------------------------------------------------------
+# Flat-region detection (tile-wise gradient histogram)
+# ------------------------------------------------------------
+
+# Photos up to this long side are analysed at full resolution; larger ones on
+# the first 2x pyramid level that fits (the 35th-percentile "flatness" depends
+# on scale, so downsampling ordinary photos would shift the bg hue).
+FLAT_MAX_SIDE = 2048
+FLAT_GRAD_BINS = 4096
+# |grad| of an 8-bit luma plane stays below 255 * sqrt(2); the rest is clipped
+FLAT_GRAD_MAX = 362.0
+
+
+def iter_gradient_tiles(
+    lum: np.ndarray, *, rows: int = STRIP_ROWS
+) -> Iterator[tuple[int, np.ndarray]]:
+    """
+    Yield (y0, |grad|) for `rows`-scanline tiles of a 2-D plane.
+
+    Each tile is read with a one-row halo so np.gradient uses the same
+    central differences as on the whole plane.
+    """
+    h, w = lum.shape
+    for y0 in range(0, h, rows):
+        y1 = min(h, y0 + rows)
+        lo, hi = max(0, y0 - 1), min(h, y1 + 1)
+        block = lum[lo:hi]
+        gy = np.gradient(block, axis=0) if block.shape[0] > 1 else np.zeros_like(block)
+        gx = np.gradient(block, axis=1) if w > 1 else np.zeros_like(block)
+        yield y0, np.hypot(gx, gy)[y0 - lo : y1 - lo]
+
+
+def gradient_histogram(grad: np.ndarray) -> np.ndarray:
+    idx = (grad.ravel() * (FLAT_GRAD_BINS / FLAT_GRAD_MAX)).astype(np.int64)
+    return np.bincount(
+        np.minimum(idx, FLAT_GRAD_BINS - 1), minlength=FLAT_GRAD_BINS
+    )
+
+
+def histogram_percentile(hist: np.ndarray, q: float) -> float:
+    """q-th percentile of a FLAT_GRAD_BINS histogram, interpolated inside its bin."""
+    cum = np.cumsum(hist)
+    target = cum[-1] * q / 100.0
+    k = int(np.searchsorted(cum, target))
+    below = cum[k - 1] if k > 0 else 0
+    frac = (target - below) / max(int(hist[k]), 1)
+    return (k + frac) * FLAT_GRAD_MAX / FLAT_GRAD_BINS
+
+
+# ------------------------------------------------------------
+# Shared decoded-image context
+# ------------------------------------------------------------
+
+
+class ImageContext:
+    """
+    One decoded image shared by every estimator in extract_color_pool.
+
+    The file is opened and decoded once; sampled pixels, quantized colors,
+    the luminance plane, the 2x pyramid and the flat-region mask are derived
+    lazily from that single decode and cached. Flat-region detection runs on
+    a downsampled pyramid level, so its cost does not grow with resolution.
+
+    Pixel-level accessors return values in the file's own color space; the
+    *_colors() methods convert their quantized colors to sRGB when the image
+    embeds a non-sRGB ICC profile (see color_management).
+    """
+
+    FLAT_PERCENTILE = 35.0
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        max_pixels: int | None,
+        sampler: str = "random",
+        seed: int | None = None,
+        rows: int = STRIP_ROWS,
+        color_manage: bool = True,
+    ):
+        self.path = Path(path)
+        self.img = Image.open(path)
+        self.icc_transform = image_srgb_transform(self.img) if color_manage else None
+        self.max_pixels = max_pixels
+        self.sampler = sampler
+        self.seed = seed
+        self.rows = rows
+        self._pixels = None
+        self._luminance = {}
+        self._flat_mask = None
+        self._pyramid = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        self.img.close()
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self.img.size
+
+    def pixels(self) -> np.ndarray:
+        """Sampled (n, 3) uint8 RGB pixels (all pixels if max_pixels is None/0)."""
+        if self._pixels is None:
+            self._pixels = sample_pixels(
+                self.img,
+                self.max_pixels,
+                sampler=self.sampler,
+                rows=self.rows,
+                seed=self.seed,
+            )
+        return self._pixels
+
+    def colors(self, quant: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Quantized unique colors + pixel counts.
+
+        With max_pixels the counts come from the pixel sample; without it every
+        pixel is counted in a running histogram (memory stays one strip).
+        """
+        hist = QuantizedHistogram(quant)
+        if self.max_pixels:
+            hist.update(self.pixels())
+        else:
+            for block in iter_rgb_strips(self.img, rows=self.rows):
+                hist.update(block)
+        return colors_to_srgb(*hist.colors(), quant, self.icc_transform)
+
+    def thumbnail_colors(self, size: int, quant: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Quantized colors + counts of a point-sampled thumbnail fitting size×size.
+
+        Nearest-neighbour sampling keeps real pixel colors (box filtering
+        averages away the darkest/lightest extremes the role checks need).
+        Rows and columns are picked at pixel centres (as resize(NEAREST))
+        from the full-resolution bands; a JPEG draft decode is not used
+        because it averages each DCT block.
+        """
+        w, h = self.size
+        scale = min(1.0, size / w, size / h)
+        tw, th = max(1, round(w * scale)), max(1, round(h * scale))
+        xs = ((np.arange(tw) + 0.5) * (w / tw)).astype(np.intp)
+        ys = ((np.arange(th) + 0.5) * (h / th)).astype(np.intp)
+        hist = QuantizedHistogram(quant)
+        for y0, band in iter_rgb_bands(self.img, rows=self.rows):
+            sel = ys[(ys >= y0) & (ys < y0 + len(band))] - y0
+            if len(sel):
+                hist.update(band[sel][:, xs].reshape(-1, 3))
+        return colors_to_srgb(*hist.colors(), quant, self.icc_transform)
+
+    def luminance(self, level: int = 0) -> np.ndarray:
+        """(h, w) float32 Rec.601 luma plane of pyramid `level`, filled band by band."""
+        if level not in self._luminance:
+            if level == 0:
+                w, h = self.size
+                bands = iter_rgb_bands(self.img, rows=self.rows)
+            else:
+                reduced = self.pyramid(level)
+                h, w = reduced.shape[:2]
+                bands = (
+                    (y0, reduced[y0 : y0 + self.rows]) for y0 in range(0, h, self.rows)
+                )
+            gray = np.empty((h, w), dtype=np.float32)
+            for y0, band in bands:
+                rgb = band.astype(np.float32)
+                gray[y0 : y0 + band.shape[0]] = (
+                    rgb[:, :, 0] * 0.299 + rgb[:, :, 1] * 0.587 + rgb[:, :, 2] * 0.114
+                )
+            self._luminance[level] = gray
+        return self._luminance[level]
+
+    def pyramid(self, level: int) -> np.ndarray:
+        """
+        (h, w, 3) uint8 RGB image box-reduced by 2**level.
+
+        Built band by band: bands are a multiple of 2**level rows, so
+        reducing each RGB band equals reducing the whole converted frame.
+        """
+        if level not in self._pyramid:
+            factor = 2**level
+            rows = max(factor, self.rows - self.rows % factor)
+            bands = [
+                np.asarray(Image.fromarray(band).reduce(factor)) if factor > 1 else band
+                for _, band in iter_rgb_bands(self.img, rows=rows)
+            ]
+            self._pyramid[level] = np.concatenate(bands)
+        return self._pyramid[level]
+
+    @property
+    def flat_level(self) -> int:
+        """Pyramid level whose long side is at most FLAT_MAX_SIDE."""
+        return max(0, math.ceil(math.log2(max(self.size) / FLAT_MAX_SIDE)))
+
+    def flat_mask(self) -> np.ndarray:
+        """
+        Bool mask of low-gradient pixels on pyramid level `flat_level`.
+
+        Two tile-wise passes over the downsampled luma plane: the first fills a
+        fixed-bin gradient histogram and reads the FLAT_PERCENTILE threshold
+        from it, the second marks gradients at or below that threshold.
+        """
+        if self._flat_mask is None:
+            lum = self.luminance(self.flat_level)
+            hist = np.zeros(FLAT_GRAD_BINS, dtype=np.int64)
+            for _, grad in iter_gradient_tiles(lum, rows=self.rows):
+                hist += gradient_histogram(grad)
+            thresh = histogram_percentile(hist, self.FLAT_PERCENTILE)
+
+            mask = np.empty(lum.shape, dtype=bool)
+            for y0, grad in iter_gradient_tiles(lum, rows=self.rows):
+                mask[y0 : y0 + grad.shape[0]] = grad <= thresh
+            self._flat_mask = mask
+        return self._flat_mask
+
+    def flat_pixels(self) -> np.ndarray:
+        """(n, 3) uint8 RGB pixels of pyramid `flat_level` inside the flat mask."""
+        mask = self.flat_mask()
+        if self.flat_level > 0:
+            return self.pyramid(self.flat_level)[mask]
+        blocks = []
+        for y0, band in iter_rgb_bands(self.img, rows=self.rows):
+            blocks.append(band[mask[y0 : y0 + band.shape[0]]])
+        return np.concatenate(blocks)
+
+    def flat_colors(self, quant: int) -> tuple[np.ndarray, np.ndarray]:
+        """Quantized sRGB colors + counts of the flat-region pixels."""
+        hist = QuantizedHistogram(quant)
+        hist.update(self.flat_pixels())
+        return colors_to_srgb(*hist.colors(), quant, self.icc_transform)
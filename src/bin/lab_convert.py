@@ -0,0 +1,157 @@
+"""
+Vectorized Lab/LCh -> sRGB conversion with gamut flags.
+
+Converts whole (n, 3) arrays of Lab values in one call, with the same math
+as skimage.color.lab2rgb (D65, 2°). Unlike lab2rgb, the out-of-gamut
+information is reported instead of being silently clipped away.
+
+Gamut handling:
+  - "clip":   clip sRGB channels to [0, 1] (lab2rgb behaviour)
+  - "chroma": keep L* and hue, bisect chroma down until the color fits
+"""
+
+from __future__ import annotations
+
+import string
+import warnings
+
+import numpy as np
+from skimage.color import lab2xyz
+from skimage.color.colorconv import rgb_from_xyz
+
+GAMUT_MODES = ("clip", "chroma")
+GAMUT_EPS = 1e-6
+
+
+# ------------------------------------------------------------
+# LCh <-> Lab
+# ------------------------------------------------------------
+
+
+def lch_to_lab_batch(L, C, h) -> np.ndarray:
+    hr = np.radians(np.asarray(h, dtype=float))
+    C = np.asarray(C, dtype=float)
+    return np.stack(
+        np.broadcast_arrays(np.asarray(L, dtype=float), C * np.cos(hr), C * np.sin(hr)),
+        axis=-1,
+    )
+
+
+def lab_to_lch_batch(lab: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    lab = np.asarray(lab, dtype=float).reshape(-1, 3)
+    C = np.sqrt(lab[:, 1] ** 2 + lab[:, 2] ** 2)
+    h = np.where(C > 1e-9, np.degrees(np.arctan2(lab[:, 2], lab[:, 1])) % 360.0, 0.0)
+    return lab[:, 0], C, h
+
+
+# ------------------------------------------------------------
+# Lab -> sRGB
+# ------------------------------------------------------------
+
+
+def lab_to_srgb(lab: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (n, 3) Lab -> ((n, 3) gamma-encoded sRGB in 0..1, unclipped; (n,) in-gamut).
+    """
+    lab = np.asarray(lab, dtype=float).reshape(-1, 3)
+    if len(lab) == 0:
+        return np.empty((0, 3)), np.empty(0, dtype=bool)
+
+    z_ok = (lab[:, 0] + 16.0) / 116.0 - lab[:, 2] / 200.0 >= 0.0
+    with warnings.catch_warnings():
+        # lab2xyz warns (and clamps Z to 0) for imaginary colors; we flag them
+        warnings.simplefilter("ignore")
+        xyz = lab2xyz(lab[np.newaxis, :, :])[0]
+
+    lin = xyz @ rgb_from_xyz.T.copy()
+    in_gamut = z_ok & np.all((lin >= -GAMUT_EPS) & (lin <= 1.0 + GAMUT_EPS), axis=1)
+
+    rgb = lin.copy()
+    mask = rgb > 0.0031308
+    rgb[mask] = 1.055 * np.power(rgb[mask], 1 / 2.4) - 0.055
+    rgb[~mask] *= 12.92
+    return rgb, in_gamut
+
+
+def _chroma_map(lab: np.ndarray, in_gamut: np.ndarray, iters: int = 16) -> np.ndarray:
+    """Reduce chroma of out-of-gamut colors (fixed L*, hue) until they fit."""
+    lab = lab.copy()
+    out = ~in_gamut
+    if not np.any(out):
+        return lab
+    L, C, h = lab_to_lch_batch(lab[out])
+    L = np.clip(L, 0.0, 100.0)
+    lo = np.zeros_like(C)
+    hi = C.copy()
+    for _ in range(iters):
+        mid = (lo + hi) / 2.0
+        _, ok = lab_to_srgb(lch_to_lab_batch(L, mid, h))
+        lo = np.where(ok, mid, lo)
+        hi = np.where(ok, hi, mid)
+    lab[out] = lch_to_lab_batch(L, lo, h)
+    return lab
+
+
+def lab_to_rgb_batch(
+    lab: np.ndarray, *, gamut: str = "clip"
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (n, 3) Lab -> ((n, 3) uint8 RGB, (n,) in-gamut flag of the *input* colors).
+
+    With gamut="clip" the result matches the scalar lab2rgb + clip + round
+    helpers in extract_colors.py / fill_gaps.py.
+    """
+    if gamut not in GAMUT_MODES:
+        raise ValueError(f"Unknown gamut mode: {gamut} (use one of {GAMUT_MODES})")
+    lab = np.asarray(lab, dtype=float).reshape(-1, 3)
+    rgb, in_gamut = lab_to_srgb(lab)
+    if gamut == "chroma":
+        rgb, _ = lab_to_srgb(_chroma_map(lab, in_gamut))
+    rgb = np.clip(rgb, 0.0, 1.0)
+    return (rgb * 255.0 + 0.5).astype(np.uint8), in_gamut
+
+
+# ------------------------------------------------------------
+# Packed RGB / hex
+# ------------------------------------------------------------
+
+
+def pack_rgb24(rgb: np.ndarray) -> np.ndarray:
+    """(n, 3) 8-bit RGB -> (n,) uint32 0xRRGGBB."""
+    rgb = np.asarray(rgb).reshape(-1, 3).astype(np.uint32)
+    return (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+
+
+def rgb24_hex(key: int) -> str:
+    return f"#{int(key):06x}"
+
+
+def rgb24_to_hex(keys: np.ndarray) -> list[str]:
+    return [rgb24_hex(k) for k in np.asarray(keys).ravel()]
+
+
+def hex_to_rgb24(hexes) -> np.ndarray:
+    """'rrggbb' / '#rrggbb' strings (any case) -> (n,) uint32 0xRRGGBB."""
+    keys = []
+    for h in hexes:
+        digits = str(h).strip().lstrip("#")
+        if len(digits) != 6 or not all(c in string.hexdigits for c in digits):
+            raise ValueError(f"Not a #rrggbb color: {h!r}")
+        keys.append(int(digits, 16))
+    return np.array(keys, dtype=np.uint32)
+
+
+def lab_to_rgb24_batch(
+    lab: np.ndarray, *, gamut: str = "clip"
+) -> tuple[np.ndarray, np.ndarray]:
+    """(n, 3) Lab -> ((n,) uint32 0xRRGGBB, (n,) in-gamut flag)."""
+    rgb, in_gamut = lab_to_rgb_batch(lab, gamut=gamut)
+    return pack_rgb24(rgb), in_gamut
+
+
+def lab_to_hex_batch(
+    lab: np.ndarray, *, gamut: str = "clip"
+) -> tuple[list[str], np.ndarray]:
+    """(n, 3) Lab -> (list of lowercase '#rrggbb', (n,) in-gamut flag)."""
+    keys, in_gamut = lab_to_rgb24_batch(lab, gamut=gamut)
+    return rgb24_to_hex(keys), in_gamut
@@ -0,0 +1,95 @@
+"""
+Nearest-color lookups over a ColorPool in Lab.
+
+LabIndex builds one KD-tree over every pool color and one per role, once
+per pool. nearest() answers "which available colors are closest to this
+Lab point": the k nearest, optionally within one role, skipping packed
+keys in a ColorSet, as a PoolView ordered by distance with a `dist`
+column. Used keys are skipped by over-querying, widening the query only
+when too many of the hits are used.
+
+Distances are CIE76 with the L* axis scaled by `l_weight` (the l of
+CMC l:c); l_weight > 1 makes lightness errors cost more than chroma /
+hue errors.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from color_pool import ColorPool, ColorSet, PoolView
+from compiled_constraints import ROLE_INDEX
+
+
+class LabIndex:
+    """KD-trees over a ColorPool's Lab values: all colors and per role."""
+
+    def __init__(self, pool: ColorPool, *, l_weight: float = 1.0):
+        self.pool = pool
+        self.l_weight = float(l_weight)
+        pts = self._coords(np.stack([pool["L"], pool["a"], pool["b"]], axis=1))
+        ok = np.isfinite(pts).all(axis=1)
+        self._trees: dict[int | None, tuple[np.ndarray, cKDTree]] = {}
+        for code in [None, *np.unique(pool.role[ok]).tolist()]:
+            idx = np.flatnonzero(ok if code is None else ok & (pool.role == code))
+            if len(idx):
+                self._trees[code] = (idx, cKDTree(pts[idx]))
+
+    def _coords(self, lab: np.ndarray) -> np.ndarray:
+        return np.asarray(lab, dtype=float) * np.array([self.l_weight, 1.0, 1.0])
+
+    def nearest(
+        self,
+        target,
+        k: int = 1,
+        *,
+        role: str | None = None,
+        exclude: ColorSet | None = None,
+    ) -> PoolView:
+        """Up to k colors nearest to Lab `target` (in `role`), skipping `exclude`."""
+        code = None if role is None else ROLE_INDEX.get(role, -1)
+        if code not in self._trees or k <= 0:
+            return PoolView(self.pool, np.empty(0, dtype=np.intp), {"dist": np.empty(0)})
+        idx, tree = self._trees[code]
+        q = self._coords(target)
+        n = len(idx)
+        m = min(n, k + (len(exclude) if exclude is not None else 0))
+        while True:
+            d, j = tree.query(q, k=m)
+            d, rows = np.atleast_1d(d), idx[np.atleast_1d(j)]
+            keep = (
+                ~exclude.contains(self.pool.rgb[rows])
+                if exclude is not None
+                else np.ones(len(rows), dtype=bool)
+            )
+            if keep.sum() >= k or m == n:
+                break
+            m = min(n, 2 * m)
+        return PoolView(self.pool, rows[keep][:k], {"dist": d[keep][:k]})
+
+    def rank(self, view: PoolView, target) -> PoolView:
+        """`view` ordered by distance to `target` (brute force, for subsets)."""
+        d = np.linalg.norm(self._coords(view.lab()) - self._coords(target), axis=1)
+        return view.with_column("dist", d).order_by(("dist", True))
+
+    def first(
+        self,
+        target,
+        accept,
+        *,
+        role: str | None = None,
+        exclude: ColorSet | None = None,
+        k: int = 16,
+    ) -> PoolView:
+        """
+        Nearest colors to `target` passing `accept(view) -> mask`, ordered by
+        distance; the query widens until a match is found or the index is
+        exhausted (empty view).
+        """
+        while True:
+            view = self.nearest(target, k, role=role, exclude=exclude)
+            hit = view.where(accept(view))
+            if not hit.empty or len(view) < k:
+                return hit
+            k *= 4
@@ -0,0 +1,112 @@
+"""
+Precomputed sRGB -> Lab/LCh lookup tables.
+
+There are only (255 // quant + 1)^3 quantized colors (32,768 at --quant 8),
+so each table is computed once with skimage's rgb2lab, saved as a .npy file
+and memory-mapped afterwards. Rows are
+indexed by quantize.pack_rgb keys; columns are LUT_COLUMNS. Worker processes
+that map the same file share its pages through the OS page cache.
+
+Below LUT_MIN_QUANT the grid is too large to be worth tabulating (16.7M
+rows for full 8-bit RGB); lab_lookup converts those colors directly.
+
+Tables live in $LAB_LUT_DIR (default ~/.cache/nvim-theme-color-dist).
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from skimage.color import rgb2lab
+
+from quantize import pack_rgb, quant_levels, unpack_keys
+
+LUT_COLUMNS = ("L", "a", "b", "chroma", "hue")
+LUT_DIR = Path(
+    os.environ.get("LAB_LUT_DIR", Path.home() / ".cache" / "nvim-theme-color-dist")
+)
+CHUNK = 1 << 20
+LUT_MIN_QUANT = 4
+
+_LOADED: dict[tuple[Path, int], np.ndarray] = {}
+
+
+def lut_path(quant: int, lut_dir: Path | None = None) -> Path:
+    return Path(lut_dir or LUT_DIR) / f"srgb_lab_q{int(quant)}.npy"
+
+
+def srgb_to_lch(rgb: np.ndarray) -> np.ndarray:
+    """(n, 3) 8-bit sRGB -> (n, 5) float64 [L, a, b, chroma, hue], computed directly."""
+    rgb = np.asarray(rgb, dtype=float).reshape(-1, 3)
+    out = np.empty((len(rgb), len(LUT_COLUMNS)), dtype=float)
+    if len(rgb) == 0:
+        return out
+    lab = rgb2lab(rgb[np.newaxis, :, :] / 255.0)[0]
+    out[:, 0:3] = lab
+    out[:, 3] = np.sqrt(lab[:, 1] ** 2 + lab[:, 2] ** 2)
+    out[:, 4] = np.degrees(np.arctan2(lab[:, 2], lab[:, 1])) % 360.0
+    return out
+
+
+def build_lab_lut(quant: int) -> np.ndarray:
+    """(levels^3, 5) float32 table of L, a, b, chroma, hue for every grid color."""
+    n = quant_levels(quant) ** 3
+    lut = np.empty((n, len(LUT_COLUMNS)), dtype=np.float32)
+    for start in range(0, n, CHUNK):
+        keys = np.arange(start, min(n, start + CHUNK))
+        lut[keys] = srgb_to_lch(unpack_keys(keys, quant))
+    return lut
+
+
+def load_lab_lut(quant: int, lut_dir: Path | None = None) -> np.ndarray:
+    """
+    Memory-mapped LUT for `quant`, building and saving it on first use.
+
+    The file is written to a temp name and renamed into place, so concurrent
+    workers never map a partial table. If the cache dir is not writable the
+    table is kept in memory for this process only.
+    """
+    path = lut_path(quant, lut_dir)
+    key = (path, int(quant))
+    if key in _LOADED:
+        return _LOADED[key]
+
+    if not path.exists():
+        lut = build_lab_lut(quant)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".npy.tmp")
+            with os.fdopen(fd, "wb") as fh:
+                np.save(fh, lut)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except OSError:
+            _LOADED[key] = lut
+            return lut
+
+    _LOADED[key] = np.load(path, mmap_mode="r")
+    return _LOADED[key]
+
+
+def lab_lookup(rgb: np.ndarray, quant: int) -> np.ndarray:
+    """
+    (n, 3) RGB on the `quant` grid -> (n, 5) float64 [L, a, b, chroma, hue].
+
+    Grids finer than LUT_MIN_QUANT are converted directly (srgb_to_lch).
+    """
+    rgb = np.asarray(rgb).reshape(-1, 3)
+    if len(rgb) == 0:
+        return np.empty((0, len(LUT_COLUMNS)), dtype=float)
+    if quant < LUT_MIN_QUANT:
+        return srgb_to_lch((rgb // quant) * quant)
+    return load_lab_lut(quant)[pack_rgb(rgb, quant)].astype(float)
+
+
+def hex_to_rgb_array(hexes) -> np.ndarray:
+    """Iterable of 'rrggbb' / '#rrggbb' strings -> (n, 3) uint8 RGB."""
+    vals = [int(str(h).strip().lstrip("#"), 16) for h in hexes]
+    v = np.asarray(vals, dtype=np.int64)
+    return np.stack([v >> 16, (v >> 8) & 0xFF, v & 0xFF], axis=1).astype(np.uint8)
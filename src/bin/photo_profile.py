@@ -0,0 +1,189 @@
+"""
+Sorted-value quantile profile of a photo's color table.
+
+extract_colors.py asks for many L* / chroma quantiles of the same table
+(lightness and chroma bands, hue-band thresholds, the dark-cluster cut).
+PhotoProfile sorts each column once; every quantile after that is an
+O(log n) lookup:
+
+  - unweighted: the same "linear" estimate as pandas / np.quantile
+  - weighted:   linear estimate over the table expanded by its `count`
+                column (each color repeated once per sampled pixel), found
+                with a searchsorted on the cumulative counts; a table with
+                only `frequency` uses the inverse of its normalized CDF
+
+The profile also carries the per-photo metadata (band hues, lightness /
+chroma bands) and saves it, with a fixed quantile grid, as a small JSON
+sidecar so later stages read one record instead of photo_* pool columns.
+A loaded profile answers quantiles by interpolating that grid.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+PROFILE_VERSION = 1
+PROFILE_COLUMNS = ("L", "chroma")
+
+# Quantiles kept in the sidecar (every percentile)
+GRID = np.arange(101) / 100
+
+
+def _lerp(a: np.ndarray, b: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """NumPy's quantile lerp (interpolates from the nearer end)."""
+    diff = b - a
+    return np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+
+
+def _linear_quantile(values: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """np.quantile(values, q) for already-sorted `values`, without the sort."""
+    n = len(values)
+    # Same float expression as NumPy's "linear" virtual index
+    virtual = (n - 1) * q
+    prev = np.floor(virtual)
+    gamma = virtual - prev
+    lo = np.clip(prev, 0, n - 1).astype(np.intp)
+    hi = np.clip(prev + 1, 0, n - 1).astype(np.intp)
+    return _lerp(values[lo], values[hi], gamma)
+
+
+def _weighted_quantile(
+    values: np.ndarray, cum_weights: np.ndarray, q: np.ndarray, unit: float = 1.0
+) -> np.ndarray:
+    """
+    Linear quantile of sorted `values` repeated by weight (cum_weights = cumsum).
+
+    `unit` is the weight of one sample: with integer counts and unit=1 this
+    is np.quantile(np.repeat(values, counts), q). unit=0 (weights known only
+    up to scale) returns the inverse of the normalized CDF.
+    """
+    last = len(values) - 1
+    if unit <= 0.0:
+        cdf = cum_weights / cum_weights[-1]
+        return values[np.minimum(np.searchsorted(cdf, q, side="left"), last)]
+    cum = cum_weights / unit
+    # Virtual index into the expanded samples, as _linear_quantile
+    virtual = (cum[-1] - 1.0) * q
+    prev = np.floor(virtual)
+    gamma = virtual - prev
+    lo = np.minimum(np.searchsorted(cum, prev, side="right"), last)
+    hi = np.minimum(np.searchsorted(cum, prev + 1.0, side="right"), last)
+    return _lerp(values[lo], values[hi], gamma)
+
+
+class PhotoProfile:
+    """Sorted L* / chroma of one color table plus its per-photo metadata."""
+
+    def __init__(
+        self,
+        sorted_values: dict[str, np.ndarray],
+        cum_weights: dict[str, np.ndarray] | None = None,
+        *,
+        weighted: bool = False,
+        weight_unit: float = 1.0,
+        stats: dict[str, Any] | None = None,
+    ):
+        self.sorted_values = {k: np.asarray(v, dtype=float) for k, v in sorted_values.items()}
+        self.cum_weights = cum_weights
+        self.weight_unit = float(weight_unit)
+        self.weighted = bool(weighted)
+        self.stats: dict[str, Any] = dict(stats or {})
+
+    @classmethod
+    def from_table(cls, df: pd.DataFrame, *, weighted: bool = False) -> "PhotoProfile":
+        """
+        Sort L and chroma of a color table once.
+
+        Weights are the `count` column (sampled pixels) if the table has
+        one, else `frequency`.
+        """
+        if df.empty:
+            raise ValueError("Cannot profile an empty color table")
+        if "count" in df.columns:
+            weights, unit = df["count"].to_numpy(dtype=float), 1.0
+        else:
+            weights, unit = df["frequency"].to_numpy(dtype=float), 0.0
+        sorted_values, cum_weights = {}, {}
+        for col in PROFILE_COLUMNS:
+            v = df[col].to_numpy(dtype=float)
+            order = np.argsort(v, kind="stable")
+            sorted_values[col] = v[order]
+            cum_weights[col] = np.cumsum(weights[order])
+        return cls(sorted_values, cum_weights, weighted=weighted, weight_unit=unit)
+
+    def quantile(self, col: str, q, *, weighted: bool | None = None):
+        """
+        Quantile(s) of `col` ("L" or "chroma"); float for scalar q, else array.
+
+        `weighted` defaults to the profile's own setting. A loaded profile
+        only has the grid it was saved with.
+        """
+        weighted = self.weighted if weighted is None else weighted
+        qs = np.atleast_1d(np.asarray(q, dtype=float))
+        values = self.sorted_values[col]
+        if self.cum_weights is None:
+            if weighted != self.weighted:
+                kind = "weighted" if self.weighted else "unweighted"
+                raise ValueError(f"Loaded profile only has {kind} quantiles")
+            out = _linear_quantile(values, qs)
+        elif weighted:
+            out = _weighted_quantile(values, self.cum_weights[col], qs, self.weight_unit)
+        else:
+            out = _linear_quantile(values, qs)
+        return float(out[0]) if np.ndim(q) == 0 else out
+
+    def median(self, col: str, *, weighted: bool | None = None) -> float:
+        return self.quantile(col, 0.5, weighted=weighted)
+
+    # --------------------------------------------------------
+    # Sidecar
+    # --------------------------------------------------------
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "version": PROFILE_VERSION,
+            "weighted": self.weighted,
+            "grid": GRID.tolist(),
+            "quantiles": {
+                col: self.quantile(col, GRID).tolist() for col in self.sorted_values
+            },
+            "stats": {k: _json_value(v) for k, v in self.stats.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "PhotoProfile":
+        version = int(data.get("version", -1))
+        if version != PROFILE_VERSION:
+            raise ValueError(f"Unsupported photo profile version {version}")
+        if not np.allclose(data["grid"], GRID):
+            raise ValueError("Photo profile was saved with a different quantile grid")
+        # Grid values at evenly spaced q: linear quantiles of the grid
+        # interpolate between them exactly
+        return cls(
+            {col: np.asarray(v, dtype=float) for col, v in data["quantiles"].items()},
+            weighted=bool(data["weighted"]),
+            stats=data["stats"],
+        )
+
+    def save(self, path: Path) -> None:
+        path.write_text(json.dumps(self.to_dict(), indent=2) + "\n")
+
+    @classmethod
+    def load(cls, path: Path) -> "PhotoProfile":
+        try:
+            return cls.from_dict(json.loads(path.read_text()))
+        except ValueError as e:
+            raise ValueError(f"{path}: {e}") from e
+
+
+def _json_value(v: Any) -> Any:
+    """NaN / None -> null, NumPy scalars -> Python floats."""
+    if v is None:
+        return None
+    v = float(v)
+    return None if np.isnan(v) else v
@@ -0,0 +1,72 @@
+"""
+Color-pool files: typed .npz with a photo-profile header, or CSV.
+
+extract_colors.py writes the pool; assign_elements.py and fill_gaps.py
+read it back. In the .npz form every column is a typed array (nothing is
+re-parsed from text) and the photo profile (photo_profile.py) is stored
+once in a JSON header rather than as photo_* columns on every row. The
+format follows the file suffix; .csv remains an export and is still
+readable, without a profile.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from photo_profile import PhotoProfile
+
+POOL_VERSION = 1
+
+
+def is_binary_pool(path: Path) -> bool:
+    return Path(path).suffix.lower() == ".npz"
+
+
+def save_pool(pool: pd.DataFrame, path: Path, *, profile: PhotoProfile | None = None) -> None:
+    """Write `pool` as .npz (with `profile` as header) or, for other suffixes, CSV."""
+    if not is_binary_pool(path):
+        pool.to_csv(path, index=False)
+        return
+
+    arrays = {}
+    for i, col in enumerate(pool.columns):
+        s = pool[col].infer_objects()
+        if pd.api.types.is_bool_dtype(s) or pd.api.types.is_numeric_dtype(s):
+            arrays[f"c{i}"] = s.to_numpy()
+            continue
+        # Text columns: unicode array + missing-value mask
+        na = s.isna().to_numpy()
+        arrays[f"c{i}"] = np.where(na, "", s.astype(str).to_numpy()).astype(str)
+        if na.any():
+            arrays[f"na{i}"] = na
+    header = {
+        "version": POOL_VERSION,
+        "columns": [str(c) for c in pool.columns],
+        "profile": None if profile is None else profile.to_dict(),
+    }
+    # File handle: np.savez would append ".npz" to other suffixes
+    with open(path, "wb") as fh:
+        np.savez_compressed(fh, header=np.array(json.dumps(header)), **arrays)
+
+
+def load_pool(path: Path) -> tuple[pd.DataFrame, PhotoProfile | None]:
+    """Read a pool written by save_pool; the profile is None for CSV pools."""
+    if not is_binary_pool(path):
+        return pd.read_csv(path), None
+
+    with np.load(path, allow_pickle=False) as z:
+        header = json.loads(str(z["header"]))
+        if header.get("version") != POOL_VERSION:
+            raise ValueError(f"{path}: unsupported pool version {header.get('version')}")
+        data = {}
+        for i, col in enumerate(header["columns"]):
+            values = z[f"c{i}"]
+            if f"na{i}" in z.files:
+                values = pd.Series(values).mask(z[f"na{i}"])
+            data[col] = values
+    profile = header["profile"]
+    return pd.DataFrame(data), None if profile is None else PhotoProfile.from_dict(profile)
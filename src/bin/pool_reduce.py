@@ -0,0 +1,98 @@
+"""
+Pool reduction: perceptual dedupe + diversity-preserving per-role cap.
+
+Finer --quant or larger --max-pixels multiply near-identical candidates;
+every later stage (anchors, accents, gap filling) scales with pool size.
+Within each role:
+
+  - dedupe_voxels: colors are hashed into Lab voxels of side
+    deltaE / sqrt(3), so any two colors sharing a voxel are at most deltaE
+    apart (CIE76). Each voxel keeps its best-scoring color and the summed
+    frequency of the voxel.
+  - farthest_point_indices: roles still over the cap keep their
+    best-scoring color plus, greedily, the color farthest (in Lab) from
+    everything kept so far, so the spread of candidates survives.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+def voxel_ids(lab: np.ndarray, delta_e: float) -> np.ndarray:
+    """
+    Dense voxel id per color for Lab voxels of side delta_e / sqrt(3).
+
+    The three cell coordinates are offset to start at 0 and packed into one
+    int64 key (shift / or), so np.unique sorts a flat array instead of
+    lexsorting rows; ids keep the (L, a, b) lexicographic cell order.
+    """
+    cell = np.floor(np.asarray(lab, dtype=float) / (delta_e / np.sqrt(3.0))).astype(np.int64)
+    if len(cell) == 0:
+        return np.empty(0, dtype=np.intp)
+    cell -= cell.min(axis=0)
+    bits = [int(v).bit_length() for v in cell.max(axis=0)]
+    if sum(bits) > 63:
+        # Grid too fine to pack (far below any useful dedupe distance)
+        return np.unique(cell, axis=0, return_inverse=True)[1].ravel()
+    keys = (cell[:, 0] << (bits[1] + bits[2])) | (cell[:, 1] << bits[2]) | cell[:, 2]
+    return np.unique(keys, return_inverse=True)[1]
+
+
+def dedupe_voxels(pool: pd.DataFrame, delta_e: float) -> pd.DataFrame:
+    """One row per (role, Lab voxel): highest score kept, frequencies summed."""
+    if pool.empty or delta_e <= 0:
+        return pool
+    lab = pool[["L", "a", "b"]].to_numpy(dtype=float)
+    role = pd.factorize(pool["role"])[0].astype(np.int64)
+    vox = voxel_ids(lab, delta_e)
+    group = pd.factorize(role * (vox.max() + 1) + vox)[0]
+
+    # Best row of each group: sort by (group, -score, -frequency)
+    order = np.lexsort(
+        (-pool["frequency"].to_numpy(dtype=float), -pool["score"].to_numpy(dtype=float), group)
+    )
+    first = order[np.r_[True, group[order][1:] != group[order][:-1]]]
+
+    out = pool.iloc[np.sort(first)].copy()
+    freq = np.bincount(group, weights=pool["frequency"].to_numpy(dtype=float))
+    out["frequency"] = freq[group[np.sort(first)]]
+    return out.reset_index(drop=True)
+
+
+def farthest_point_indices(lab: np.ndarray, k: int, start: int = 0) -> np.ndarray:
+    """k row indices of `lab` by greedy farthest-point sampling from `start`."""
+    n = len(lab)
+    if n <= k:
+        return np.arange(n)
+    chosen = np.empty(k, dtype=np.intp)
+    chosen[0] = start
+    d2 = np.sum((lab - lab[start]) ** 2, axis=1)
+    for i in range(1, k):
+        chosen[i] = int(np.argmax(d2))
+        d2 = np.minimum(d2, np.sum((lab - lab[chosen[i]]) ** 2, axis=1))
+    return chosen
+
+
+def cap_roles(pool: pd.DataFrame, max_per_role: int) -> pd.DataFrame:
+    """At most max_per_role rows per role, chosen by farthest-point sampling."""
+    if pool.empty or max_per_role <= 0:
+        return pool
+    keep = []
+    for _, idx in pool.groupby("role", sort=False).indices.items():
+        if len(idx) <= max_per_role:
+            keep.append(idx)
+            continue
+        sub = pool.iloc[idx]
+        start = int(np.argmax(sub["score"].to_numpy(dtype=float)))
+        lab = sub[["L", "a", "b"]].to_numpy(dtype=float)
+        keep.append(idx[farthest_point_indices(lab, max_per_role, start)])
+    return pool.iloc[np.sort(np.concatenate(keep))].reset_index(drop=True)
+
+
+def reduce_pool(
+    pool: pd.DataFrame, *, dedupe_deltae: float = 0.0, max_per_role: int = 0
+) -> pd.DataFrame:
+    """dedupe_voxels then cap_roles; a zero setting skips that step."""
+    return cap_roles(dedupe_voxels(pool, dedupe_deltae), max_per_role)
@@ -0,0 +1,84 @@
+"""
+Packed-integer RGB quantizer.
+
+Quantized colors are packed into one integer key per pixel and counted with
+np.bincount over the fixed (255 // quant + 1)^3 grid. This replaces
+np.unique(rgb, axis=0, return_counts=True), which lexsorts every row, and
+returns the same (uniq, counts) in the same (R, G, B) lexicographic order.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+# Blocks with fewer than grid_size / DENSE_RATIO keys are counted sparsely
+DENSE_RATIO = 4
+
+
+def quant_levels(quant: int) -> int:
+    """Number of quantized levels per channel: values 0, q, 2q, ... <= 255."""
+    return 255 // int(quant) + 1
+
+
+def pack_rgb(rgb: np.ndarray, quant: int) -> np.ndarray:
+    """(n, 3) RGB (any numeric dtype, 0..255) -> (n,) int64 grid keys."""
+    n = quant_levels(quant)
+    q = (np.asarray(rgb) // quant).astype(np.int64)
+    return (q[:, 0] * n + q[:, 1]) * n + q[:, 2]
+
+
+def unpack_keys(keys: np.ndarray, quant: int) -> np.ndarray:
+    """(n,) grid keys -> (n, 3) uint8 quantized RGB."""
+    n = quant_levels(quant)
+    keys = np.asarray(keys, dtype=np.int64)
+    rgb = np.stack([keys // (n * n), (keys // n) % n, keys % n], axis=1)
+    return (rgb * quant).astype(np.uint8)
+
+
+class QuantizedHistogram:
+    """
+    Fixed-size pixel histogram over the quantized RGB grid.
+
+    A pixel (r, g, b) is counted in the cell of ((r // q) * q, (g // q) * q,
+    (b // q) * q). Histograms can be updated block by block (streaming) and
+    the same `counts` array reused by any estimator that needs it.
+
+    `counts` holds the whole grid (134 MB of int64 at quant 1). A block
+    much smaller than the grid is counted over the keys it contains
+    (np.unique) and added in place, so an update never allocates another
+    grid-sized array.
+    """
+
+    def __init__(self, quant: int):
+        self.quant = int(quant)
+        self.levels = quant_levels(self.quant)
+        self.counts = np.zeros(self.levels**3, dtype=np.int64)
+
+    def update(self, pixels: np.ndarray, weights: np.ndarray | None = None) -> None:
+        """Count `pixels` (or add `weights` per pixel, e.g. merged counts)."""
+        keys = pack_rgb(pixels, self.quant)
+        if self.counts.size > DENSE_RATIO * len(keys):
+            uniq, inv = np.unique(keys, return_inverse=True)
+            if weights is None:
+                self.counts[uniq] += np.bincount(inv, minlength=len(uniq))
+            else:
+                binned = np.bincount(inv, weights=weights, minlength=len(uniq))
+                self.counts[uniq] += np.rint(binned).astype(np.int64)
+        elif weights is None:
+            self.counts += np.bincount(keys, minlength=self.counts.size)
+        else:
+            binned = np.bincount(keys, weights=weights, minlength=self.counts.size)
+            self.counts += np.rint(binned).astype(np.int64)
+
+    def colors(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return (uniq, counts) like np.unique(rgb, axis=0, return_counts=True)."""
+        keys = np.flatnonzero(self.counts)
+        return unpack_keys(keys, self.quant), self.counts[keys]
+
+
+def quantized_colors(rgb: np.ndarray, quant: int) -> tuple[np.ndarray, np.ndarray]:
+    """Drop-in for np.unique((rgb // quant) * quant, axis=0, return_counts=True)."""
+    hist = QuantizedHistogram(quant)
+    if len(rgb):
+        hist.update(rgb)
+    return hist.colors()
@@ -0,0 +1,110 @@
+#!/usr/local/bin/python
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import click
+
+from color_sketch import ColorSketch
+from image_sampling import SAMPLERS, STRIP_ROWS
+
+# ------------------------------------------------------------
+# Map / reduce
+# ------------------------------------------------------------
+
+
+def load_or_sketch(path: Path, **sketch_kwargs) -> ColorSketch:
+    """Existing .npz sketches are loaded as-is; anything else is sketched as an image."""
+    if path.suffix.lower() == ".npz":
+        return ColorSketch.load(path)
+    return ColorSketch.from_image(path, **sketch_kwargs)
+
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+
+
+@click.command()
+@click.argument(
+    "inputs", nargs=-1, required=True, type=click.Path(exists=True, path_type=Path)
+)
+@click.option(
+    "--out",
+    "out_path",
+    required=True,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Merged sketch (.npz) for extract_colors.py --sketch.",
+)
+@click.option("--quant", default=8, show_default=True)
+@click.option(
+    "--max-pixels",
+    default=100_000,
+    show_default=True,
+    help="Pixels sampled per image (0 = count every pixel; big images weigh more).",
+)
+@click.option(
+    "--sampler",
+    type=click.Choice(SAMPLERS, case_sensitive=False),
+    default="random",
+    show_default=True,
+)
+@click.option("--seed", default=0, show_default=True, type=int)
+@click.option("--strip-rows", default=STRIP_ROWS, show_default=True, type=int)
+@click.option(
+    "--color-manage/--no-color-manage",
+    default=True,
+    show_default=True,
+    help="Convert colors from an embedded (non-sRGB) ICC profile to sRGB.",
+)
+@click.option(
+    "--jobs",
+    default=1,
+    show_default=True,
+    type=int,
+    help="Images sketched in parallel worker processes.",
+)
+def sketch_images(
+    inputs,
+    out_path,
+    quant,
+    max_pixels,
+    sampler,
+    seed,
+    strip_rows,
+    color_manage,
+    jobs,
+):
+    """
+    Sketch images (and/or merge existing .npz sketches) into one color sketch.
+    """
+    sketch_one = partial(
+        load_or_sketch,
+        quant=quant,
+        max_pixels=max_pixels,
+        sampler=sampler.lower(),
+        seed=seed,
+        rows=strip_rows,
+        color_manage=color_manage,
+    )
+    if jobs > 1 and len(inputs) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            sketches = list(pool.map(sketch_one, inputs))
+    else:
+        sketches = [sketch_one(p) for p in inputs]
+
+    try:
+        merged = ColorSketch.merge_all(sketches)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    merged.save(out_path)
+    click.echo(
+        f"🧮 Sketched {len(merged.sources)} image(s), "
+        f"{len(merged.keys)} colors → {out_path}"
+    )
+
+
+if __name__ == "__main__":
+    sketch_images()
@@ -0,0 +1,150 @@
+"""
+Seeded weighted k-means for color-table clustering.
+
+Rows of a color table are weighted by pixel frequency. Centers start from
+weighted k-means++ seeding, and iteration stops once no center moves by
+more than `tol`. Tables larger than `batch_size` are fitted with
+mini-batch updates (Sculley 2010): each step clusters a frequency-weighted
+sample and moves centers by a per-center decaying learning rate, stopping
+once the smoothed batch inertia stops improving. The final labels always
+cover the full table.
+
+Distances are computed as |x|^2 - 2 x.c + |c|^2, an (n, k) matrix, rather
+than an (n, k, d) difference tensor. The same seed gives the same result.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+BATCH_SIZE = 4096
+# Mini-batch steps without a better smoothed batch inertia before stopping
+PATIENCE = 10
+
+
+@dataclass(frozen=True)
+class KMeansResult:
+    centers: np.ndarray  # (k, d)
+    labels: np.ndarray  # (n,)
+    inertia: float  # weighted sum of squared distances
+    n_iter: int
+    converged: bool
+
+
+def sq_distances(x: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """(n, k) squared Euclidean distances (clamped at 0 against rounding)."""
+    d = (
+        np.einsum("ij,ij->i", x, x)[:, None]
+        - 2.0 * (x @ centers.T)
+        + np.einsum("ij,ij->i", centers, centers)[None, :]
+    )
+    return np.maximum(d, 0.0)
+
+
+def kmeans_pp_init(
+    x: np.ndarray, w: np.ndarray, k: int, rng: np.random.Generator
+) -> np.ndarray:
+    """Weighted k-means++ seeding: next center drawn ~ w * D(x)^2."""
+    p = w / w.sum()
+    centers = [x[rng.choice(len(x), p=p)]]
+    d2 = sq_distances(x, centers[0][None, :])[:, 0]
+    for _ in range(1, k):
+        score = w * d2
+        total = score.sum()
+        # Fewer distinct points than k: fall back to frequency
+        idx = rng.choice(len(x), p=score / total if total > 0 else p)
+        centers.append(x[idx])
+        d2 = np.minimum(d2, sq_distances(x, x[idx][None, :])[:, 0])
+    return np.array(centers, dtype=float)
+
+
+def _weighted_means(
+    x: np.ndarray, w: np.ndarray, labels: np.ndarray, k: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """(k, d) per-label weighted sums and (k,) total weights."""
+    wsum = np.bincount(labels, weights=w, minlength=k)
+    sums = np.stack(
+        [np.bincount(labels, weights=w * x[:, j], minlength=k) for j in range(x.shape[1])],
+        axis=1,
+    )
+    return sums, wsum
+
+
+def weighted_kmeans(
+    x: np.ndarray,
+    w: np.ndarray | None = None,
+    k: int = 3,
+    *,
+    seed: int | None = 0,
+    max_iter: int = 100,
+    tol: float = 1e-4,
+    batch_size: int = BATCH_SIZE,
+) -> KMeansResult:
+    """
+    Cluster rows of `x` (n, d) with weights `w` into `k` clusters.
+
+    Lloyd iterations on the full table when n <= batch_size, else
+    mini-batch steps of `batch_size` weighted samples. Stops early once
+    the largest center shift is <= `tol` (mini-batch: or after PATIENCE
+    steps without a lower smoothed batch inertia). Empty clusters keep
+    their previous center.
+    """
+    x = np.asarray(x, dtype=float)
+    n = len(x)
+    w = np.ones(n) if w is None else np.asarray(w, dtype=float)
+    if n < k:
+        raise ValueError(f"Need at least k={k} rows to cluster, got {n}")
+
+    rng = np.random.default_rng(seed)
+    centers = kmeans_pp_init(x, w, k, rng)
+    mini_batch = n > batch_size
+    p = w / w.sum()
+    seen = np.zeros(k)
+    ewa_inertia, best_inertia, stale = None, np.inf, 0
+
+    converged = False
+    it = 0
+    for it in range(1, max_iter + 1):
+        if mini_batch:
+            # Samples are drawn by weight, so they count once each
+            xb = x[rng.choice(n, size=batch_size, p=p)]
+            d2 = sq_distances(xb, centers)
+            labels = np.argmin(d2, axis=1)
+            batch_inertia = float(d2[np.arange(batch_size), labels].mean())
+            sums, counts = _weighted_means(xb, np.ones(batch_size), labels, k)
+            seen += counts
+            hit = counts > 0
+            new = centers.copy()
+            new[hit] += (sums[hit] - counts[hit, None] * centers[hit]) / seen[hit, None]
+        else:
+            labels = np.argmin(sq_distances(x, centers), axis=1)
+            sums, wsum = _weighted_means(x, w, labels, k)
+            hit = wsum > 0
+            new = centers.copy()
+            new[hit] = sums[hit] / wsum[hit, None]
+
+        shift = float(np.sqrt(np.max(np.sum((new - centers) ** 2, axis=1))))
+        centers = new
+        if shift <= tol:
+            converged = True
+            break
+        if mini_batch:
+            ewa_inertia = (
+                batch_inertia
+                if ewa_inertia is None
+                else 0.9 * ewa_inertia + 0.1 * batch_inertia
+            )
+            if ewa_inertia < best_inertia:
+                best_inertia, stale = ewa_inertia, 0
+            else:
+                stale += 1
+                if stale >= PATIENCE:
+                    converged = True
+                    break
+
+    d2 = sq_distances(x, centers)
+    labels = np.argmin(d2, axis=1)
+    inertia = float(np.sum(w * d2[np.arange(n), labels]))
+    return KMeansResult(centers, labels, inertia, it, converged)
@@ -1,9 +1,13 @@
+import sys
 from pathlib import Path
 
 import click
 import numpy as np
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / "bin"))
+from color_distance import DELTA_E_METRICS, delta_e  # noqa: E402
+
 ROLE_MAP = {
     "rosewater": "accent_red",
     "flamingo": "accent_red",
@@ -22,11 +26,6 @@ ROLE_MAP = {
 }
 
 
-def deltaE76(lab1: np.ndarray, lab2: np.ndarray) -> float:
-    d = lab1 - lab2
-    return float(np.sqrt(np.dot(d, d)))
-
-
 @click.command()
 @click.option(
     "--colors-csv",
@@ -39,7 +38,15 @@ def deltaE76(lab1: np.ndarray, lab2: np.ndarray) -> float:
     show_default=True,
     type=click.Path(dir_okay=False, path_type=Path),
 )
-def compute_accent_text_sep(colors_csv: Path, out: Path):
+@click.option(
+    "--delta-e",
+    "delta_e_metric",
+    type=click.Choice(DELTA_E_METRICS),
+    default="de76",
+    show_default=True,
+    help="Color-difference metric for delta_E (match assign_elements.py --delta-e).",
+)
+def compute_accent_text_sep(colors_csv: Path, out: Path, delta_e_metric: str):
     df = pd.read_csv(colors_csv)
 
     if not {"palette", "element", "L", "a", "b"}.issubset(df.columns):
@@ -56,18 +63,20 @@ def compute_accent_text_sep(colors_csv: Path, out: Path):
         t_lab = np.array([float(t.L), float(t.a), float(t.b)], dtype=float)
 
         accents = sub[sub["element"].isin(ROLE_MAP.keys())].copy()
+        accents["delta_E"] = delta_e(
+            accents[["L", "a", "b"]].to_numpy(dtype=float), t_lab, delta_e_metric
+        )[:, 0]
         for _, r in accents.iterrows():
             role = ROLE_MAP.get(r["element"])
             if role is None:
                 continue
-            a_lab = np.array([float(r.L), float(r.a), float(r.b)], dtype=float)
             rows.append(
                 {
                     "palette": palette,
                     "role": role,
                     "element": r["element"],
                     "abs_delta_L": abs(float(r.L) - float(t.L)),
-                    "delta_E": deltaE76(a_lab, t_lab),
+                    "delta_E": float(r["delta_E"]),
                 }
             )
 
@@ -2,9 +2,9 @@ import re
 import sys
 from pathlib import Path
 
-import colour
 import numpy as np
 import pandas as pd
+from skimage.color import rgb2lab
 
 HEX_RE = re.compile(r'(\w+)\s*=\s*"(#(?:[0-9a-fA-F]{6}))"')
 
@@ -31,25 +31,21 @@ def load_catppuccin_palette(path: str | Path) -> dict[str, str]:
     return colors
 
 
+def hexes_to_lab(hexes) -> np.ndarray:
+    """
+    Convert hex colors (rrggbb) to an (n, 3) float64 CIELAB (L*, a*, b*) array
+    """
+    rgb = np.array(
+        [[int(h[i : i + 2], 16) for i in (0, 2, 4)] for h in hexes], dtype=float
+    ).reshape(-1, 3)
+    return rgb2lab(rgb[np.newaxis, :, :] / 255.0)[0]
+
+
 def hex_to_lab(hex_color: str) -> np.ndarray:
     """
     Convert hex color (rrggbb) to CIELAB (L*, a*, b*)
     """
-    rgb = (
-        np.array(
-            [
-                int(hex_color[0:2], 16),
-                int(hex_color[2:4], 16),
-                int(hex_color[4:6], 16),
-            ],
-            dtype=float,
-        )
-        / 255.0
-    )
-
-    xyz = colour.sRGB_to_XYZ(rgb)
-    lab = colour.XYZ_to_Lab(xyz)
-    return lab
+    return hexes_to_lab([hex_color])[0]
 
 
 def extract_palettes_to_lab(pal_dir: Path) -> pd.DataFrame:
@@ -67,18 +63,14 @@ def extract_palettes_to_lab(pal_dir: Path) -> pd.DataFrame:
         colors = load_catppuccin_palette(pal_file)
 
         for element, hex_color in colors.items():
-            L, a, b = hex_to_lab(hex_color)
-            rows.append(
-                {
-                    "palette": palette,
-                    "element": element,
-                    "L": L,
-                    "a": a,
-                    "b": b,
-                }
-            )
-
-    return pd.DataFrame(rows)
+            rows.append({"palette": palette, "element": element, "hex": hex_color})
+
+    df = pd.DataFrame(rows, columns=["palette", "element", "hex"])
+
+    # One conversion for every palette color
+    lab = hexes_to_lab(df["hex"])
+    df["L"], df["a"], df["b"] = lab[:, 0], lab[:, 1], lab[:, 2]
+    return df.drop(columns="hex")
 
 
 if __name__ == "__main__":
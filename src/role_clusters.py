@@ -1,4 +1,5 @@
 import sys
+from pathlib import Path
 
 import click
 import matplotlib.pyplot as plt
@@ -11,7 +12,12 @@ from rich.table import Table
 from rich.text import Text
 from scipy.cluster.hierarchy import dendrogram, fcluster, linkage
 from scipy.spatial.distance import pdist
-from skimage.color import rgb2lab
+
+# Shared color helpers live next to the pipeline CLIs in bin/
+sys.path.insert(0, str(Path(__file__).resolve().parent / "bin"))
+from color_management import colors_to_srgb, image_srgb_transform  # noqa: E402
+from lab_lut import lab_lookup  # noqa: E402
+from quantize import quantized_colors  # noqa: E402
 
 
 def rgb_to_hex(rgb):
@@ -73,12 +79,12 @@ def extract_theme(image_path, roles, max_pixels, quant, out_prefix):
 
     rgb = load_image_colors(image_path)
     q = quant  # try 4, 8, 16
-    rgb = (rgb // q) * q
-    rgb = rgb.astype(np.uint8)
 
     # filter to colors that comprise >X% of sampled pixels
     total_pixels = len(rgb)
-    uniques, counts = np.unique(rgb, axis=0, return_counts=True)
+    uniques, counts = quantized_colors(rgb, q)
+    with Image.open(image_path) as img:
+        uniques, counts = colors_to_srgb(uniques, counts, q, image_srgb_transform(img))
     freqs = counts / total_pixels
     mask = counts >= 10  # absolute pixel count
     if np.any(mask):
@@ -90,7 +96,7 @@ def extract_theme(image_path, roles, max_pixels, quant, out_prefix):
         click.echo("⚠️ No single color exceeds % cutoff.")
         sys.exit(1)
 
-    lab = rgb2lab(rgb_use[np.newaxis, :, :] / 255.0)[0]
+    lab = lab_lookup(rgb_use, q)[:, :3]
 
     dists = pdist(lab, metric="euclidean")
     Z = linkage(dists, method="average")
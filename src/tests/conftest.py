@@ -0,0 +1,19 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import lab_lut
+
+DATA = Path(__file__).parent / "data"
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _lut_cache(tmp_path_factory):
+    # Keep built Lab tables out of the user cache
+    lab_lut.LUT_DIR = tmp_path_factory.mktemp("lut")
+
+
+@pytest.fixture(scope="session")
+def constraints_all():
+    return json.loads((DATA / "palette_constraints.json").read_text())
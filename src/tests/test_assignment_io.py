@@ -0,0 +1,86 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from assignment_io import compact_rows, expand_rows, pool_records
+
+
+@pytest.fixture
+def pool():
+    rng = np.random.default_rng(0)
+    n = 40
+    df = pd.DataFrame(
+        {
+            "role": rng.choice(["background", "text", "accent_red"], n),
+            "L": rng.uniform(0, 100, n),
+            "a": rng.uniform(-50, 50, n),
+            "b": rng.uniform(-50, 50, n),
+            "hex": [f"#{v:06x}" for v in rng.integers(0, 1 << 24, n)],
+            "frequency": rng.random(n),
+            "score": rng.random(n),
+            "derived": rng.random(n) < 0.3,
+            "photo_hue": np.where(rng.random(n) < 0.5, np.nan, 120.0),
+        }
+    )
+    df["color_id"] = df.index
+    return df
+
+
+def _assigned(pool):
+    rows = pool.to_dict("records")
+    nudged = {**rows[3], "L": rows[3]["L"] + 4.0, "hex": "#123456", "nudged": True}
+    return {
+        "bg": rows[0],
+        "fg": rows[1],
+        "comment": {**rows[1], "Index": 1},  # itertuples artifact, dropped
+        "red": nudged,
+        "extra": {"L": 50.0, "a": 0.0, "b": 0.0, "hex": "#777777", "role": "ui"},
+        "nan_id": {"color_id": float("nan"), "L": 10.0, "hex": "#111111"},
+    }
+
+
+def _without_index(rows):
+    return {e: {k: v for k, v in r.items() if k != "Index"} for e, r in rows.items()}
+
+
+def _equal(a, b):
+    assert a.keys() == b.keys()
+    for elem in a:
+        assert a[elem].keys() == b[elem].keys(), elem
+        for k in a[elem]:
+            x, y = a[elem][k], b[elem][k]
+            assert (x == y) or (x != x and y != y), (elem, k, x, y)
+
+
+def test_expand_compact_is_identity(pool):
+    records = pool_records(pool)
+    assigned = _assigned(pool)
+    _equal(expand_rows(compact_rows(assigned, records), records), _without_index(assigned))
+
+
+def test_identity_through_json(pool):
+    records = pool_records(pool)
+    assigned = _assigned(pool)
+    text = json.dumps({"schema": "compact", "assigned": compact_rows(assigned, records)})
+    loaded = json.loads(text)["assigned"]
+    _equal(expand_rows(loaded, records), _without_index(assigned))
+
+
+def test_compact_stores_only_changes(pool):
+    records = pool_records(pool)
+    compact = compact_rows(_assigned(pool), records)
+    assert compact["bg"] == {"color_id": 0}
+    assert compact["comment"] == {"color_id": 1}
+    assert set(compact["red"]) == {"color_id", "L", "hex", "nudged"}
+    assert "color_id" not in compact["extra"] and compact["extra"]["hex"] == "#777777"
+
+
+def test_unknown_color_id(pool):
+    with pytest.raises(ValueError):
+        expand_rows({"bg": {"color_id": 999}}, pool_records(pool))
+
+
+def test_pool_without_ids():
+    assert pool_records(pd.DataFrame({"L": [1.0]})) == {}
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from skimage.color import deltaE_cie76, deltaE_ciede2000, deltaE_ciede94
+
+from color_distance import DELTA_E_METRICS, delta_e
+
+
+@pytest.fixture
+def labs():
+    rng = np.random.default_rng(0)
+    lab = np.column_stack(
+        [rng.uniform(0, 100, 60), rng.uniform(-80, 80, 60), rng.uniform(-80, 80, 60)]
+    )
+    return lab[:20], lab[20:]
+
+
+@pytest.mark.parametrize(
+    "metric, ref",
+    [("de76", deltaE_cie76), ("cie94", deltaE_ciede94), ("ciede2000", deltaE_ciede2000)],
+)
+def test_matches_skimage_pairwise(labs, metric, ref):
+    anchors, cands = labs
+    got = delta_e(anchors, cands, metric)
+    assert got.shape == (20, 40)
+    want = ref(np.repeat(anchors, 40, axis=0), np.tile(cands, (20, 1))).reshape(20, 40)
+    assert np.allclose(got, want, atol=1e-8)
+
+
+def test_single_anchor_row(labs):
+    anchors, cands = labs
+    for metric in DELTA_E_METRICS:
+        got = delta_e(anchors[0], cands, metric)
+        assert got.shape == (1, 40)
+        assert np.array_equal(got[0], delta_e(anchors[:1], cands, metric)[0])
+
+
+def test_cie94_reference_is_lab1():
+    grey = np.array([50.0, 0.0, 0.0])
+    vivid = np.array([50.0, 60.0, 0.0])
+    # Weights come from the reference's chroma
+    assert delta_e(grey, vivid, "cie94")[0, 0] == pytest.approx(60.0)
+    assert delta_e(vivid, grey, "cie94")[0, 0] == pytest.approx(60.0 / (1 + 0.045 * 60.0))
+
+
+def test_unknown_metric():
+    with pytest.raises(ValueError):
+        delta_e(np.zeros(3), np.zeros(3), "nope")
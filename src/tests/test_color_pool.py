@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from color_pool import ColorPool, ColorSet
+from compiled_constraints import ROLES
+
+
+def _frame(n=200, seed=0):
+    """Pool table with coarse (tied) values and NaN in the sort keys."""
+    rng = np.random.default_rng(seed)
+    rgb = rng.choice(1 << 24, size=n, replace=False).astype(np.uint32)
+    frame = pd.DataFrame(
+        {
+            "hex": [f"#{int(v):06x}" for v in rgb],
+            "rgb": rgb,
+            "L": rng.integers(0, 5, n) * 20.0,
+            "a": rng.normal(0, 20, n),
+            "b": rng.normal(0, 20, n),
+            "chroma": rng.integers(0, 4, n) * 10.0,
+            "hue": rng.uniform(0, 360, n),
+            "frequency": rng.integers(0, 3, n).astype(float),
+            "score": rng.integers(0, 6, n) / 5.0,
+            "role": rng.choice(list(ROLES), n),
+        }
+    )
+    for col in ("chroma", "frequency", "score"):
+        frame.loc[rng.random(n) < 0.15, col] = np.nan
+    return frame
+
+
+def _hexes(view):
+    return [view.row(i)["hex"] for i in range(len(view))]
+
+
+@pytest.mark.parametrize(
+    "keys",
+    [
+        [("score", False)],
+        [("score", True)],
+        [("frequency", False), ("score", False)],
+        [("L", True), ("chroma", False), ("score", True)],
+    ],
+)
+def test_where_order_by_head_match_dataframe(keys):
+    frame = _frame()
+    mask = frame["L"].to_numpy() >= 20.0
+    cols = [c for c, _ in keys]
+    asc = [a for _, a in keys]
+    want = frame[mask].sort_values(cols, ascending=asc, kind="stable", na_position="last")
+
+    got = ColorPool(frame).view().where(mask).order_by(*keys)
+    assert _hexes(got) == want["hex"].tolist()
+    assert _hexes(got.head(7)) == want["hex"].head(7).tolist()
+    for c in cols:
+        assert np.array_equal(got[c], want[c].to_numpy(), equal_nan=True)
+
+
+def test_order_by_nan_last_and_ties_stable():
+    frame = pd.DataFrame(
+        {
+            "hex": ["#000001", "#000002", "#000003", "#000004", "#000005"],
+            "L": [50.0] * 5,
+            "a": [0.0] * 5,
+            "b": [0.0] * 5,
+            "score": [np.nan, 1.0, np.nan, 2.0, 1.0],
+            "role": ["bg"] * 5,
+        }
+    )
+    view = ColorPool(frame).view()
+    assert _hexes(view.order_by(("score", False))) == [
+        "#000004", "#000002", "#000005", "#000001", "#000003"
+    ]
+    assert _hexes(view.order_by(("score", True))) == [
+        "#000002", "#000005", "#000004", "#000001", "#000003"
+    ]
+
+
+def test_order_by_derived_column():
+    frame = _frame(50)
+    dist = np.random.default_rng(1).integers(0, 4, 50).astype(float)
+    got = ColorPool(frame).view().with_column("dist", dist).order_by(("dist", True))
+    want = frame.assign(dist=dist).sort_values("dist", kind="stable")
+    assert _hexes(got) == want["hex"].tolist()
+    assert got.row(0)["dist"] == want["dist"].iloc[0]
+
+
+def test_without_matches_isin():
+    frame = _frame()
+    used = frame["rgb"].to_numpy()[::3]
+    got = ColorPool(frame).view().without(ColorSet(used))
+    want = frame[~frame["rgb"].isin(used)]
+    assert _hexes(got) == want["hex"].tolist()
+    pool = ColorPool(frame).view()
+    assert pool.without(ColorSet()) is pool
+
+
+def test_role_view():
+    frame = _frame()
+    role = frame["role"].iloc[0]
+    got = ColorPool(frame).role_view(role)
+    assert _hexes(got) == frame.loc[frame["role"] == role, "hex"].tolist()
+    assert ColorPool(frame).role_view("no-such-role").empty
+
+
+def test_pool_keys_from_hex_and_rgb_columns():
+    frame = _frame(20)
+    from_rgb = ColorPool(frame).rgb
+    from_hex = ColorPool(frame.drop(columns="rgb")).rgb
+    assert from_rgb.dtype == np.uint32
+    assert np.array_equal(from_rgb, from_hex)
+
+
+def test_missing_core_column_ranks_equal():
+    frame = _frame(20).drop(columns="frequency")
+    view = ColorPool(frame).view()
+    assert np.array_equal(view["frequency"], np.zeros(20))
+    assert _hexes(view.order_by(("frequency", False))) == frame["hex"].tolist()
+
+
+def test_row_native_values():
+    frame = _frame(10)
+    row = ColorPool(frame).view().order_by(("hue", True)).row(0)
+    want = frame.sort_values("hue").iloc[0]
+    assert list(row) == list(frame.columns)
+    assert row["hex"] == want["hex"]
+    assert type(row["L"]) is float and type(row["rgb"]) is int
+    assert row["role"] == want["role"]
+
+
+def test_colorset():
+    s = ColorSet([0x000000, 0xFFFFFF, 0x123456, 0x123456])
+    assert len(s) == 3
+    assert 0xFFFFFF in s and 0x123456 in s and 0x123457 not in s
+    s.add(0x123457)
+    s.add(0x123457)
+    assert len(s) == 4 and 0x123457 in s
+    keys = np.array([0, 1, 0x123456, 0x123455, 0xFFFFFF], dtype=np.uint32)
+    assert s.contains(keys).tolist() == [True, False, True, False, True]
+    assert s.contains(keys).tolist() == [int(k) in s for k in keys]
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from color_sketch import ColorSketch
+from quantize import quantized_colors
+
+OPTS = dict(quant=8, max_pixels=None, color_manage=False)
+
+
+@pytest.fixture
+def images(tmp_path):
+    rng = np.random.default_rng(0)
+    top = (rng.random((60, 80, 3)) * 120).astype(np.uint8)
+    bottom = (rng.random((40, 80, 3)) * 255).astype(np.uint8)
+    paths = []
+    for name, px in [("top", top), ("bottom", bottom), ("both", np.vstack([top, bottom]))]:
+        paths.append(tmp_path / f"{name}.png")
+        Image.fromarray(px).save(paths[-1])
+    return paths, np.vstack([top, bottom]).reshape(-1, 3)
+
+
+def test_merge_equals_sketch_of_concatenated_pixels(images):
+    (top, bottom, both), pixels = images
+    merged = ColorSketch.merge_all(
+        [ColorSketch.from_image(top, **OPTS), ColorSketch.from_image(bottom, **OPTS)]
+    )
+    uniq, counts = merged.colors(8)
+    ref_uniq, ref_counts = quantized_colors(pixels, 8)
+    assert np.array_equal(uniq, ref_uniq) and np.array_equal(counts, ref_counts)
+    assert np.array_equal(
+        merged.colors(8)[1], ColorSketch.from_image(both, **OPTS).colors(8)[1]
+    )
+    assert merged.sources == [str(top), str(bottom)]
+
+
+def test_merge_adds_flat_counts(images):
+    (top, bottom, _), _ = images
+    a, b = ColorSketch.from_image(top, **OPTS), ColorSketch.from_image(bottom, **OPTS)
+    merged = a.merge(b)
+    assert merged.flat_counts.sum() == a.flat_counts.sum() + b.flat_counts.sum()
+    assert np.all(np.diff(merged.flat_keys) > 0)
+
+
+def test_save_load_roundtrip(images, tmp_path):
+    (top, bottom, _), _ = images
+    sketch = ColorSketch.from_image(top, **OPTS).merge(ColorSketch.from_image(bottom, **OPTS))
+    path = tmp_path / "merged.sketch"  # any suffix
+    sketch.save(path)
+    loaded = ColorSketch.load(path)
+    assert loaded.quant == sketch.quant and loaded.sources == sketch.sources
+    for attr in ("keys", "counts", "flat_keys", "flat_counts"):
+        got, want = getattr(loaded, attr), getattr(sketch, attr)
+        assert got.dtype == np.int64 and np.array_equal(got, want), attr
+
+
+def test_quant_mismatch_is_rejected(images):
+    (top, _, _), _ = images
+    q8 = ColorSketch.from_image(top, **OPTS)
+    q4 = ColorSketch.from_image(top, **{**OPTS, "quant": 4})
+    with pytest.raises(ValueError, match="different quant"):
+        ColorSketch.merge_all([q8, q4])
+    with pytest.raises(ValueError):
+        q8.colors(4)
+    with pytest.raises(ValueError):
+        ColorSketch.merge_all([])
@@ -0,0 +1,29 @@
+import numpy as np
+from PIL import Image
+
+from image_cache import CachedImage
+from image_sampling import ImageContext
+
+
+def test_cache_hit_returns_the_computed_colors(tmp_path):
+    rng = np.random.default_rng(0)
+    path = tmp_path / "a.png"
+    Image.fromarray((rng.random((64, 48, 3)) * 255).astype(np.uint8)).save(path)
+    cache = tmp_path / "cache"
+    opts = dict(max_pixels=None, color_manage=False)
+
+    with CachedImage(path, cache, **opts) as first:
+        colors = first.colors(8)
+        thumb = first.thumbnail_colors(16, 8)
+        assert first.misses == 2 and first.hits == 0
+    assert [p.name for p in cache.iterdir()] == [first.file.name]
+    assert oct(first.file.stat().st_mode & 0o777) == "0o644"
+
+    with CachedImage(path, cache, **opts) as second:
+        assert np.array_equal(second.colors(8)[0], colors[0])
+        assert np.array_equal(second.thumbnail_colors(16, 8)[1], thumb[1])
+        assert second.misses == 0 and second._ctx is None
+
+    with ImageContext(path, **opts) as ctx:
+        ref = ctx.colors(8)
+    assert np.array_equal(colors[0], ref[0]) and np.array_equal(colors[1], ref[1])
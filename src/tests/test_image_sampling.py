@@ -0,0 +1,157 @@
+import math
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from image_sampling import (
+    SAMPLERS,
+    ImageContext,
+    grid_steps,
+    iter_rgb_bands,
+    raw_strips,
+    sample_pixels,
+    stratified_coords,
+)
+
+
+@pytest.fixture
+def rgb():
+    rng = np.random.default_rng(0)
+    return (rng.random((301, 203, 3)) * 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize(
+    "name, mode, save",
+    [
+        ("a.ppm", "RGB", {}),
+        ("a.bmp", "RGB", {}),  # bottom-up BGR rows with padded stride
+        ("a.tif", "RGB", {}),
+        ("strips.tif", "RGB", {"tiffinfo": {278: 17}}),  # 17 rows per strip
+        ("gray.tif", "L", {}),
+        ("alpha.tif", "RGBA", {}),
+    ],
+)
+def test_raw_strips_match_full_decode(tmp_path, rgb, name, mode, save):
+    path = tmp_path / name
+    Image.fromarray(rgb).convert(mode).save(path, **save)
+    with Image.open(path) as img:
+        assert raw_strips(img) is not None
+        got = np.concatenate([band for _, band in iter_rgb_bands(img, rows=64)])
+        # Read from the file only; PIL never decoded the frame
+        assert img.tile
+    with Image.open(path) as img:
+        assert np.array_equal(got, np.asarray(img.convert("RGB")))
+
+
+def test_compressed_falls_back_to_pil(tmp_path, rgb):
+    path = tmp_path / "a.png"
+    Image.fromarray(rgb).save(path)
+    with Image.open(path) as img:
+        assert raw_strips(img) is None
+        got = np.concatenate([band for _, band in iter_rgb_bands(img, rows=64)])
+    assert np.array_equal(got, rgb)
+
+
+@pytest.mark.parametrize("name", ["a.bmp", "a.png"])
+@pytest.mark.parametrize("level", [0, 1, 2])
+def test_pyramid_per_band_matches_whole_frame(tmp_path, rgb, name, level):
+    path = tmp_path / name
+    Image.fromarray(rgb).convert("L").save(path)
+    with Image.open(path) as img:
+        full = img.convert("RGB")
+        ref = np.asarray(full.reduce(2**level) if level else full)
+    with ImageContext(path, max_pixels=None, rows=50) as ctx:
+        assert np.array_equal(ctx.pyramid(level), ref)
+
+
+def test_thumbnail_keeps_real_pixel_colors(tmp_path, rgb):
+    # Flat 8x8 blocks with single-pixel specks: a DCT draft decode would
+    # average the specks into new colors
+    base = np.kron(rgb[:40, :40], np.ones((8, 8, 1), dtype=np.uint8))
+    base[::5, ::7] = [255, 0, 255]
+    path = tmp_path / "a.jpg"
+    Image.fromarray(base).save(path, quality=95)
+    with Image.open(path) as img:
+        full = np.asarray(img.convert("RGB")).reshape(-1, 3)
+    with ImageContext(path, max_pixels=None, rows=37, color_manage=False) as ctx:
+        uniq, counts = ctx.thumbnail_colors(40, 1)
+    assert counts.sum() == 40 * 40
+    real = {tuple(c) for c in full}
+    assert all(tuple(c) in real for c in uniq)
+
+
+def test_thumbnail_matches_resize_nearest(tmp_path, rgb):
+    path = tmp_path / "a.png"
+    Image.fromarray(rgb).save(path)
+    with Image.open(path) as img:
+        ref = np.asarray(img.resize((67, 100), Image.Resampling.NEAREST))
+    with ImageContext(path, max_pixels=None, rows=64, color_manage=False) as ctx:
+        uniq, counts = ctx.thumbnail_colors(100, 1)
+    ref_uniq, ref_counts = np.unique(ref.reshape(-1, 3), axis=0, return_counts=True)
+    assert np.array_equal(uniq, ref_uniq) and np.array_equal(counts, ref_counts)
+
+
+def test_in_memory_image_bands(rgb):
+    img = Image.fromarray(rgb)
+    assert raw_strips(img) is None
+    got = np.concatenate([band for _, band in iter_rgb_bands(img, rows=64)])
+    assert np.array_equal(got, rgb)
+
+
+# ------------------------------------------------------------
+# Samplers
+# ------------------------------------------------------------
+
+
+@pytest.fixture
+def photo(rgb):
+    return Image.fromarray(rgb)
+
+
+@pytest.mark.parametrize("sampler", ["random", "stratified"])
+def test_seeded_samplers_are_deterministic(photo, sampler):
+    a = sample_pixels(photo, 2000, sampler=sampler, seed=7, rows=50)
+    b = sample_pixels(photo, 2000, sampler=sampler, seed=7, rows=50)
+    c = sample_pixels(photo, 2000, sampler=sampler, seed=8, rows=50)
+    assert np.array_equal(a, b)
+    assert not np.array_equal(a, c)
+
+
+def test_random_sample_is_independent_of_strip_height(photo):
+    a = sample_pixels(photo, 2000, sampler="random", seed=3, rows=17)
+    b = sample_pixels(photo, 2000, sampler="random", seed=3, rows=301)
+    # Same pixels; reservoir order depends on the block boundaries
+    assert np.array_equal(np.unique(a, axis=0), np.unique(b, axis=0))
+
+
+@pytest.mark.parametrize("size", [(203, 301), (3, 500), (500, 3), (40, 5000)])
+@pytest.mark.parametrize("max_pixels", [10, 1000, 5000])
+def test_stratified_points_stay_in_their_cells(size, max_pixels):
+    w, h = size
+    sy, sx = grid_steps(w, h, max_pixels)
+    ys, xs = stratified_coords(w, h, (sy, sx), seed=0)
+    cells = set(zip(ys // sy, xs // sx))
+    # One point per cell, every cell covered, all inside the image
+    assert len(cells) == len(ys) == math.ceil(h / sy) * math.ceil(w / sx)
+    assert ys.min() >= 0 and ys.max() < h and xs.min() >= 0 and xs.max() < w
+    assert np.all(np.diff(ys) >= 0)
+
+
+@pytest.mark.parametrize("size", [(203, 301), (1000, 667), (3, 500), (500, 3), (40, 5000)])
+@pytest.mark.parametrize("max_pixels", [10, 100, 1000, 20000])
+def test_sample_size_near_budget(size, max_pixels):
+    img = Image.new("RGB", size)
+    if size[0] * size[1] <= max_pixels:
+        pytest.skip("image within budget")
+    n = {s: len(sample_pixels(img, max_pixels, sampler=s, seed=0)) for s in SAMPLERS}
+    assert n["random"] == max_pixels
+    for s in ("strided", "stratified"):
+        assert 0.4 * max_pixels <= n[s] <= max_pixels
+    assert 0.5 * max_pixels <= n["box"] < 2.25 * max_pixels
+
+
+def test_thin_image_stays_within_budget():
+    img = Image.new("RGB", (3, 500))
+    for sampler in SAMPLERS:
+        assert len(sample_pixels(img, 10, sampler=sampler, seed=0)) == 10
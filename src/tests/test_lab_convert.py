@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+from skimage.color import lab2rgb, rgb2lab
+
+from lab_convert import (
+    hex_to_rgb24,
+    lab_to_hex_batch,
+    lab_to_lch_batch,
+    lab_to_rgb24_batch,
+    lab_to_rgb_batch,
+    lch_to_lab_batch,
+)
+
+
+@pytest.fixture
+def rgb():
+    rng = np.random.default_rng(0)
+    rgb = rng.integers(0, 256, size=(4000, 3)).astype(np.uint8)
+    rgb[:2] = [[0, 0, 0], [255, 255, 255]]
+    return rgb
+
+
+def _lab(rgb):
+    return rgb2lab(rgb[np.newaxis] / 255.0)[0]
+
+
+@pytest.mark.parametrize("gamut", ["clip", "chroma"])
+def test_roundtrip_in_gamut_colors(rgb, gamut):
+    out, in_gamut = lab_to_rgb_batch(_lab(rgb), gamut=gamut)
+    assert in_gamut.all()
+    assert np.array_equal(out, rgb)
+
+
+def test_clip_matches_scalar_lab2rgb():
+    rng = np.random.default_rng(1)
+    lab = np.column_stack(
+        [rng.uniform(0, 100, 500), rng.uniform(-120, 120, 500), rng.uniform(-120, 120, 500)]
+    )
+    out, _ = lab_to_rgb_batch(lab)
+    with np.errstate(all="ignore"), pytest.warns(UserWarning):
+        ref = lab2rgb(lab[np.newaxis])[0]
+    ref = (np.clip(ref, 0, 1) * 255.0 + 0.5).astype(np.uint8)
+    assert np.array_equal(out, ref)
+
+
+def test_gamut_flags():
+    lab = np.array(
+        [
+            [50.0, 0.0, 0.0],  # grey
+            [50.0, 120.0, 0.0],  # too saturated for sRGB
+            [95.0, -80.0, 90.0],  # too light for that green
+            [0.0, 0.0, 120.0],  # imaginary (negative Z)
+        ]
+    )
+    _, in_gamut = lab_to_rgb_batch(lab)
+    assert in_gamut.tolist() == [True, False, False, False]
+
+
+def test_chroma_mapping_keeps_lightness_and_hue():
+    lab = np.array([[60.0, 90.0, -90.0], [85.0, -100.0, 40.0]])
+    out, in_gamut = lab_to_rgb_batch(lab, gamut="chroma")
+    assert not in_gamut.any()
+    mapped = _lab(out)
+    L, C, h = lab_to_lch_batch(lab)
+    mL, mC, mh = lab_to_lch_batch(mapped)
+    assert np.allclose(mL, L, atol=1.0)
+    assert np.all(mC < C)
+    assert np.all(np.abs((mh - h + 180) % 360 - 180) < 3.0)
+
+
+def test_unknown_gamut_mode():
+    with pytest.raises(ValueError):
+        lab_to_rgb_batch(np.zeros((1, 3)), gamut="nope")
+
+
+def test_empty():
+    out, in_gamut = lab_to_rgb_batch(np.empty((0, 3)))
+    assert out.shape == (0, 3) and in_gamut.shape == (0,)
+
+
+def test_lch_roundtrip():
+    lab = np.array([[50.0, 20.0, -30.0], [70.0, 0.0, 0.0]])
+    assert np.allclose(lch_to_lab_batch(*lab_to_lch_batch(lab)), lab)
+
+
+def test_packed_and_hex_outputs(rgb):
+    keys, _ = lab_to_rgb24_batch(_lab(rgb[:3]))
+    hexes, _ = lab_to_hex_batch(_lab(rgb[:3]))
+    assert keys[:2].tolist() == [0x000000, 0xFFFFFF]
+    assert hexes == [f"#{r:02x}{g:02x}{b:02x}" for r, g, b in rgb[:3]]
+
+
+def test_hex_to_rgb24_accepts_both_spellings():
+    keys = hex_to_rgb24(["#1E1E2E", "cdd6f4", " #f38ba8 ", "000000"])
+    assert keys.dtype == np.uint32
+    assert keys.tolist() == [0x1E1E2E, 0xCDD6F4, 0xF38BA8, 0]
+    assert hex_to_rgb24([]).shape == (0,)
+
+
+@pytest.mark.parametrize("bad", ["#fff", "1234567", "#", "", "#12345g", "0x1234", "+12345"])
+def test_hex_to_rgb24_rejects_malformed(bad):
+    with pytest.raises(ValueError):
+        hex_to_rgb24([bad])
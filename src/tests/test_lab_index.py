@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from color_pool import ColorPool, ColorSet
+from compiled_constraints import ROLE_INDEX
+from lab_index import LabIndex
+
+ROLES = ["background", "text", "accent_red", "accent_cool"]
+
+
+@pytest.fixture(scope="module")
+def pool():
+    rng = np.random.default_rng(0)
+    n = 600
+    L = rng.uniform(0, 100, n)
+    a = rng.uniform(-60, 60, n)
+    b = rng.uniform(-60, 60, n)
+    L[:5] = np.nan  # unusable rows are never returned
+    df = pd.DataFrame(
+        {
+            "role": rng.choice(ROLES, n),
+            "L": L,
+            "a": a,
+            "b": b,
+            "chroma": np.hypot(a, b),
+            "hue": np.degrees(np.arctan2(b, a)) % 360.0,
+            "rgb": rng.choice(1 << 24, n, replace=False).astype(np.uint32),
+        }
+    )
+    return ColorPool(df)
+
+
+def _brute(pool, target, l_weight, *, role=None, exclude=None, accept=None):
+    view = pool.view()
+    lab = view.lab()
+    d = np.linalg.norm((lab - target) * [l_weight, 1.0, 1.0], axis=1)
+    ok = np.isfinite(d)
+    if role is not None:
+        ok &= pool.role == ROLE_INDEX[role]
+    if exclude is not None:
+        ok &= ~exclude.contains(pool.rgb)
+    if accept is not None:
+        ok &= accept(view)
+    idx = np.flatnonzero(ok)
+    return idx[np.argsort(d[idx], kind="stable")], d
+
+
+@pytest.mark.parametrize("l_weight", [1.0, 2.0])
+@pytest.mark.parametrize("role", [None, "text", "accent_cool"])
+def test_nearest_matches_brute_force(pool, l_weight, role):
+    index = LabIndex(pool, l_weight=l_weight)
+    rng = np.random.default_rng(1)
+    exclude = ColorSet(pool.rgb[rng.choice(len(pool), 200, replace=False)])
+    for target in rng.uniform([0, -60, -60], [100, 60, 60], size=(20, 3)):
+        got = index.nearest(target, 7, role=role, exclude=exclude)
+        ref, d = _brute(pool, target, l_weight, role=role, exclude=exclude)
+        assert got.idx.tolist() == ref[:7].tolist()
+        assert np.allclose(got["dist"], d[ref[:7]])
+
+
+@pytest.mark.parametrize("role", [None, "background"])
+def test_first_matches_brute_force(pool, role):
+    index = LabIndex(pool, l_weight=2.0)
+    exclude = ColorSet(pool.rgb[::3])
+
+    def accept(view):
+        # Rare predicate: forces the query to widen
+        return (view["chroma"] > 70.0) & (view["L"] > 60.0)
+
+    rng = np.random.default_rng(2)
+    for target in rng.uniform([0, -60, -60], [100, 60, 60], size=(15, 3)):
+        hit = index.first(target, accept, role=role, exclude=exclude, k=4)
+        ref, d = _brute(pool, target, 2.0, role=role, exclude=exclude, accept=accept)
+        assert not hit.empty and len(ref)
+        assert hit.idx[0] == ref[0]
+        assert np.isclose(hit["dist"][0], d[ref[0]])
+        assert np.all(np.diff(hit["dist"]) >= 0)
+
+
+def test_first_exhausts_to_empty(pool):
+    index = LabIndex(pool)
+    hit = index.first([50.0, 0.0, 0.0], lambda v: v["L"] > 1000.0, role="text", k=2)
+    assert hit.empty
+
+
+def test_unknown_role_and_rank(pool):
+    index = LabIndex(pool)
+    assert index.nearest([50.0, 0.0, 0.0], 3, role="nope").empty
+    view = pool.role_view("text")
+    view = view.where(np.isfinite(view.L)).head(10)
+    ranked = index.rank(view, [50.0, 0.0, 0.0])
+    assert sorted(ranked.idx.tolist()) == sorted(view.idx.tolist())
+    assert np.all(np.diff(ranked["dist"]) >= 0)
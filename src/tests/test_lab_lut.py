@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from skimage.color import rgb2lab
+
+import lab_lut
+from lab_lut import LUT_MIN_QUANT, lab_lookup, load_lab_lut, srgb_to_lch
+from quantize import pack_rgb
+
+
+def _direct(rgb):
+    return rgb2lab(np.asarray(rgb, dtype=float)[np.newaxis] / 255.0)[0]
+
+
+@pytest.fixture
+def lut_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(lab_lut, "LUT_DIR", tmp_path)
+    monkeypatch.setattr(lab_lut, "_LOADED", {})
+    return tmp_path
+
+
+@pytest.mark.parametrize("quant", [4, 8, 16])
+def test_lut_matches_rgb2lab(lut_dir, quant):
+    rng = np.random.default_rng(quant)
+    rgb = (rng.integers(0, 256, size=(2000, 3)) // quant * quant).astype(np.uint8)
+    rgb[0], rgb[1] = 0, (255 // quant) * quant
+    got = lab_lookup(rgb, quant)
+    ref = _direct(rgb)
+    # float32 storage
+    assert np.allclose(got[:, :3], ref, atol=1e-3)
+    assert np.allclose(got[:, 3], np.hypot(ref[:, 1], ref[:, 2]), atol=1e-3)
+    assert (lut_dir / f"srgb_lab_q{quant}.npy").exists()
+
+
+def test_lut_is_memory_mapped_after_build(lut_dir):
+    load_lab_lut(16)
+    lab_lut._LOADED.clear()
+    lut = load_lab_lut(16)
+    assert isinstance(lut, np.memmap)
+    assert lut.shape == (16**3, 5)
+
+
+def test_fine_grids_skip_the_lut(lut_dir):
+    rgb = np.array([[0, 0, 0], [255, 255, 255], [18, 52, 86]], dtype=np.uint8)
+    got = lab_lookup(rgb, 1)
+    assert got.dtype == np.float64
+    assert np.allclose(got[:, :3], _direct(rgb), atol=1e-12)
+    assert not any(lut_dir.iterdir())
+    assert LUT_MIN_QUANT > 1
+
+
+def test_srgb_to_lch_hue_and_empty():
+    lch = srgb_to_lch([[255, 0, 0], [128, 128, 128]])
+    assert 0 < lch[0, 4] < 90 and lch[0, 3] > 100
+    assert lch[1, 3] < 0.01
+    assert srgb_to_lch(np.empty((0, 3))).shape == (0, 5)
+
+
+def test_pack_keys_index_lut_rows(lut_dir):
+    lut = load_lab_lut(8)
+    rgb = np.array([[8, 16, 248]], dtype=np.uint8)
+    assert np.allclose(lut[pack_rgb(rgb, 8)][0, :3], _direct(rgb)[0], atol=1e-3)
+
+
+def test_parse_cap_converts_in_float64():
+    from parse_cap import hex_to_lab, hexes_to_lab
+
+    hexes = ["1e1e2e", "cdd6f4", "f38ba8"]
+    got = hexes_to_lab(hexes)
+    ref = _direct([[int(h[i : i + 2], 16) for i in (0, 2, 4)] for h in hexes])
+    assert got.dtype == np.float64
+    assert np.array_equal(got, ref)
+    assert np.array_equal(hex_to_lab("ffffff"), _direct([[255, 255, 255]])[0])
@@ -0,0 +1,73 @@
+import click
+import numpy as np
+import pytest
+
+from compiled_constraints import CompiledConstraints
+from extract_colors import (
+    CoverageGrid,
+    color_table,
+    fit_score_bound,
+    hue_band_peaks,
+    palette_fit_score,
+    resolve_palette_option,
+)
+from quantize import quantized_colors
+
+
+def _table(seed, lo=0, hi=256, n=20000):
+    rng = np.random.default_rng(seed)
+    rgb = rng.integers(lo, hi, size=(n, 3)).astype(np.uint8)
+    return color_table(*quantized_colors(rgb, 8), quant=8)
+
+
+TABLES = {
+    "full": lambda: _table(0),
+    "dark": lambda: _table(1, 0, 90),
+    "light": lambda: _table(2, 170, 256),
+    "mid": lambda: _table(3, 90, 150, n=3000),
+    "sparse": lambda: _table(4, n=40),
+}
+
+
+@pytest.mark.parametrize("name", TABLES)
+@pytest.mark.parametrize("top_k", [1, 2, 3])
+def test_pruned_matches_exhaustive(constraints_all, name, top_k):
+    df = TABLES[name]()
+    exhaustive = palette_fit_score(df, constraints_all, top_k=None)
+    pruned = palette_fit_score(df, constraints_all, top_k=top_k)
+    ranked = sorted(exhaustive.values(), reverse=True)
+    # Every palette that can place in the top_k is scored, exactly
+    assert all(pruned[p] == exhaustive[p] for p in pruned)
+    assert sorted(pruned.values(), reverse=True)[:top_k] == ranked[:top_k]
+    assert max(pruned, key=pruned.get) == max(exhaustive, key=exhaustive.get)
+    assert list(pruned) == [p for p in exhaustive if p in pruned]
+
+
+@pytest.mark.parametrize("name", TABLES)
+def test_bound_is_an_upper_bound(constraints_all, name):
+    df = TABLES[name]()
+    exhaustive = palette_fit_score(df, constraints_all, top_k=None)
+    grid = CoverageGrid(df)
+    mid_hue, mid_conf = hue_band_peaks(df)["midtone"]
+    for p, score in exhaustive.items():
+        c = CompiledConstraints.from_json(constraints_all, p)
+        assert fit_score_bound(c, grid, mid_hue, mid_conf) >= score - 1e-9
+
+
+def test_L_extent_empty_ranges():
+    df = _table(5, 0, 90)
+    grid = CoverageGrid(df)
+    L = np.sort(df["L"].to_numpy())
+    assert grid.L_extent(L[-1] + 1.0, 100.0) is None
+    assert grid.L_extent(-5.0, L[0] - 1.0) is None
+    assert grid.L_extent(60.0, 40.0) is None
+    gap = np.argmax(np.diff(L))
+    assert grid.L_extent(L[gap] + 1e-9, L[gap + 1] - 1e-9) is None
+    assert grid.L_extent(0.0, 100.0) == (L[0], L[-1])
+
+
+def test_palette_option(constraints_all):
+    assert resolve_palette_option("auto", constraints_all) == "auto"
+    assert resolve_palette_option("Mocha", constraints_all) == "mocha"
+    with pytest.raises(click.BadParameter):
+        resolve_palette_option("dracula", constraints_all)
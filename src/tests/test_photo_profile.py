@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from photo_profile import GRID, PhotoProfile
+
+QS = np.array([0.0, 0.01, 0.1, 0.25, 0.4, 0.5, 0.6, 0.75, 0.9, 0.99, 1.0])
+
+
+def _table(seed, n=300, max_count=50):
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(1, max_count, size=n)
+    counts[rng.random(n) < 0.3] = 1
+    df = pd.DataFrame(
+        {
+            "L": np.round(rng.uniform(0, 100, n), 1),  # ties across colors
+            "chroma": rng.gamma(2.0, 10.0, n),
+            "count": counts,
+        }
+    )
+    df["frequency"] = counts / counts.sum()
+    return df
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("col", ["L", "chroma"])
+def test_weighted_matches_repeated_table(seed, col):
+    df = _table(seed)
+    profile = PhotoProfile.from_table(df, weighted=True)
+    ref = np.quantile(np.repeat(df[col].to_numpy(), df["count"]), QS)
+    assert np.allclose(profile.quantile(col, QS), ref, rtol=0, atol=1e-9)
+    assert profile.median(col) == pytest.approx(np.median(np.repeat(df[col], df["count"])))
+
+
+def test_weighted_is_not_the_minimum():
+    # One rare dark color, many bright pixels
+    df = pd.DataFrame({"L": [5.0, 80.0], "chroma": [1.0, 2.0], "count": [1, 999]})
+    df["frequency"] = df["count"] / 1000
+    profile = PhotoProfile.from_table(df, weighted=True)
+    assert profile.quantile("L", 0.5) == 80.0
+    assert profile.quantile("L", 0.0) == 5.0
+
+
+def test_frequency_only_uses_normalized_cdf():
+    df = _table(7, max_count=2000)
+    profile = PhotoProfile.from_table(df.drop(columns="count"), weighted=True)
+    repeated = np.repeat(df["L"].to_numpy(), df["count"])
+    ref = np.quantile(repeated, QS, method="inverted_cdf")
+    assert np.array_equal(profile.quantile("L", QS), ref)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_unweighted_matches_pandas(seed):
+    df = _table(seed)
+    profile = PhotoProfile.from_table(df)
+    for col in ("L", "chroma"):
+        assert np.allclose(profile.quantile(col, QS), df[col].quantile(QS).to_numpy())
+
+
+def test_sidecar_roundtrip(tmp_path):
+    df = _table(0)
+    profile = PhotoProfile.from_table(df, weighted=True)
+    profile.stats["L_median"] = profile.median("L")
+    path = tmp_path / "profile.json"
+    profile.save(path)
+    loaded = PhotoProfile.load(path)
+    assert np.allclose(loaded.quantile("L", GRID), profile.quantile("L", GRID))
+    assert loaded.stats["L_median"] == pytest.approx(profile.stats["L_median"])
+    with pytest.raises(ValueError):
+        loaded.quantile("L", 0.5, weighted=False)
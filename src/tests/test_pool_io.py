@@ -0,0 +1,88 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from photo_profile import PhotoProfile
+from pool_io import is_binary_pool, load_pool, save_pool
+
+
+@pytest.fixture
+def pool():
+    return pd.DataFrame(
+        {
+            "color_id": np.arange(4, dtype=np.int64),
+            "palette": ["mocha"] * 4,
+            "role": ["background", "text", None, "accent_red"],
+            "derived": np.array([False, True, False, True]),
+            "rgb": np.array([0x1E1E2E, 0xCDD6F4, 0, 0xFFFFFF], dtype=np.uint32),
+            "hex": ["#1e1e2e", "#cdd6f4", "#000000", "#ffffff"],
+            "L": [11.5, 86.0, np.nan, 100.0],
+            "frequency": np.array([0.5, 0.25, 0.125, 0.125], dtype=np.float32),
+        }
+    )
+
+
+@pytest.fixture
+def profile():
+    df = pd.DataFrame({"L": [10.0, 50.0, 90.0], "chroma": [5.0, 20.0, 1.0]})
+    df["frequency"] = 1 / 3
+    p = PhotoProfile.from_table(df)
+    p.stats.update({"L_median": 50.0, "midtone_hue": None})
+    return p
+
+
+def test_npz_roundtrip(tmp_path, pool, profile):
+    path = tmp_path / "pool.npz"
+    assert is_binary_pool(path)
+    save_pool(pool, path, profile=profile)
+    loaded, lprofile = load_pool(path)
+
+    assert list(loaded.columns) == list(pool.columns)
+    for col in ("color_id", "derived", "rgb", "L", "frequency"):
+        assert loaded[col].dtype == pool[col].dtype, col
+    assert loaded["derived"].tolist() == [False, True, False, True]
+    assert loaded["rgb"].tolist() == pool["rgb"].tolist()
+    assert np.isnan(loaded["L"][2]) and loaded["L"][3] == 100.0
+    assert loaded["role"].isna().tolist() == [False, False, True, False]
+    assert loaded["role"].dropna().tolist() == ["background", "text", "accent_red"]
+    assert loaded["hex"].tolist() == pool["hex"].tolist()
+
+    assert lprofile is not None
+    assert lprofile.stats == {"L_median": 50.0, "midtone_hue": None}
+    assert lprofile.quantile("L", 0.5) == pytest.approx(profile.quantile("L", 0.5))
+
+
+def test_npz_without_profile(tmp_path, pool):
+    path = tmp_path / "pool.NPZ"
+    save_pool(pool, path)
+    loaded, lprofile = load_pool(path)
+    assert lprofile is None and len(loaded) == len(pool)
+
+
+def test_csv_fallback(tmp_path, pool, profile):
+    path = tmp_path / "pool.csv"
+    assert not is_binary_pool(path)
+    save_pool(pool, path, profile=profile)
+    loaded, lprofile = load_pool(path)
+    assert lprofile is None
+    assert list(loaded.columns) == list(pool.columns)
+    assert loaded["rgb"].tolist() == pool["rgb"].tolist()
+    assert loaded["derived"].tolist() == pool["derived"].tolist()
+    assert loaded["role"].isna().tolist() == pool["role"].isna().tolist()
+    assert np.allclose(loaded["L"], pool["L"], equal_nan=True)
+
+
+def test_unsupported_version(tmp_path, pool):
+    path = tmp_path / "pool.npz"
+    save_pool(pool, path)
+    with np.load(path) as z:
+        arrays = dict(z)
+    header = json.loads(str(arrays["header"]))
+    header["version"] = 99
+    arrays["header"] = np.array(json.dumps(header))
+    with open(path, "wb") as fh:
+        np.savez_compressed(fh, **arrays)
+    with pytest.raises(ValueError):
+        load_pool(path)
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pool_reduce import cap_roles, dedupe_voxels, farthest_point_indices, voxel_ids
+
+
+def _lab(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack(
+        [rng.uniform(0, 100, n), rng.uniform(-90, 90, n), rng.uniform(-90, 90, n)]
+    )
+
+
+@pytest.mark.parametrize("delta_e", [0.5, 2.0, 6.0, 40.0, 1e-15])
+def test_voxel_ids_match_row_unique(delta_e):
+    lab = _lab(3000)
+    cell = np.floor(lab / (delta_e / np.sqrt(3.0))).astype(np.int64)
+    ref = np.unique(cell, axis=0, return_inverse=True)[1].ravel()
+    assert np.array_equal(voxel_ids(lab, delta_e), ref)
+
+
+def test_voxel_ids_empty():
+    assert voxel_ids(np.empty((0, 3)), 2.0).shape == (0,)
+
+
+def test_dedupe_keeps_best_per_role_voxel():
+    lab = _lab(400, seed=1)
+    pool = pd.DataFrame(lab, columns=["L", "a", "b"])
+    pool["role"] = np.where(np.arange(400) % 2, "text", "background")
+    pool["score"] = np.random.default_rng(2).random(400)
+    pool["frequency"] = 1.0 / 400
+    out = dedupe_voxels(pool, 10.0)
+    assert out["frequency"].sum() == pytest.approx(1.0)
+    vox = voxel_ids(out[["L", "a", "b"]].to_numpy(), 10.0)
+    assert not pd.DataFrame({"r": out["role"], "v": vox}).duplicated().any()
+    # Every dropped row shares a voxel with a kept, higher-scoring row of its role
+    all_vox = voxel_ids(np.vstack([out[["L", "a", "b"]].to_numpy(), lab]), 10.0)
+    kept = dict(zip(zip(out["role"], all_vox[: len(out)]), out["score"]))
+    for role, v, score in zip(pool["role"], all_vox[len(out) :], pool["score"]):
+        assert kept[(role, v)] >= score
+
+
+def test_farthest_point_and_cap():
+    lab = np.array([[0.0, 0, 0], [1, 0, 0], [100, 0, 0], [50, 0, 0]])
+    assert farthest_point_indices(lab, 3).tolist() == [0, 2, 3]
+    pool = pd.DataFrame(lab, columns=["L", "a", "b"])
+    pool["role"] = "text"
+    pool["score"] = [0.1, 0.9, 0.2, 0.3]
+    assert sorted(cap_roles(pool, 2)["L"]) == [1.0, 100.0]
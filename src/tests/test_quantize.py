@@ -0,0 +1,75 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from quantize import QuantizedHistogram, pack_rgb, quantized_colors, unpack_keys
+
+
+@pytest.mark.parametrize("quant", [1, 3, 4, 8, 17, 255])
+def test_quantized_colors_matches_np_unique(quant):
+    rng = np.random.default_rng(quant)
+    rgb = rng.integers(0, 256, size=(5000, 3), dtype=np.uint8)
+    rgb[:50] = [255, 255, 255]  # top edge of the grid
+    uniq, counts = quantized_colors(rgb, quant)
+    ref_uniq, ref_counts = np.unique((rgb // quant) * quant, axis=0, return_counts=True)
+    assert np.array_equal(uniq, ref_uniq)
+    assert np.array_equal(counts, ref_counts)
+
+
+def test_empty_input():
+    uniq, counts = quantized_colors(np.empty((0, 3), dtype=np.uint8), 4)
+    assert uniq.shape == (0, 3) and counts.shape == (0,)
+
+
+def test_pack_unpack_roundtrip():
+    rgb = np.array([[0, 0, 0], [255, 255, 255], [12, 200, 97]], dtype=np.uint8)
+    assert np.array_equal(unpack_keys(pack_rgb(rgb, 1), 1), rgb)
+    assert np.array_equal(unpack_keys(pack_rgb(rgb, 4), 4), (rgb // 4) * 4)
+
+
+def test_streaming_updates_equal_one_shot():
+    rng = np.random.default_rng(1)
+    rgb = rng.integers(0, 256, size=(3000, 3), dtype=np.uint8)
+    hist = QuantizedHistogram(8)
+    for block in np.array_split(rgb, 7):
+        hist.update(block)
+    uniq, counts = hist.colors()
+    ref_uniq, ref_counts = quantized_colors(rgb, 8)
+    assert np.array_equal(uniq, ref_uniq) and np.array_equal(counts, ref_counts)
+
+
+def test_weighted_update_merges_counts():
+    rgb = np.array([[10, 20, 30], [11, 21, 31], [200, 0, 0]], dtype=np.uint8)
+    hist = QuantizedHistogram(4)
+    hist.update(rgb, weights=np.array([2.0, 3.0, 1.0]))
+    uniq, counts = hist.colors()
+    assert uniq.tolist() == [[8, 20, 28], [200, 0, 0]]
+    assert counts.tolist() == [5, 1]
+
+
+@pytest.mark.parametrize("quant", [1, 4, 8])
+@pytest.mark.parametrize("block", [10, 1000, 200_000])
+def test_sparse_and_dense_updates_agree(quant, block):
+    rng = np.random.default_rng(block)
+    rgb = rng.integers(0, 256, size=(block, 3), dtype=np.uint8)
+    weights = rng.random(block) * 3
+    hist = QuantizedHistogram(quant)
+    hist.update(rgb)
+    hist.update(rgb, weights=weights)
+    ref = np.zeros_like(hist.counts)
+    keys = pack_rgb(rgb, quant)
+    np.add.at(ref, keys, 1)
+    ref += np.rint(np.bincount(keys, weights=weights, minlength=ref.size)).astype(np.int64)
+    assert np.array_equal(hist.counts, ref)
+
+
+def test_quant1_update_does_not_allocate_the_grid():
+    hist = QuantizedHistogram(1)
+    rgb = np.random.default_rng(0).integers(0, 256, size=(50_000, 3), dtype=np.uint8)
+    tracemalloc.start()
+    hist.update(rgb)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert peak < hist.counts.nbytes / 10
+    assert hist.counts.sum() == len(rgb)
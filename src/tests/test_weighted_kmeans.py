@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from weighted_kmeans import BATCH_SIZE, weighted_kmeans
+
+CENTERS = np.array([[20.0, 0.0, 0.0], [60.0, 40.0, -30.0], [85.0, -30.0, 50.0]])
+
+
+def _blobs(n_per, seed=0, spread=1.5):
+    rng = np.random.default_rng(seed)
+    x = np.vstack([c + rng.normal(0, spread, size=(n_per, 3)) for c in CENTERS])
+    w = rng.integers(1, 50, size=len(x)).astype(float)
+    truth = np.repeat(np.arange(len(CENTERS)), n_per)
+    return x, w, truth
+
+
+def _matched(centers):
+    """Fitted centers reordered to CENTERS (nearest match)."""
+    d = np.linalg.norm(centers[:, None] - CENTERS[None], axis=-1)
+    return centers[np.argmin(d, axis=0)]
+
+
+@pytest.mark.parametrize("n_per", [200, BATCH_SIZE])
+def test_same_seed_same_result(n_per):
+    x, w, _ = _blobs(n_per)
+    a = weighted_kmeans(x, w, k=3, seed=5)
+    b = weighted_kmeans(x, w, k=3, seed=5)
+    assert np.array_equal(a.centers, b.centers)
+    assert np.array_equal(a.labels, b.labels)
+    assert a.inertia == b.inertia and a.n_iter == b.n_iter
+
+
+def test_separable_blobs_converge_early():
+    x, w, truth = _blobs(300)
+    res = weighted_kmeans(x, w, k=3, seed=0, max_iter=100)
+    assert res.converged
+    assert res.n_iter < 100
+    # Lloyd on separable blobs: each blob is one cluster at its weighted mean
+    assert len(np.unique(res.labels)) == 3
+    for c in range(3):
+        assert len(np.unique(res.labels[truth == c])) == 1
+    means = np.array([np.average(x[truth == c], axis=0, weights=w[truth == c]) for c in range(3)])
+    assert np.allclose(_matched(res.centers), means, atol=1e-3)
+
+
+def test_max_iter_without_convergence():
+    x, w, _ = _blobs(300, spread=25.0)
+    res = weighted_kmeans(x, w, k=3, seed=0, max_iter=1, tol=0.0)
+    assert not res.converged and res.n_iter == 1
+
+
+def test_weights_move_centers():
+    x = np.array([[0.0], [1.0], [10.0], [11.0]])
+    res = weighted_kmeans(x, np.array([1.0, 3.0, 1.0, 1.0]), k=2, seed=0)
+    assert sorted(res.centers[:, 0].tolist()) == pytest.approx([0.75, 10.5])
+
+
+def test_mini_batch_path():
+    n_per = BATCH_SIZE  # 3 * BATCH_SIZE rows > BATCH_SIZE
+    x, w, truth = _blobs(n_per, seed=1)
+    res = weighted_kmeans(x, w, k=3, seed=0, max_iter=300)
+    assert res.converged and res.n_iter < 300
+    assert res.labels.shape == (len(x),)
+    assert np.allclose(_matched(res.centers), CENTERS, atol=0.5)
+    agree = sum(np.bincount(res.labels[truth == c]).max() for c in range(3))
+    assert agree / len(x) > 0.999
+    # Same clustering as full Lloyd, up to mini-batch noise
+    full = weighted_kmeans(x, w, k=3, seed=0, batch_size=len(x))
+    assert np.allclose(_matched(res.centers), _matched(full.centers), atol=0.5)
+
+
+def test_fewer_rows_than_k():
+    with pytest.raises(ValueError, match="at least k=4"):
+        weighted_kmeans(np.zeros((3, 3)), k=4)
+
+
+def test_duplicate_points():
+    x = np.repeat([[1.0, 2.0, 3.0], [5.0, 5.0, 5.0]], 10, axis=0)
+    res = weighted_kmeans(x, k=3, seed=0)
+    assert np.isfinite(res.centers).all()
+    assert res.inertia == pytest.approx(0.0)